@@ -1,7 +1,9 @@
+from typing import Literal
+
 from fastapi import APIRouter
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from packages.database import Config, TheSession
+from packages.database import Config, TheSession, config_snapshot
 
 router = APIRouter(
     prefix="/api/v1/config",
@@ -14,6 +16,9 @@ class ConfigModel(BaseModel):
     model: str
     pages_concurrency: int
     products_concurrency: int
+    scheduling_mode: Literal["adaptive", "static"] = "adaptive"
+    keywords_mode: Literal["llm", "local", "local-then-llm"] = "llm"
+    product_ttl: int = Field(default=3600, ge=0)
     required: list[str]
     not_reprocess: list[str]
     description_prompt: str
@@ -36,6 +41,9 @@ async def get_config() -> ConfigModel:
                 model="gpt-4o-mini",
                 pages_concurrency=5,
                 products_concurrency=30,
+                scheduling_mode="adaptive",
+                keywords_mode="llm",
+                product_ttl=3600,
                 required=["name", "description"],
                 not_reprocess=["description", "properties", "keywords"],
                 properties_prompt='You are a data scientist. You are given the set of data from the website and your goal is to extract the properties of the product from the text. You must respond with a valid JSON object, containing the dictionary of the extracted properties. For example: {"color": "red", "size": "small"}. If no properties can be found, respond with an empty dictionary.',
@@ -51,6 +59,9 @@ async def get_config() -> ConfigModel:
             model=config.model,
             pages_concurrency=config.pages_concurrency,
             products_concurrency=config.products_concurrency,
+            scheduling_mode=config.scheduling_mode,
+            keywords_mode=config.keywords_mode,
+            product_ttl=config.product_ttl,
             required=config.required,
             not_reprocess=config.not_reprocess,
             description_prompt=config.description_prompt,
@@ -72,12 +83,18 @@ async def update_config(config: ConfigModel) -> ConfigModel:
         db_config.model = config.model
         db_config.pages_concurrency = config.pages_concurrency
         db_config.products_concurrency = config.products_concurrency
+        db_config.scheduling_mode = config.scheduling_mode
+        db_config.keywords_mode = config.keywords_mode
+        db_config.product_ttl = config.product_ttl
         db_config.required = config.required
         db_config.not_reprocess = config.not_reprocess
         db_config.description_prompt = config.description_prompt
         db_config.keywords_prompt = config.keywords_prompt
         db_config.properties_prompt = config.properties_prompt
+        db_config.version = Config.version + 1
 
         session.commit()
 
+    config_snapshot.invalidate()
+
     return config
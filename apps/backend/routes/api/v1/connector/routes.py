@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 from urllib.parse import urlparse
 
 from fastapi import APIRouter, HTTPException
@@ -30,7 +31,8 @@ class SourceUpdateResponse(BaseModel):
 
 class RegExesInput(BaseModel):
     product: str
-    pagination: str
+    # Not needed when the products are discovered via the sitemap
+    pagination: Optional[str] = None
 
 
 class Property(BaseModel):
@@ -47,9 +49,21 @@ class PropertyInput(BaseModel):
     xpath: str
 
 
+class ListingInput(BaseModel):
+    # The XPath of the repeating element of a single product on the listing page
+    item: str
+    # The XPaths relative to the item
+    xpaths: list[PropertyInput]
+
+
 class SourceUpdateInput(BaseModel):
     xpaths: list[PropertyInput]
     regexes: RegExesInput
+    discovery_mode: Literal["pagination", "sitemap", "auto"] = "pagination"
+    sitemap_url: Optional[str] = None
+    # The products are taken from the listing pages, the product pages are
+    # fetched only for the fields the listing lacks
+    listing: Optional[ListingInput] = None
 
 
 @router.get("/sources")
@@ -96,6 +110,14 @@ async def update_source_xpaths(
     Update the cross-references for the source.
     """
 
+    if data.discovery_mode == "pagination" and not data.regexes.pagination:
+        raise HTTPException(status_code=422, detail="Pagination regex is required")
+
+    if data.listing is not None and data.discovery_mode == "sitemap":
+        raise HTTPException(
+            status_code=422, detail="Listing items require the listing pages"
+        )
+
     with TheSession() as session:
         if not (
             source := session.query(WebsiteSource)
@@ -107,6 +129,14 @@ async def update_source_xpaths(
         source.props_xpaths = {prop.property: prop.xpath for prop in data.xpaths}
         source.product_regex = data.regexes.product
         source.pagination_regex = data.regexes.pagination
+        source.discovery_mode = data.discovery_mode
+        source.sitemap_url = data.sitemap_url
+        source.listing_item_xpath = data.listing and data.listing.item
+        source.listing_xpaths = data.listing and {
+            prop.property: prop.xpath for prop in data.listing.xpaths
+        }
+        # The blocks were learned from the texts of the previous XPaths
+        source.boilerplate = None
         source.state = WebsiteSourceState.XPATHS_READY
         session.commit()
 
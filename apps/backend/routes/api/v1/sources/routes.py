@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from typing import Union
+from typing import Any, Union
 from urllib.parse import urlparse
 
 from fastapi import APIRouter, File, HTTPException, UploadFile, WebSocket
@@ -48,6 +48,10 @@ class ReprocessRequest(BaseModel):
     products: list[str]
 
 
+class SourceStatsResponse(BaseModel):
+    stats: dict[str, Any]
+
+
 @router.get("/")
 async def get_sources() -> SourcesResponse:
     """
@@ -106,6 +110,23 @@ async def get_source(source_id: str) -> Union[WebsiteSourceModel, ExcelSourceMod
     return source
 
 
+@router.get("/{source_id}/stats")
+async def get_source_stats(source_id: str) -> SourceStatsResponse:
+    """
+    Get the statistics of the last data collection of the source
+    """
+
+    with TheSession() as session:
+        if not (
+            source := session.query(WebsiteSource)
+            .filter(WebsiteSource.id == source_id)
+            .first()
+        ):
+            raise HTTPException(status_code=404, detail="Source not found")
+
+        return SourceStatsResponse(stats=source.crawl_stats or {})
+
+
 @router.delete("/{source_id}")
 async def delete_source(source_id: str) -> MessageResponse:
     """
@@ -31,6 +31,24 @@ export const $ConfigModel = {
 			type: 'integer',
 			title: 'Products Concurrency'
 		},
+		scheduling_mode: {
+			type: 'string',
+			enum: ['adaptive', 'static'],
+			title: 'Scheduling Mode',
+			default: 'adaptive'
+		},
+		keywords_mode: {
+			type: 'string',
+			enum: ['llm', 'local', 'local-then-llm'],
+			title: 'Keywords Mode',
+			default: 'llm'
+		},
+		product_ttl: {
+			type: 'integer',
+			minimum: 0,
+			title: 'Product Ttl',
+			default: 3600
+		},
 		required: {
 			items: {
 				type: 'string'
@@ -146,6 +164,25 @@ export const $HTTPValidationError = {
 	title: 'HTTPValidationError'
 } as const;
 
+export const $ListingInput = {
+	properties: {
+		item: {
+			type: 'string',
+			title: 'Item'
+		},
+		xpaths: {
+			items: {
+				$ref: '#/components/schemas/PropertyInput'
+			},
+			type: 'array',
+			title: 'Xpaths'
+		}
+	},
+	type: 'object',
+	required: ['item', 'xpaths'],
+	title: 'ListingInput'
+} as const;
+
 export const $MessageResponse = {
 	properties: {
 		message: {
@@ -224,12 +261,19 @@ export const $RegExesInput = {
 			title: 'Product'
 		},
 		pagination: {
-			type: 'string',
+			anyOf: [
+				{
+					type: 'string'
+				},
+				{
+					type: 'null'
+				}
+			],
 			title: 'Pagination'
 		}
 	},
 	type: 'object',
-	required: ['product', 'pagination'],
+	required: ['product'],
 	title: 'RegExesInput'
 } as const;
 
@@ -271,6 +315,33 @@ export const $SourceUpdateInput = {
 		},
 		regexes: {
 			$ref: '#/components/schemas/RegExesInput'
+		},
+		discovery_mode: {
+			type: 'string',
+			enum: ['pagination', 'sitemap', 'auto'],
+			title: 'Discovery Mode',
+			default: 'pagination'
+		},
+		sitemap_url: {
+			anyOf: [
+				{
+					type: 'string'
+				},
+				{
+					type: 'null'
+				}
+			],
+			title: 'Sitemap Url'
+		},
+		listing: {
+			anyOf: [
+				{
+					$ref: '#/components/schemas/ListingInput'
+				},
+				{
+					type: 'null'
+				}
+			]
 		}
 	},
 	type: 'object',
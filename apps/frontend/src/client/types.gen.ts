@@ -9,6 +9,9 @@ export type ConfigModel = {
 	model: string;
 	pages_concurrency: number;
 	products_concurrency: number;
+	scheduling_mode?: 'adaptive' | 'static';
+	keywords_mode?: 'llm' | 'local' | 'local-then-llm';
+	product_ttl?: number;
 	required: Array<string>;
 	not_reprocess: Array<string>;
 	description_prompt: string;
@@ -37,6 +40,11 @@ export type HTTPValidationError = {
 	detail?: Array<ValidationError>;
 };
 
+export type ListingInput = {
+	item: string;
+	xpaths: Array<PropertyInput>;
+};
+
 export type MessageResponse = {
 	message: string;
 };
@@ -61,7 +69,7 @@ export type PropertyInput = {
 
 export type RegExesInput = {
 	product: string;
-	pagination: string;
+	pagination?: string | null;
 };
 
 export type ReprocessRequest = {
@@ -75,6 +83,9 @@ export type SourceCreateResponse = {
 export type SourceUpdateInput = {
 	xpaths: Array<PropertyInput>;
 	regexes: RegExesInput;
+	discovery_mode?: 'pagination' | 'sitemap' | 'auto';
+	sitemap_url?: string | null;
+	listing?: ListingInput | null;
 };
 
 export type SourceUpdateResponse = {
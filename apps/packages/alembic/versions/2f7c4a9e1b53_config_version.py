@@ -0,0 +1,34 @@
+"""
+Config version
+
+Revision ID: 2f7c4a9e1b53
+Revises: 8b1f5d3e7a26
+Create Date: 2026-10-19 12:03:47.215930
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "2f7c4a9e1b53"
+down_revision: Union[str, None] = "8b1f5d3e7a26"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "config",
+        sa.Column(
+            "version",
+            sa.Integer(),
+            server_default="1",
+            nullable=False,
+            comment="Incremented on every update, so the processes notice the change",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("config", "version")
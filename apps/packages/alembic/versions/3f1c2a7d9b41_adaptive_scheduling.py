@@ -0,0 +1,48 @@
+"""
+Adaptive scheduling
+
+Revision ID: 3f1c2a7d9b41
+Revises: 7ca2d9259635
+Create Date: 2026-10-18 10:12:31.418210
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = "3f1c2a7d9b41"
+down_revision: Union[str, None] = "7ca2d9259635"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "config",
+        sa.Column(
+            "scheduling_mode",
+            sa.Text(),
+            server_default="adaptive",
+            nullable=False,
+            comment=(
+                "How the requests are scheduled: `adaptive` per-domain windows "
+                "or `static` batches of `pages_concurrency`/`products_concurrency`"
+            ),
+        ),
+    )
+    op.add_column(
+        "website_source",
+        sa.Column(
+            "crawl_stats",
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=True,
+            comment="Statistics of the last data collection (scheduling window, etc.)",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("website_source", "crawl_stats")
+    op.drop_column("config", "scheduling_mode")
@@ -0,0 +1,44 @@
+"""
+Listing items
+
+Revision ID: 4d9a6c2e8f17
+Revises: e2c7a4f19b83
+Create Date: 2026-10-18 18:12:47.503128
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = "4d9a6c2e8f17"
+down_revision: Union[str, None] = "e2c7a4f19b83"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "website_source",
+        sa.Column(
+            "listing_item_xpath",
+            sa.Text(),
+            nullable=True,
+            comment="XPath of the repeating product item on the listing pages",
+        ),
+    )
+    op.add_column(
+        "website_source",
+        sa.Column(
+            "listing_xpaths",
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=True,
+            comment="Mapping between the website properties and the XPATHs relative to the listing item",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("website_source", "listing_xpaths")
+    op.drop_column("website_source", "listing_item_xpath")
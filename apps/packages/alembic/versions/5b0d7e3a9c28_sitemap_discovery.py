@@ -0,0 +1,47 @@
+"""
+Sitemap discovery
+
+Revision ID: 5b0d7e3a9c28
+Revises: a8e4f02c6d17
+Create Date: 2026-10-18 13:12:40.517203
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "5b0d7e3a9c28"
+down_revision: Union[str, None] = "a8e4f02c6d17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "website_source",
+        sa.Column(
+            "discovery_mode",
+            sa.Text(),
+            nullable=False,
+            server_default="pagination",
+            comment=(
+                "How the products are discovered: `pagination` of the listing pages, "
+                "`sitemap` or `auto` (sitemap if the website has one)"
+            ),
+        ),
+    )
+    op.add_column(
+        "website_source",
+        sa.Column(
+            "sitemap_url",
+            sa.Text(),
+            nullable=True,
+            comment="The URL of the sitemap, discovered via robots.txt if not set",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("website_source", "sitemap_url")
+    op.drop_column("website_source", "discovery_mode")
@@ -0,0 +1,34 @@
+"""
+Product revision
+
+Revision ID: 8b1f5d3e7a26
+Revises: 4d9a6c2e8f17
+Create Date: 2026-10-19 10:24:31.861402
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "8b1f5d3e7a26"
+down_revision: Union[str, None] = "4d9a6c2e8f17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "product",
+        sa.Column(
+            "revision",
+            sa.Text(),
+            nullable=True,
+            comment="The hash of the extraction rules and the LLM settings the data "
+            "was extracted with",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("product", "revision")
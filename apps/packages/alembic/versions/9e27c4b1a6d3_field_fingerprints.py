@@ -0,0 +1,34 @@
+"""
+Field fingerprints
+
+Revision ID: 9e27c4b1a6d3
+Revises: d41b9c6e2f70
+Create Date: 2026-10-18 14:06:21.338750
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = "9e27c4b1a6d3"
+down_revision: Union[str, None] = "d41b9c6e2f70"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "product",
+        sa.Column(
+            "fingerprints",
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=True,
+            comment="The hashes of the raw fields the data was produced from",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("product", "fingerprints")
@@ -0,0 +1,43 @@
+"""
+Product validators
+
+Revision ID: a8e4f02c6d17
+Revises: 3f1c2a7d9b41
+Create Date: 2026-10-18 11:03:54.220671
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "a8e4f02c6d17"
+down_revision: Union[str, None] = "3f1c2a7d9b41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "product",
+        sa.Column(
+            "etag",
+            sa.Text(),
+            nullable=True,
+            comment="The ETag of the product page the data was extracted from",
+        ),
+    )
+    op.add_column(
+        "product",
+        sa.Column(
+            "last_modified",
+            sa.Text(),
+            nullable=True,
+            comment="The Last-Modified of the product page the data was extracted from",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("product", "last_modified")
+    op.drop_column("product", "etag")
@@ -0,0 +1,37 @@
+"""
+Keywords mode
+
+Revision ID: b6f3e81d4a52
+Revises: 9e27c4b1a6d3
+Create Date: 2026-10-18 15:02:47.516204
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "b6f3e81d4a52"
+down_revision: Union[str, None] = "9e27c4b1a6d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "config",
+        sa.Column(
+            "keywords_mode",
+            sa.Text(),
+            server_default="llm",
+            nullable=False,
+            comment=(
+                "How the keywords are extracted: by the `llm`, `local`ly with TF-IDF "
+                "or `local-then-llm` when the local keywords are not confident"
+            ),
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("config", "keywords_mode")
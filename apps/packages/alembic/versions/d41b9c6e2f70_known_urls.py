@@ -0,0 +1,44 @@
+"""
+Known URLs
+
+Revision ID: d41b9c6e2f70
+Revises: 5b0d7e3a9c28
+Create Date: 2026-10-18 13:41:08.904311
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "d41b9c6e2f70"
+down_revision: Union[str, None] = "5b0d7e3a9c28"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_product_source_id_url",
+        "product",
+        ["source_id", "url"],
+        unique=False,
+    )
+    op.add_column(
+        "config",
+        sa.Column(
+            "product_ttl",
+            sa.Integer(),
+            nullable=False,
+            server_default="3600",
+            comment=(
+                "Seconds after the extraction during which the product is not fetched "
+                "again by the data collection, 0 to always fetch"
+            ),
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("config", "product_ttl")
+    op.drop_index("ix_product_source_id_url", table_name="product")
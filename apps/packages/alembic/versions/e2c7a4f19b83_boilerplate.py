@@ -0,0 +1,34 @@
+"""
+Boilerplate
+
+Revision ID: e2c7a4f19b83
+Revises: b6f3e81d4a52
+Create Date: 2026-10-18 15:41:09.274615
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = "e2c7a4f19b83"
+down_revision: Union[str, None] = "b6f3e81d4a52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "website_source",
+        sa.Column(
+            "boilerplate",
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=True,
+            comment="The hashes of the text blocks repeated across the product pages",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("website_source", "boilerplate")
@@ -0,0 +1,5 @@
+from .caches import llm_cache, page_cache
+from .singleflight import SingleFlight
+from .store import CacheEntry, DiskCache
+
+__all__ = ["page_cache", "llm_cache", "SingleFlight", "CacheEntry", "DiskCache"]
@@ -0,0 +1,24 @@
+import atexit
+
+from .config import config
+from .store import DiskCache
+
+__all__ = ["page_cache", "llm_cache"]
+
+page_cache = DiskCache(
+    config.cache_dir / "pages",
+    max_bytes=config.page_cache_max_bytes,
+    ttl=config.page_cache_ttl,
+    keep_stale=config.page_cache_keep_stale,
+)
+
+# Keyed by the hashes of the prompt, the model and the input, see `packages.chatgpt`
+llm_cache = DiskCache(
+    config.cache_dir / "llm",
+    max_bytes=config.llm_cache_max_bytes,
+    ttl=config.llm_cache_ttl,
+)
+
+# The connections are closed on the worker shutdown, which checkpoints the WAL
+atexit.register(page_cache.close)
+atexit.register(llm_cache.close)
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from pydantic import Field
+
+from packages.config import BaseConfig
+
+
+class CacheConfig(BaseConfig):
+    """
+    On-disk caches configuration
+    """
+
+    cache_dir: Path = Field(
+        default=Path.home() / ".cache" / "nekoparser",
+        description="The directory where the caches are stored",
+    )
+    page_cache_max_bytes: int = Field(
+        default=512 * 1024**2,
+        description="The largest size of the compressed pages kept in the page cache",
+    )
+    page_cache_ttl: float = Field(
+        default=24 * 60 * 60,
+        description="Seconds after which the cached page is considered stale",
+    )
+    page_cache_keep_stale: float = Field(
+        default=6 * 24 * 60 * 60,
+        description="Seconds the stale page is kept after its TTL, so that it can be "
+        "revalidated with its ETag and Last-Modified instead of downloaded again",
+    )
+    llm_cache_max_bytes: int = Field(
+        default=128 * 1024**2,
+        description="The largest size of the compressed LLM responses kept in the cache",
+    )
+    llm_cache_ttl: float = Field(
+        default=30 * 24 * 60 * 60,
+        description="Seconds after which the cached LLM response is requested again",
+    )
+    cache_compression_level: int = Field(
+        default=3,
+        description="The compression level of the cached contents",
+    )
+
+
+config = CacheConfig()
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+__all__ = ["SingleFlight"]
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Deduplicates concurrent calls with the same key
+
+    While the call is in flight, every other caller with the same key awaits
+    the same result instead of starting the work again.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run the call or join the one already in flight
+
+        :param key: The key identifying the call
+        :param fn: The coroutine function doing the work
+        :return: The result of the call
+        """
+
+        if (call := self._calls.get(key)) is not None:
+            return await asyncio.shield(call)
+
+        call = asyncio.get_running_loop().create_future()
+        self._calls[key] = call
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except Exception as e:
+            call.set_exception(e)
+            # Mark the exception as retrieved, callers get it through `await`
+            call.exception()
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    @property
+    def in_flight(self) -> int:
+        """
+        The number of calls currently in flight
+        """
+
+        return len(self._calls)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._calls
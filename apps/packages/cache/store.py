@@ -0,0 +1,393 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+from packages.log import get_logger
+
+from .config import config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__all__ = ["CacheEntry", "DiskCache"]
+
+# Seconds between the sweeps of the expired entries. The sweep also recounts
+# the size of the cache, which the other processes may have changed
+SWEEP_INTERVAL = 60.0
+
+
+class CacheEntry(NamedTuple):
+    """
+    Represents the cached contents
+    """
+
+    content: bytes
+    meta: dict[str, Any]
+    stored_at: float
+    stale: bool
+
+
+def _compress(content: bytes) -> tuple[str, bytes]:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(
+            level=config.cache_compression_level
+        ).compress(content)
+
+    return "zlib", zlib.compress(content, config.cache_compression_level)
+
+
+def _decompress(codec: str, content: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstandard is required to read this cache entry")
+
+        return zstandard.ZstdDecompressor().decompress(content)
+
+    return zlib.decompress(content)
+
+
+class DiskCache:
+    """
+    Content-addressed compressed cache on the local disk
+
+    The compressed contents are stored once per unique SHA-256 digest, so the keys
+    with identical contents share the storage. The index lives in SQLite next
+    to the blobs, which makes the cache shared between the flow runs and processes.
+    When the compressed size exceeds `max_bytes`, the least recently used entries
+    are evicted. Entries older than `ttl` are only returned with `allow_stale`,
+    and are dropped `keep_stale` seconds later.
+
+    The size is tracked along the writes, so a write does not scan the index.
+    The expired entries are swept every `SWEEP_INTERVAL` seconds.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int,
+        ttl: Optional[float] = None,
+        keep_stale: float = 0.0,
+    ):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._keep_stale = keep_stale
+        self._local = threading.local()
+        # The connections of the threads of this process, to be closed by `close`
+        self._connections: dict[int, sqlite3.Connection] = {}
+        self._pid = os.getpid()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+        self._swept_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # SQLite connections must not be shared with the forked processes
+        # and the other threads, Prefect may run the tasks in its own threads
+        connection = getattr(self._local, "connection", None)
+        if (
+            connection is None
+            or self._local.pid != os.getpid()
+            or self._local.generation != self._generation
+        ):
+            self._path.mkdir(parents=True, exist_ok=True)
+            # Only the owning thread uses the connection, `close` may close it
+            # from another one
+            connection = sqlite3.connect(
+                self._path / "index.sqlite3",
+                isolation_level=None,
+                timeout=30,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    digest TEXT PRIMARY KEY,
+                    codec TEXT NOT NULL,
+                    size INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    meta TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_entries_accessed_at
+                    ON entries (accessed_at);
+                CREATE INDEX IF NOT EXISTS ix_entries_stored_at ON entries (stored_at);
+                CREATE INDEX IF NOT EXISTS ix_entries_digest ON entries (digest);
+                """
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            self._local.generation = self._generation
+            self._register(connection)
+
+        return connection
+
+    def _register(self, connection: sqlite3.Connection):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Inherited from the parent process, which still uses them
+                self._pid = os.getpid()
+                self._connections = {}
+
+            # The connections of the finished threads are closed with them
+            alive = {thread.ident for thread in threading.enumerate()}
+            for ident in [ident for ident in self._connections if ident not in alive]:
+                self._connections.pop(ident).close()
+
+            self._connections[threading.get_ident()] = connection
+
+    def close(self):
+        """
+        Close the connections of all the threads of this process,
+        the next access opens a new one
+        """
+
+        with self._lock:
+            self._generation += 1
+            connections = list(self._connections.values())
+            self._connections = {}
+
+        for connection in connections:
+            connection.close()
+
+    def _resize(self, delta: int):
+        with self._lock:
+            if self._size is not None:
+                self._size += delta
+
+    def _blob_path(self, digest: str) -> Path:
+        return self._path / digest[:2] / digest
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """
+        Get the cached contents
+
+        :param key: The key of the entry
+        :param allow_stale: Whether to return the entries older than the TTL
+        :return: The entry or None
+        """
+
+        row = self._db.execute(
+            """
+            SELECT entries.digest, entries.meta, entries.stored_at, blobs.codec
+            FROM entries JOIN blobs ON blobs.digest = entries.digest
+            WHERE entries.key = ?
+            """,
+            (key,),
+        ).fetchone()
+        if not row:
+            self.misses += 1
+            return None
+
+        digest, meta, stored_at, codec = row
+        stale = self._ttl is not None and time.time() - stored_at > self._ttl
+        if stale and not allow_stale:
+            self.misses += 1
+            return None
+
+        try:
+            content = _decompress(codec, self._blob_path(digest).read_bytes())
+        except (OSError, ValueError, zlib.error) as e:
+            get_logger().warning(
+                "Dropping unreadable cache entry",
+                extra={"key": key, "error": str(e)},
+            )
+            self.delete(key)
+            self.misses += 1
+            return None
+
+        self._db.execute(
+            "UPDATE entries SET accessed_at = ? WHERE key = ?",
+            (time.time(), key),
+        )
+        self.hits += 1
+        return CacheEntry(
+            content=content,
+            meta=json.loads(meta),
+            stored_at=stored_at,
+            stale=stale,
+        )
+
+    def set(self, key: str, content: bytes, meta: Optional[dict[str, Any]] = None):
+        """
+        Store the contents
+
+        :param key: The key of the entry
+        :param content: The raw contents
+        :param meta: Arbitrary JSON-serializable metadata stored along
+        """
+
+        digest = hashlib.sha256(content).hexdigest()
+        if not self._db.execute(
+            "SELECT 1 FROM blobs WHERE digest = ?", (digest,)
+        ).fetchone():
+            codec, compressed = _compress(content)
+            path = self._blob_path(digest)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(compressed)
+            os.replace(tmp_path, path)
+            self._db.execute(
+                "INSERT OR REPLACE INTO blobs (digest, codec, size) VALUES (?, ?, ?)",
+                (digest, codec, len(compressed)),
+            )
+            self._resize(len(compressed))
+
+        previous = self._db.execute(
+            "SELECT digest FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        self._db.execute(
+            """
+            INSERT OR REPLACE INTO entries (key, digest, meta, stored_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (key, digest, json.dumps(meta or {}), now, now),
+        )
+        if previous and previous[0] != digest:
+            self._drop_orphan(previous[0])
+
+        self._evict()
+
+    def touch(self, key: str, meta: Optional[dict[str, Any]] = None):
+        """
+        Mark the entry as fresh again, e.g. after the server confirmed it is unchanged
+
+        :param key: The key of the entry
+        :param meta: The new metadata, if it should be replaced
+        """
+
+        now = time.time()
+        if meta is None:
+            self._db.execute(
+                "UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key),
+            )
+        else:
+            self._db.execute(
+                """
+                UPDATE entries SET stored_at = ?, accessed_at = ?, meta = ?
+                WHERE key = ?
+                """,
+                (now, now, json.dumps(meta), key),
+            )
+
+    def delete(self, key: str):
+        """
+        Remove the entry
+
+        :param key: The key of the entry
+        """
+
+        row = self._db.execute(
+            "SELECT digest FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return
+
+        self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._drop_orphan(row[0])
+
+    def clear(self):
+        """
+        Remove all the entries
+        """
+
+        for (digest,) in self._db.execute("SELECT digest FROM blobs").fetchall():
+            self._blob_path(digest).unlink(missing_ok=True)
+
+        self._db.execute("DELETE FROM entries")
+        self._db.execute("DELETE FROM blobs")
+        with self._lock:
+            self._size = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        The size of the cache and the hit/miss counters of this process
+        """
+
+        entries, blobs, size = self._db.execute(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM entries),
+                (SELECT COUNT(*) FROM blobs),
+                (SELECT COALESCE(SUM(size), 0) FROM blobs)
+            """
+        ).fetchone()
+        return {
+            "entries": entries,
+            "blobs": blobs,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _drop_orphan(self, digest: str):
+        if self._db.execute(
+            "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)
+        ).fetchone():
+            return
+
+        if row := self._db.execute(
+            "SELECT size FROM blobs WHERE digest = ?", (digest,)
+        ).fetchone():
+            self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            self._resize(-row[0])
+
+        self._blob_path(digest).unlink(missing_ok=True)
+
+    def _sweep(self):
+        """
+        Drop the expired entries and recount the size of the cache
+        """
+
+        if self._ttl is not None:
+            for (key,) in self._db.execute(
+                "SELECT key FROM entries WHERE stored_at < ?",
+                (time.time() - self._ttl - self._keep_stale,),
+            ).fetchall():
+                self.delete(key)
+
+        (size,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        with self._lock:
+            self._size = size
+
+    def _evict(self):
+        """
+        Drop the least recently used entries until the cache fits into the budget,
+        sweeping the expired ones first when it is time to
+        """
+
+        now = time.monotonic()
+        if self._size is None or now - self._swept_at >= SWEEP_INTERVAL:
+            self._swept_at = now
+            self._sweep()
+
+        if (self._size or 0) <= self._max_bytes:
+            return
+
+        # Evict a bit more than needed, so that every insertion does not evict
+        target = self._max_bytes * 0.9
+        for (key,) in self._db.execute(
+            "SELECT key FROM entries ORDER BY accessed_at"
+        ).fetchall():
+            if (self._size or 0) <= target:
+                break
+
+            self.delete(key)
@@ -1,17 +1,22 @@
 from .base import chatgpt
 from .prompt import (
+    EnrichProduct,
     ExtractKeywords,
     ExtractProperties,
     FindSKU,
     NormalizeDescription,
     Prompt,
 )
+from .scheduler import Priority, llm_priority
 
 __all__ = [
     "chatgpt",
+    "Priority",
+    "llm_priority",
     "Prompt",
     "ExtractProperties",
     "NormalizeDescription",
     "ExtractKeywords",
+    "EnrichProduct",
     "FindSKU",
 ]
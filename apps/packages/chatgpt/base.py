@@ -1,51 +1,151 @@
+import asyncio
+import hashlib
 import json
-from typing import Any
+from typing import Any, AsyncContextManager
 
-import aiohttp
-
-from packages.database import Config, TheSession
+from packages.cache import SingleFlight, llm_cache
+from packages.database import Config, config_snapshot
+from packages.httpclient import HTTPClientPool
 from packages.log import get_logger
 
+from .batching import PromptBatcher
+from .config import config
 from .exceptions import ChatGPTException
 from .models import ChatGPTQuery
 from .prompt import Prompt
+from .providers import ProviderRouter, build_providers
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def cache_key(prompt: Prompt, route: str, query: ChatGPTQuery) -> str:
+    """
+    Build the key of the response in the `llm_cache`.
+    The key contains the digest of the prompt, so once the prompt is changed
+    in the configuration no process gets the responses to its previous version,
+    which are left to expire. The response is stored under the provider and
+    the model which answered, and looked up under the ones the query would be
+    sent to, so the answers of a fallback model are not served in place of
+    the preferred one
+
+    :param prompt: The prompt
+    :param route: The provider and the model, see `ProviderRouter.route`
+    :param query: The query
+    :return: The key
+    """
+
+    prompt_digest = _digest(f"{type(prompt).__name__}:{query.system_message}")
+    return f"{prompt_digest}:{route}:{_digest(query.user_message)}"
 
 
 class ChatGPTClient:
-    async def _request(self, query: ChatGPTQuery) -> dict:
-        with TheSession() as session:
-            global_config = session.query(Config).one()
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.openai.com/v1/chat/completions",
-                json={
-                    "model": global_config.model,
-                    "response_format": {"type": "json_object"},
-                    "messages": [
-                        {"role": "system", "content": query.system_message},
-                        {"role": "user", "content": query.user_message},
-                    ],
-                    "temperature": 0.1,
-                },
-                headers={
-                    "Authorization": f"Bearer {global_config.chatgpt_key}",
-                    "Content-Type": "application/json",
-                },
-            ) as response:
-                return await response.json()
+    """
+    ChatGPT client
+
+    The parsed responses are cached on the disk by the provider, the model,
+    the prompt and the input, and the identical concurrent queries share a single
+    request. The queries of the batchable prompts are gathered into multi-product
+    requests by the `PromptBatcher`. The requests are routed to the configured
+    providers by the `ProviderRouter`, which hedges the slow ones and fails over
+    the erroring ones. The requests go through a dedicated pool of keep-alive
+    connections, so the TLS handshake is done once per connection rather than
+    once per completion.
+    """
+
+    def __init__(self):
+        self._pool = HTTPClientPool(
+            max_connections_per_host=config.chatgpt_max_connections,
+            rotate_user_agents=False,
+            adaptive=False,
+            retries=0,
+        )
+        self._router = ProviderRouter(
+            build_providers(self._pool), hedging=config.chatgpt_hedging
+        )
+        self._requests: SingleFlight[Any] = SingleFlight()
+        self._batcher = PromptBatcher(
+            self._query,
+            max_size=config.chatgpt_batch_size,
+            window=config.chatgpt_batch_window,
+            retries=config.chatgpt_batch_retries,
+        )
+
+    async def _query(
+        self, query: ChatGPTQuery, global_config: Config
+    ) -> tuple[dict, str]:
+        return await self._router.complete(query, global_config)
+
+    async def _complete(
+        self,
+        key: str,
+        prompt: Prompt,
+        query: ChatGPTQuery,
+        global_config: Config,
+    ) -> Any:
+        if (cached := await asyncio.to_thread(llm_cache.get, key)) is not None:
+            return await prompt.parse_response(json.loads(cached.content))
+
+        if prompt.batchable and config.chatgpt_batch_size > 1:
+            result, route = await self._batcher.submit(query, global_config)
+            try:
+                parsed = await prompt.parse_response(result)
+            except ChatGPTException:
+                # The batched response may be fine as a whole but not for this input
+                get_logger().warning(
+                    "Invalid batched response, sending the query alone",
+                    extra={"prompt": type(prompt).__name__},
+                )
+            else:
+                await asyncio.to_thread(
+                    llm_cache.set,
+                    cache_key(prompt, route, query),
+                    json.dumps(result, ensure_ascii=False).encode(),
+                )
+                return parsed
+
+        result, route = await self._query(query, global_config)
+
+        # Only the responses which were parsed successfully get cached
+        parsed = await prompt.parse_response(result)
+        await asyncio.to_thread(
+            llm_cache.set,
+            cache_key(prompt, route, query),
+            json.dumps(result, ensure_ascii=False).encode(),
+        )
+        return parsed
 
     async def __call__(self, prompt: Prompt) -> Any:
-        logger = get_logger()
+        global_config = config_snapshot.get()
         query = await prompt.generate()
-        response = await self._request(query)
-        try:
-            result = json.loads(response["choices"][0]["message"]["content"])
-        except (KeyError, IndexError):
-            logger.error(json.dumps(response, indent=2))
-            raise ChatGPTException("Invalid response from ChatGPT.")
-
-        return await prompt.parse_response(result)
+        key = cache_key(prompt, self._router.route(global_config), query)
+        return await self._requests.do(
+            key,
+            lambda: self._complete(key, prompt, query, global_config),
+        )
+
+    def cache_stats(self) -> dict[str, int]:
+        """
+        The size of the response cache and its hit/miss counters
+        """
+
+        return llm_cache.stats()
+
+    def provider_stats(self) -> dict[str, dict]:
+        """
+        The latency, the health and the rate budget of every LLM provider
+        """
+
+        return self._router.stats()
+
+    def session(self) -> AsyncContextManager[HTTPClientPool]:
+        """
+        Keep the pooled connections to the providers open while the block runs,
+        see `HTTPClientPool.session`
+        """
+
+        return self._pool.session()
 
 
 chatgpt = ChatGPTClient()
@@ -0,0 +1,206 @@
+import asyncio
+import json
+from typing import Awaitable, Callable, Hashable
+
+from packages.database import Config
+from packages.log import get_logger
+
+from .models import ChatGPTQuery
+
+__all__ = ["PromptBatcher", "batch_query", "parse_batch"]
+
+BATCH_INSTRUCTIONS = (
+    'You are given a JSON array of inputs, each with its "index" and the "input". '
+    "Follow the instructions above for every input separately and respond with "
+    'a valid JSON object containing a single field - "results" with a list of '
+    'objects, each with the "index" of the input and the "response" - the JSON '
+    "object you would respond with for this input alone."
+)
+
+
+def batch_query(system_message: str, user_messages: list[str]) -> ChatGPTQuery:
+    """
+    Build the query answering several inputs of the same prompt at once
+
+    :param system_message: The system message of the prompt
+    :param user_messages: The inputs
+    :return: The query
+    """
+
+    return ChatGPTQuery(
+        system_message=f"{system_message}\n\n{BATCH_INSTRUCTIONS}",
+        user_message=json.dumps(
+            [
+                {"index": index, "input": message}
+                for index, message in enumerate(user_messages)
+            ],
+            ensure_ascii=False,
+        ),
+    )
+
+
+def parse_batch(response: dict, size: int) -> dict[int, dict]:
+    """
+    Get the responses of the inputs from the response to the `batch_query`.
+    The malformed, duplicate and out of range entries are skipped
+
+    :param response: The response
+    :param size: The number of inputs
+    :return: The response of every answered input by its index
+    """
+
+    results = {}
+    for result in response.get("results") or []:
+        if not isinstance(result, dict):
+            continue
+
+        index = result.get("index")
+        if (
+            isinstance(index, int)
+            and 0 <= index < size
+            and index not in results
+            and isinstance(result.get("response"), dict)
+        ):
+            results[index] = result["response"]
+
+    return results
+
+
+class PromptBatcher:
+    """
+    Gathers the queries of the same prompt into a single request
+
+    The queries with the same system message and model, submitted within
+    the `window`, are sent together as one `batch_query`, and the responses
+    are fanned back out to the callers. The inputs missing from the response
+    are batched again, up to `retries` times, then sent one by one. The failed
+    request is not repeated, the sender has retried it already.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[ChatGPTQuery, Config], Awaitable[tuple[dict, str]]],
+        max_size: int,
+        window: float,
+        retries: int,
+    ):
+        """
+        :param send: Sends the query and returns the parsed JSON of the response
+            and the provider which answered
+        :param max_size: The maximum number of queries in one request
+        :param window: Seconds to wait for more queries of the same prompt
+        :param retries: How many times the missing inputs are batched again
+        """
+
+        self._send = send
+        self._max_size = max_size
+        self._window = window
+        self._retries = retries
+        self._pending: dict[Hashable, list[tuple[str, asyncio.Future]]] = {}
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        self._batches: set[asyncio.Task] = set()
+
+    async def submit(
+        self, query: ChatGPTQuery, global_config: Config
+    ) -> tuple[dict, str]:
+        """
+        Add the query to the batch of its prompt and wait for its response
+
+        :param query: The query
+        :param global_config: The configuration
+        :return: The parsed JSON of the response to the query alone
+            and the provider which answered
+        """
+
+        loop = asyncio.get_running_loop()
+        key = (query.system_message, global_config.model, loop)
+        future = loop.create_future()
+
+        pending = self._pending.setdefault(key, [])
+        pending.append((query.user_message, future))
+        if len(pending) >= self._max_size:
+            self._flush(key, global_config)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(
+                self._window, self._flush, key, global_config
+            )
+
+        return await future
+
+    def _flush(self, key: Hashable, global_config: Config):
+        if timer := self._timers.pop(key, None):
+            timer.cancel()
+
+        items = self._pending.pop(key, [])
+        # The callers which gave up do not need the response
+        items = [(message, future) for message, future in items if not future.done()]
+        if not items:
+            return
+
+        task = asyncio.create_task(self._run(key[0], items, global_config))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _run(
+        self,
+        system_message: str,
+        items: list[tuple[str, asyncio.Future]],
+        global_config: Config,
+    ):
+        logger = get_logger()
+
+        for _ in range(self._retries + 1):
+            if len(items) <= 1:
+                break
+
+            try:
+                response, route = await self._send(
+                    batch_query(system_message, [message for message, _ in items]),
+                    global_config,
+                )
+            except Exception as e:
+                logger.warning(
+                    "Failed to send the batch",
+                    extra={"size": len(items), "error": str(e)},
+                )
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            results = parse_batch(response, len(items))
+            for index, (_, future) in enumerate(items):
+                if index in results and not future.done():
+                    future.set_result((results[index], route))
+
+            logger.info(
+                "Sent the batch",
+                extra={"size": len(items), "missing": len(items) - len(results)},
+            )
+            items = [item for index, item in enumerate(items) if index not in results]
+
+        await asyncio.gather(
+            *(
+                self._run_single(system_message, message, future, global_config)
+                for message, future in items
+            )
+        )
+
+    async def _run_single(
+        self,
+        system_message: str,
+        user_message: str,
+        future: asyncio.Future,
+        global_config: Config,
+    ):
+        try:
+            result = await self._send(
+                ChatGPTQuery(system_message=system_message, user_message=user_message),
+                global_config,
+            )
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
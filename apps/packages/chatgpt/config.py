@@ -1,3 +1,7 @@
+from typing import Literal, Optional
+
+from pydantic import Field
+
 from packages.config import BaseConfig
 
 
@@ -6,7 +10,114 @@ class ChatGPTConfig(BaseConfig):
     ChatGPT configuration
     """
 
-    chatgpt_api_url: str
+    chatgpt_api_url: str = Field(
+        default="https://api.openai.com/v1",
+        description="The base URL of the OpenAI-compatible API",
+    )
+    chatgpt_max_connections: int = Field(
+        default=64,
+        description="The number of simultaneous requests to the API",
+    )
+    chatgpt_timeout: float = Field(
+        default=120.0,
+        description="Seconds to wait for the completion",
+    )
+    chatgpt_batch_size: int = Field(
+        default=8,
+        description="The maximum number of queries of the same prompt sent "
+        "in one request, 1 disables the batching",
+    )
+    chatgpt_batch_window: float = Field(
+        default=0.05,
+        description="Seconds to wait for more queries of the same prompt",
+    )
+    chatgpt_batch_retries: int = Field(
+        default=2,
+        description="How many times the inputs missing from the batched response "
+        "are batched again before they are sent one by one",
+    )
+    chatgpt_rpm: int = Field(
+        default=0,
+        description="Requests per minute allowed by the API, "
+        "0 to take it from the rate limit headers",
+    )
+    chatgpt_tpm: int = Field(
+        default=0,
+        description="Tokens per minute allowed by the API, "
+        "0 to take it from the rate limit headers",
+    )
+    chatgpt_completion_tokens: int = Field(
+        default=512,
+        description="The expected size of a completion in tokens, "
+        "used to estimate the budget of a request before it is sent",
+    )
+    chatgpt_interactive_reserve: float = Field(
+        default=0.2,
+        ge=0,
+        lt=1,
+        description="The share of the budget the bulk crawls leave "
+        "to the interactive requests",
+    )
+    chatgpt_retries: int = Field(
+        default=5,
+        description="How many times the request is retried after 429, 5xx "
+        "or a transport error",
+    )
+    chatgpt_max_attempts: int = Field(
+        default=6,
+        ge=1,
+        description="The total number of requests sent for a query "
+        "across the retries, the hedges and the providers",
+    )
+    chatgpt_providers: list[Literal["openai", "gemini", "local"]] = Field(
+        default=["openai"],
+        description="The LLM providers in the order of preference, the ones "
+        "without the credentials are skipped. The others are only used when listed",
+    )
+    chatgpt_hedging: bool = Field(
+        default=True,
+        description="Whether to race the next provider when the request takes "
+        "longer than the p95 latency of its provider",
+    )
+    chatgpt_hedge_min_samples: int = Field(
+        default=20,
+        description="The number of completions needed to trust the p95 latency",
+    )
+    chatgpt_failover_errors: int = Field(
+        default=3,
+        description="The number of consecutive errors after which "
+        "the provider is skipped",
+    )
+    chatgpt_failover_cooldown: float = Field(
+        default=30.0,
+        description="Seconds the erroring provider is skipped for",
+    )
+    chatgpt_failover_retries: int = Field(
+        default=1,
+        description="How many times the request is retried before it fails over "
+        "to the next provider",
+    )
+    gemini_api_key: Optional[str] = Field(
+        default=None,
+        description="The Gemini API key, enables the Gemini provider",
+    )
+    gemini_api_url: str = Field(
+        default="https://generativelanguage.googleapis.com/v1beta",
+        description="The base URL of the Gemini API",
+    )
+    gemini_model: str = Field(
+        default="gemini-1.5-flash",
+        description="The Gemini model",
+    )
+    local_llm_url: Optional[str] = Field(
+        default=None,
+        description="The base URL of the local OpenAI-compatible server, "
+        "enables the local provider",
+    )
+    local_llm_model: Optional[str] = Field(
+        default=None,
+        description="The model of the local server, defaults to the configured one",
+    )
 
 
-config = ChatGPTConfig()  # pyright: ignore[reportCallIssue]
+config = ChatGPTConfig()
@@ -1,14 +1,17 @@
 import json
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Optional
 
-from packages.database import Config, TheSession
+from packages.database import Config, config_snapshot
 
 from .exceptions import ChatGPTException
 from .models import ChatGPTQuery
 
 
 class Prompt(ABC):
+    # Whether the queries of the prompt may be sent together with other products
+    batchable: bool = False
+
     @abstractmethod
     def __init__(self, *args, **kwargs):
         pass
@@ -23,11 +26,12 @@ class Prompt(ABC):
 
 
 def get_config() -> Config:
-    with TheSession() as session:
-        return session.query(Config).one()
+    return config_snapshot.get()
 
 
 class ExtractProperties(Prompt):
+    batchable = True
+
     def __init__(self, keywords: str):
         self._keywords = keywords
 
@@ -59,6 +63,8 @@ class NormalizeDescription(Prompt):
 
 
 class ExtractKeywords(Prompt):
+    batchable = True
+
     def __init__(self, text: str):
         self._text = text
 
@@ -75,6 +81,81 @@ class ExtractKeywords(Prompt):
         return response["keywords"]
 
 
+class EnrichProduct(Prompt):
+    """
+    Normalize the description, extract its keywords and the properties at once.
+    The system message is composed of the configured description, keywords and
+    properties prompts, and the response of every one of them is expected under
+    its own key, so the prompts stay the single source of truth for both ways.
+    The keywords task is left out when the keywords are extracted locally
+    """
+
+    def __init__(
+        self,
+        description: str,
+        properties: Optional[str] = None,
+        keywords: bool = True,
+    ):
+        self._description = description
+        self._properties = properties
+        self._keywords = keywords
+
+    async def generate(self) -> ChatGPTQuery:
+        config = get_config()
+        tasks = [
+            "You are given a product as a JSON object with its "
+            '"description" and, optionally, its "properties" text. '
+            "Perform the tasks below and respond with a single valid JSON object, "
+            "containing the JSON response of every task under the name of the task. "
+            "Skip the tasks whose input is not given.",
+            'Task "description", the input is the "description" text:\n'
+            + config.description_prompt,
+        ]
+        if self._keywords:
+            tasks.append(
+                'Task "keywords", the input is the normalized text '
+                'from the "description" task:\n' + config.keywords_prompt
+            )
+        tasks.append(
+            'Task "properties", the input is the "properties" text:\n'
+            + config.properties_prompt
+        )
+        system_message = "\n\n".join(tasks)
+
+        product = {"description": self._description}
+        if self._properties is not None:
+            product["properties"] = self._properties
+
+        return ChatGPTQuery(
+            system_message=system_message,
+            user_message=json.dumps(product, ensure_ascii=False),
+        )
+
+    async def parse_response(self, response: dict) -> dict[str, Any]:
+        result = {}
+
+        description = response.get("description")
+        if isinstance(description, dict):
+            description = description.get("text")
+        if isinstance(description, str):
+            result["description"] = description
+
+        keywords = response.get("keywords")
+        if isinstance(keywords, dict):
+            keywords = keywords.get("keywords")
+        if self._keywords and isinstance(keywords, list):
+            result["keywords"] = ", ".join(map(str, keywords))
+
+        properties = response.get("properties")
+        if self._properties is not None and isinstance(properties, dict):
+            result["properties"] = properties
+
+        if not result:
+            raise ChatGPTException("Invalid response from ChatGPT.")
+
+        return result
+
+
 class FindSKU(Prompt):
     def __init__(self, columns: dict[str, str]):
         self._columns = columns
@@ -0,0 +1,529 @@
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Optional
+
+from httpx import Response, TransportError
+
+from packages.database import Config
+from packages.httpclient import HTTPClientPool
+from packages.httpclient.limiter import parse_retry_after
+from packages.log import get_logger
+
+from .config import config
+from .exceptions import ChatGPTException
+from .models import ChatGPTQuery
+from .scheduler import LLMScheduler, backoff_delay, estimate_tokens, llm_priority
+
+__all__ = [
+    "AttemptBudget",
+    "GeminiProvider",
+    "LatencyTracker",
+    "OpenAIProvider",
+    "Provider",
+    "ProviderRouter",
+    "build_providers",
+]
+
+
+class LatencyTracker:
+    """
+    The latencies of the recent successful completions
+    """
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Get the latency percentile
+
+        :param q: The percentile, from 0 to 1
+        :return: The latency in seconds or None if there are no samples
+        """
+
+        if not self._samples:
+            return None
+
+        samples = sorted(self._samples)
+        return samples[round(q * (len(samples) - 1))]
+
+
+class AttemptBudget:
+    """
+    The number of requests a query may still send, shared by the retries,
+    the hedges and the failover, so that they do not multiply
+    """
+
+    def __init__(self, attempts: int):
+        self.left = attempts
+
+    def take(self) -> bool:
+        """
+        Use one attempt
+
+        :return: Whether it was the last one
+        """
+
+        self.left -= 1
+        return self.left <= 0
+
+
+class Provider(ABC):
+    """
+    LLM API responding with JSON objects
+
+    Every provider has its own requests and tokens per minute budget,
+    latency statistics and circuit breaker: after `chatgpt_failover_errors`
+    consecutive errors the provider is skipped for `chatgpt_failover_cooldown`
+    seconds, unless there is no other provider left.
+    """
+
+    def __init__(self, name: str, pool: HTTPClientPool, rpm: int = 0, tpm: int = 0):
+        self.name = name
+        self.latency = LatencyTracker()
+        self._pool = pool
+        self._scheduler = LLMScheduler(
+            rpm=rpm, tpm=tpm, reserve=config.chatgpt_interactive_reserve
+        )
+        self._errors = 0
+        self._open_until = 0.0
+
+    @abstractmethod
+    async def _send(self, query: ChatGPTQuery, global_config: Config) -> Response:
+        """
+        Send the completion request
+        """
+
+    @abstractmethod
+    def _parse(self, body: dict) -> tuple[str, Optional[int]]:
+        """
+        Get the completion text and the number of tokens used from the response body
+        """
+
+    @abstractmethod
+    def model(self, global_config: Config) -> str:
+        """
+        The model answering the queries
+        """
+
+    def route(self, global_config: Config) -> str:
+        """
+        The provider and the model answering the queries
+        """
+
+        return f"{self.name}:{self.model(global_config)}"
+
+    @property
+    def available(self) -> bool:
+        """
+        Whether the circuit breaker lets the requests through
+        """
+
+        return time.monotonic() >= self._open_until
+
+    def _on_error(self):
+        self._errors += 1
+        if self._errors >= config.chatgpt_failover_errors:
+            self._open_until = time.monotonic() + config.chatgpt_failover_cooldown
+            get_logger().warning(
+                "LLM provider is erroring, failing over",
+                extra={"provider": self.name, "errors": self._errors},
+            )
+
+    def _on_success(self, seconds: float):
+        self._errors = 0
+        self.latency.add(seconds)
+
+    async def complete(
+        self,
+        query: ChatGPTQuery,
+        global_config: Config,
+        retries: int,
+        budget: AttemptBudget,
+        sent: Optional[asyncio.Event] = None,
+    ) -> dict:
+        """
+        Get the completion, retrying 429, 5xx and transport errors
+        with the jittered backoff
+
+        :param query: The query
+        :param global_config: The configuration
+        :param retries: How many times to retry
+        :param budget: The attempts left for the query
+        :param sent: Set once the request gets its share of the rate budget
+        :return: The JSON object the model responded with
+        """
+
+        logger = get_logger()
+        tokens = estimate_tokens(query, config.chatgpt_completion_tokens)
+        priority = llm_priority.get()
+
+        attempt = 0
+        while True:
+            last_attempt = budget.take() or attempt == retries
+            reservation = await self._scheduler.acquire(tokens, priority)
+            if sent is not None:
+                sent.set()
+
+            started = time.monotonic()
+            try:
+                response = await self._send(query, global_config)
+            except TransportError as e:
+                self._on_error()
+                if last_attempt:
+                    raise ChatGPTException(f"Failed to reach {self.name}: {e}")
+
+                logger.warning(
+                    "Failed to reach the LLM provider, retrying",
+                    extra={"provider": self.name, "attempt": attempt, "error": str(e)},
+                )
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            self._scheduler.update(response.headers)
+            if response.status_code == 429 or response.status_code >= 500:
+                # The refused request did not use the tokens
+                self._scheduler.settle(reservation, 0)
+                if response.status_code >= 500:
+                    self._on_error()
+                if last_attempt:
+                    raise ChatGPTException(
+                        f"{self.name} responded with {response.status_code}: "
+                        f"{response.text}"
+                    )
+
+                delay = backoff_delay(attempt)
+                if response.status_code == 429:
+                    # The other requests wait for the budget too
+                    delay = (
+                        parse_retry_after(response.headers.get("Retry-After")) or delay
+                    )
+                    self._scheduler.pause(delay)
+
+                logger.warning(
+                    "The LLM provider is unavailable, retrying",
+                    extra={
+                        "provider": self.name,
+                        "attempt": attempt,
+                        "status": response.status_code,
+                        "delay": delay,
+                    },
+                )
+                if response.status_code != 429:
+                    await asyncio.sleep(delay)
+
+                attempt += 1
+                continue
+
+            try:
+                body = response.json()
+                content, used = self._parse(body)
+                result = json.loads(content)
+                if not isinstance(result, dict):
+                    raise ValueError("The completion is not a JSON object")
+            except (KeyError, IndexError, TypeError, ValueError):
+                self._on_error()
+                logger.error(
+                    "Invalid response from the LLM provider",
+                    extra={"provider": self.name, "response": response.text},
+                )
+                raise ChatGPTException(f"Invalid response from {self.name}.")
+
+            self._scheduler.settle(reservation, used or tokens)
+            self._on_success(time.monotonic() - started)
+            return result
+
+    def stats(self) -> dict:
+        """
+        The latency, the health and the rate budget of the provider
+        """
+
+        return {
+            "p50": self.latency.percentile(0.5),
+            "p95": self.latency.percentile(0.95),
+            "samples": len(self.latency),
+            "available": self.available,
+            "rate": self._scheduler.stats(),
+        }
+
+
+class OpenAIProvider(Provider):
+    """
+    OpenAI or any other server with the OpenAI-compatible chat completions API
+    """
+
+    def __init__(
+        self,
+        name: str,
+        pool: HTTPClientPool,
+        url: str,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        rpm: int = 0,
+        tpm: int = 0,
+    ):
+        """
+        :param url: The base URL of the API
+        :param api_key: The API key, defaults to the one in the configuration
+        :param model: The model, defaults to the one in the configuration
+        """
+
+        super().__init__(name, pool, rpm, tpm)
+        self._url = f"{url.rstrip('/')}/chat/completions"
+        self._api_key = api_key
+        self._model = model
+
+    def model(self, global_config: Config) -> str:
+        return self._model or global_config.model
+
+    async def _send(self, query: ChatGPTQuery, global_config: Config) -> Response:
+        return await self._pool.post(
+            self._url,
+            json={
+                "model": self.model(global_config),
+                "response_format": {"type": "json_object"},
+                "messages": [
+                    {"role": "system", "content": query.system_message},
+                    {"role": "user", "content": query.user_message},
+                ],
+                "temperature": 0.1,
+            },
+            headers={
+                "Authorization": f"Bearer {self._api_key or global_config.chatgpt_key}"
+            },
+            timeout=config.chatgpt_timeout,
+        )
+
+    def _parse(self, body: dict) -> tuple[str, Optional[int]]:
+        return (
+            body["choices"][0]["message"]["content"],
+            (body.get("usage") or {}).get("total_tokens"),
+        )
+
+
+class GeminiProvider(Provider):
+    """
+    Google Gemini API
+    """
+
+    def __init__(
+        self,
+        name: str,
+        pool: HTTPClientPool,
+        url: str,
+        api_key: str,
+        model: str,
+        rpm: int = 0,
+        tpm: int = 0,
+    ):
+        super().__init__(name, pool, rpm, tpm)
+        self._url = f"{url.rstrip('/')}/models/{model}:generateContent"
+        self._api_key = api_key
+        self._model = model
+
+    def model(self, global_config: Config) -> str:
+        return self._model
+
+    async def _send(self, query: ChatGPTQuery, global_config: Config) -> Response:
+        return await self._pool.post(
+            self._url,
+            json={
+                "systemInstruction": {"parts": [{"text": query.system_message}]},
+                "contents": [{"role": "user", "parts": [{"text": query.user_message}]}],
+                "generationConfig": {
+                    "responseMimeType": "application/json",
+                    "temperature": 0.1,
+                },
+            },
+            headers={"x-goog-api-key": self._api_key},
+            timeout=config.chatgpt_timeout,
+        )
+
+    def _parse(self, body: dict) -> tuple[str, Optional[int]]:
+        return (
+            body["candidates"][0]["content"]["parts"][0]["text"],
+            (body.get("usageMetadata") or {}).get("totalTokenCount"),
+        )
+
+
+def build_providers(pool: HTTPClientPool) -> list[Provider]:
+    """
+    Create the configured providers in the order of `chatgpt_providers`.
+    The providers without the credentials or the URL are skipped
+
+    :param pool: The pool the requests are sent through
+    :return: The providers
+    """
+
+    providers = []
+    for name in config.chatgpt_providers:
+        if name == "openai":
+            providers.append(
+                OpenAIProvider(
+                    name,
+                    pool,
+                    config.chatgpt_api_url,
+                    rpm=config.chatgpt_rpm,
+                    tpm=config.chatgpt_tpm,
+                )
+            )
+        elif name == "gemini" and config.gemini_api_key:
+            providers.append(
+                GeminiProvider(
+                    name,
+                    pool,
+                    config.gemini_api_url,
+                    config.gemini_api_key,
+                    config.gemini_model,
+                )
+            )
+        elif name == "local" and config.local_llm_url:
+            providers.append(
+                OpenAIProvider(
+                    name,
+                    pool,
+                    config.local_llm_url,
+                    api_key="local",
+                    model=config.local_llm_model,
+                )
+            )
+
+    if not providers:
+        raise ValueError("No LLM provider is configured")
+
+    return providers
+
+
+class ProviderRouter:
+    """
+    Sends the query to the first available provider
+
+    When the provider takes longer than its p95 latency since its request left
+    the rate budget queue, the query is also sent to the next provider and
+    the first valid answer wins (a hedged request).
+    When the provider fails, the query fails over to the next one.
+    All of them share the `chatgpt_max_attempts` requests of the query.
+    """
+
+    def __init__(self, providers: list[Provider], hedging: bool = True):
+        self._providers = providers
+        self._hedging = hedging
+
+    def _hedge_delay(self, provider: Provider) -> Optional[float]:
+        if not self._hedging or len(provider.latency) < config.chatgpt_hedge_min_samples:
+            return None
+
+        return provider.latency.percentile(0.95)
+
+    def _candidates(self) -> list[Provider]:
+        return [
+            provider for provider in self._providers if provider.available
+        ] or self._providers
+
+    def route(self, global_config: Config) -> str:
+        """
+        The provider and the model the next query is sent to first
+
+        :param global_config: The configuration
+        :return: The name of the provider and the model
+        """
+
+        return self._candidates()[0].route(global_config)
+
+    async def complete(
+        self, query: ChatGPTQuery, global_config: Config
+    ) -> tuple[dict, str]:
+        """
+        Get the completion from the fastest healthy provider
+
+        :param query: The query
+        :param global_config: The configuration
+        :return: The JSON object the model responded with and the `route`
+            of the provider which answered
+        """
+
+        logger = get_logger()
+        budget = AttemptBudget(config.chatgpt_max_attempts)
+        candidates = deque(self._candidates())
+
+        def start(
+            provider: Provider,
+            running: dict[asyncio.Task, Provider],
+            sent: Optional[asyncio.Event] = None,
+        ) -> asyncio.Task:
+            # The last resort retries as long as the single provider did
+            retries = (
+                config.chatgpt_failover_retries if candidates else config.chatgpt_retries
+            )
+            task = asyncio.create_task(
+                provider.complete(query, global_config, retries, budget, sent)
+            )
+            running[task] = provider
+            return task
+
+        error: Optional[BaseException] = None
+        while candidates and budget.left > 0:
+            running: dict[asyncio.Task, Provider] = {}
+            sent = asyncio.Event()
+            pending = {start(candidates.popleft(), running, sent)}
+            try:
+                while pending:
+                    primary = next(iter(running.values()))
+                    timeout = (
+                        self._hedge_delay(primary)
+                        if len(running) == 1 and candidates and budget.left > 0
+                        else None
+                    )
+                    if timeout is not None and not sent.is_set():
+                        # The hedge clock starts once the request is sent,
+                        # not while it waits for the rate budget
+                        waiter = asyncio.create_task(sent.wait())
+                        await asyncio.wait(
+                            pending | {waiter}, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        waiter.cancel()
+                        if not sent.is_set():
+                            timeout = None
+
+                    done, pending = await asyncio.wait(
+                        pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if not done:
+                        hedge = candidates.popleft()
+                        logger.info(
+                            "The LLM provider is slow, hedging the request",
+                            extra={"provider": primary.name, "hedge": hedge.name},
+                        )
+                        pending.add(start(hedge, running))
+                        continue
+
+                    for task in done:
+                        if (error := task.exception()) is None:
+                            return task.result(), running[task].route(global_config)
+
+                        logger.warning(
+                            "The LLM provider failed",
+                            extra={"provider": running[task].name, "error": str(error)},
+                        )
+            finally:
+                for task in pending:
+                    task.cancel()
+
+        raise error or ChatGPTException("No LLM provider is available.")
+
+    def stats(self) -> dict[str, dict]:
+        """
+        The statistics of every provider
+        """
+
+        return {provider.name: provider.stats() for provider in self._providers}
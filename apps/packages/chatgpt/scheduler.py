@@ -0,0 +1,312 @@
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Mapping, Optional
+
+from .models import ChatGPTQuery
+from .tokens import CHARS_PER_TOKEN
+
+__all__ = [
+    "LLMScheduler",
+    "Priority",
+    "Reservation",
+    "backoff_delay",
+    "estimate_tokens",
+    "llm_priority",
+    "parse_reset",
+]
+
+# The budgets of the API are per minute
+WINDOW = 60.0
+# The longest delay between the retries, before the jitter
+MAX_BACKOFF = 60.0
+
+
+class Priority(IntEnum):
+    """
+    The lower the value, the earlier the request gets the budget
+    """
+
+    INTERACTIVE = 0
+    BULK = 1
+
+
+# The priority of the LLM requests made in the current context
+llm_priority: ContextVar[Priority] = ContextVar(
+    "llm_priority", default=Priority.INTERACTIVE
+)
+
+
+def estimate_tokens(query: ChatGPTQuery, completion_tokens: int) -> int:
+    """
+    Estimate the number of tokens the request will use, before it is sent
+
+    :param query: The query
+    :param completion_tokens: The expected size of the completion
+    :return: The number of tokens
+    """
+
+    characters = len(query.system_message) + len(query.user_message)
+    return characters // CHARS_PER_TOKEN + completion_tokens
+
+
+def backoff_delay(attempt: int) -> float:
+    """
+    The exponential delay before the next attempt, with the jitter which keeps
+    the concurrent requests from retrying at the same moment
+
+    :param attempt: The number of the failed attempt, starting from 0
+    :return: The delay in seconds
+    """
+
+    delay = min(MAX_BACKOFF, 2.0**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the reset time of the `x-ratelimit-reset-*` headers, like `6m0s` or `20ms`
+
+    :param value: The header value
+    :return: The delay in seconds or None
+    """
+
+    if not value:
+        return None
+
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value.strip())
+    if not parts:
+        return None
+
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+class Reservation:
+    """
+    Represents the budget taken by a single request
+    """
+
+    __slots__ = ("started", "tokens")
+
+    def __init__(self, started: float, tokens: int):
+        self.started = started
+        self.tokens = tokens
+
+
+class LLMScheduler:
+    """
+    Requests-per-minute and tokens-per-minute budget of the LLM API
+
+    Every request reserves its estimated tokens in the sliding minute window
+    before it is sent, and the estimate is replaced with the actual usage
+    once the response arrives. The waiting requests get the budget in the order
+    of their priority. When the budgets are not configured, they are taken
+    from the `x-ratelimit-limit-*` headers of the API. The bulk requests leave
+    the `reserve` share of the remaining budget reported by the API to the
+    interactive ones, which also protects the requests of the other processes.
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, reserve: float = 0.0):
+        """
+        :param rpm: Requests per minute, 0 to learn it from the API
+        :param tpm: Tokens per minute, 0 to learn it from the API
+        :param reserve: The share of the budget the bulk requests do not use
+        """
+
+        self._rpm = rpm
+        self._tpm = tpm
+        self._reserve = reserve
+        self._window: deque[Reservation] = deque()
+        self._queue: list[tuple[int, int]] = []
+        self._counter = itertools.count()
+        self._paused_until = 0.0
+        # The budget left according to the API and when it was reported
+        self._remaining_requests: Optional[int] = None
+        self._remaining_tokens: Optional[int] = None
+        self._reported_at = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _bind_loop(self) -> asyncio.Condition:
+        """
+        Drop the waiters of another event loop
+        """
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._condition is None:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self._queue = []
+
+        return self._condition
+
+    def _expire(self, now: float):
+        while self._window and self._window[0].started <= now - WINDOW:
+            self._window.popleft()
+
+        if now - self._reported_at >= WINDOW:
+            self._remaining_requests = self._remaining_tokens = None
+
+    def _delay(self, tokens: int, priority: int) -> float:
+        """
+        Seconds until the request fits into the budget, 0 if it fits now
+        """
+
+        now = time.monotonic()
+        self._expire(now)
+        if self._paused_until > now:
+            return self._paused_until - now
+
+        delays = [0.0]
+        if self._rpm and len(self._window) >= self._rpm:
+            delays.append(self._window[0].started + WINDOW - now)
+
+        used = sum(reservation.tokens for reservation in self._window)
+        if self._tpm and used + tokens > self._tpm:
+            # Wait until enough of the earlier requests leave the window
+            for reservation in self._window:
+                used -= reservation.tokens
+                if used + tokens <= self._tpm:
+                    delays.append(reservation.started + WINDOW - now)
+                    break
+
+        if priority > Priority.INTERACTIVE and self._reserve:
+            if self._remaining_requests is not None and self._rpm:
+                if self._remaining_requests <= self._rpm * self._reserve:
+                    delays.append(self._reported_at + WINDOW - now)
+            if self._remaining_tokens is not None and self._tpm:
+                if self._remaining_tokens - tokens < self._tpm * self._reserve:
+                    delays.append(self._reported_at + WINDOW - now)
+
+        return max(0.0, max(delays))
+
+    async def acquire(
+        self, tokens: int, priority: int = Priority.INTERACTIVE
+    ) -> Reservation:
+        """
+        Wait until the request fits into the budget and reserve it
+
+        :param tokens: The estimated number of tokens
+        :param priority: The priority of the request
+        :return: The reservation, to be settled with the actual usage
+        """
+
+        condition = self._bind_loop()
+        entry = (int(priority), next(self._counter))
+        heapq.heappush(self._queue, entry)
+        try:
+            async with condition:
+                while True:
+                    delay = None
+                    if self._queue[0] == entry:
+                        delay = self._delay(tokens, priority)
+                        if delay <= 0:
+                            heapq.heappop(self._queue)
+                            reservation = Reservation(time.monotonic(), tokens)
+                            self._window.append(reservation)
+                            condition.notify_all()
+                            return reservation
+
+                    try:
+                        await asyncio.wait_for(condition.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+        except BaseException:
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._notify()
+            raise
+
+    def _notify(self):
+        """
+        Wake the waiters up, when the budget is freed outside of `acquire`
+        """
+
+        condition = self._condition
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        if condition is None or self._loop is not loop:
+            return
+
+        async def notify():
+            async with condition:
+                condition.notify_all()
+
+        loop.create_task(notify())
+
+    def settle(self, reservation: Reservation, tokens: int):
+        """
+        Replace the estimate of the request with its actual usage
+
+        :param reservation: The reservation of the request
+        :param tokens: The number of tokens used
+        """
+
+        freed = tokens < reservation.tokens
+        reservation.tokens = tokens
+        if freed:
+            self._notify()
+
+    def pause(self, delay: float):
+        """
+        Stop sending the requests, after the API refused one
+
+        :param delay: Seconds to wait
+        """
+
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def update(self, headers: Mapping[str, str]):
+        """
+        Learn the budget from the rate limit headers of the response
+
+        :param headers: The headers of the response
+        """
+
+        def integer(name: str) -> Optional[int]:
+            value = headers.get(name)
+            return int(value) if value and value.isdigit() else None
+
+        if not self._rpm and (limit := integer("x-ratelimit-limit-requests")):
+            self._rpm = limit
+        if not self._tpm and (limit := integer("x-ratelimit-limit-tokens")):
+            self._tpm = limit
+
+        remaining_requests = integer("x-ratelimit-remaining-requests")
+        remaining_tokens = integer("x-ratelimit-remaining-tokens")
+        if remaining_requests is None and remaining_tokens is None:
+            return
+
+        self._remaining_requests = remaining_requests
+        self._remaining_tokens = remaining_tokens
+        self._reported_at = time.monotonic()
+
+        if remaining_requests == 0:
+            self.pause(parse_reset(headers.get("x-ratelimit-reset-requests")) or 1.0)
+        if remaining_tokens == 0:
+            self.pause(parse_reset(headers.get("x-ratelimit-reset-tokens")) or 1.0)
+
+    def stats(self) -> dict[str, int]:
+        """
+        The usage of the current minute window
+        """
+
+        self._expire(time.monotonic())
+        return {
+            "rpm": self._rpm,
+            "tpm": self._tpm,
+            "requests": len(self._window),
+            "tokens": sum(reservation.tokens for reservation in self._window),
+            "waiting": len(self._queue),
+        }
@@ -0,0 +1,173 @@
+import re
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Any, Optional
+
+from packages.log import get_logger
+
+__all__ = [
+    "CHARS_PER_TOKEN",
+    "chunk_tokens",
+    "count_tokens",
+    "dedup_lines",
+    "prepare_input",
+    "token_usage",
+]
+
+# Characters per token, on the safe side for the Cyrillic texts
+CHARS_PER_TOKEN = 3
+
+# The tokens of the LLM inputs in the current context: "input" as extracted,
+# "sent" after the preprocessing, "saved" and the number of "chunked" inputs.
+# Set by the flows to report them per source
+token_usage: ContextVar[Optional[Counter]] = ContextVar("token_usage", default=None)
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[Any]:
+    """
+    Get the tokenizer of the recent OpenAI models, when `tiktoken` is installed
+    """
+
+    if find_spec("tiktoken") is None:
+        return None
+
+    import tiktoken
+
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # The encoding is downloaded on the first use
+        get_logger().warning("Failed to load the tokenizer", extra={"error": str(e)})
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of the text, or estimate them if there is no tokenizer
+
+    :param text: The text
+    :return: The number of tokens
+    """
+
+    if (encoding := _encoding()) is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def dedup_lines(text: str, min_block: int = 3, min_chars: int = 40) -> str:
+    """
+    Drop the empty lines and the repeated ones, like the same spec table
+    rendered for the desktop and the mobile layouts. A short line is dropped only
+    when it repeats the previous one or is part of a repeated block of `min_block`
+    lines, the same "Yes" of different properties is kept
+
+    :param text: The text
+    :param min_block: The shortest repeated block of the short lines
+    :param min_chars: The shortest line dropped whenever it is repeated
+    :return: The text with the repeated lines and blocks kept once
+    """
+
+    lines = [line.strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    keys = [re.sub(r"\s+", " ", line).casefold() for line in lines]
+
+    positions: dict[str, list[int]] = {}
+    kept: list[str] = []
+    index = 0
+    while index < len(lines):
+        key = keys[index]
+        # The longest block starting here which is found earlier in the text,
+        # looking at the few last occurrences of the line only
+        repeated = 0
+        for start in positions.get(key, [])[-8:]:
+            size = 0
+            while (
+                index + size < len(lines)
+                and start + size < index
+                and keys[start + size] == keys[index + size]
+            ):
+                size += 1
+            repeated = max(repeated, size)
+
+        if repeated >= min_block or (repeated and len(key) >= min_chars):
+            skip = repeated
+        elif index and keys[index - 1] == key:
+            skip = 1
+        else:
+            kept.append(lines[index])
+            skip = 1
+
+        for offset in range(skip):
+            positions.setdefault(keys[index + offset], []).append(index + offset)
+        index += skip
+
+    return "\n".join(kept)
+
+
+def chunk_tokens(text: str, budget: int) -> list[str]:
+    """
+    Split the text into the chunks of about `budget` tokens at the line boundaries.
+    The lines longer than the budget are split as well
+
+    :param text: The text
+    :param budget: The token budget of a chunk
+    :return: The chunks
+    """
+
+    chunks = []
+    lines: list[str] = []
+    used = 0
+    for line in text.splitlines():
+        tokens = count_tokens(line)
+        while tokens > budget:
+            # Cut the line proportionally, the tokens are roughly of the same size
+            cut = max(1, len(line) * budget // tokens)
+            if lines:
+                chunks.append("\n".join(lines))
+                lines, used = [], 0
+
+            chunks.append(line[:cut])
+            line = line[cut:]
+            tokens = count_tokens(line)
+
+        if used + tokens > budget and lines:
+            chunks.append("\n".join(lines))
+            lines, used = [], 0
+
+        if line:
+            lines.append(line)
+            used += tokens
+
+    if lines:
+        chunks.append("\n".join(lines))
+
+    return chunks
+
+
+def prepare_input(text: str, budget: int, max_chunks: int = 1) -> list[str]:
+    """
+    Deduplicate the lines of the LLM input and split it into the chunks
+    of the budget. The chunks past `max_chunks` are dropped.
+    The tokens are counted in the `token_usage` of the context
+
+    :param text: The input
+    :param budget: The token budget of a chunk
+    :param max_chunks: The number of chunks to keep
+    :return: The chunks, a single one if the input fits into the budget
+    """
+
+    before = count_tokens(text)
+    chunks = chunk_tokens(dedup_lines(text), budget)[:max_chunks]
+
+    if (usage := token_usage.get()) is not None:
+        after = sum(map(count_tokens, chunks))
+        usage["input"] += before
+        usage["sent"] += after
+        usage["saved"] += before - after
+        usage["chunked"] += len(chunks) > 1
+
+    return chunks
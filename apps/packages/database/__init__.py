@@ -1,5 +1,12 @@
 # flake8: noqa
 from .database import SQLALCHEMY_DATABASE_URL, Base, TheSession
 from .models import *
+from .snapshot import ConfigSnapshot, config_snapshot
 
-__all__ = ["TheSession", "SQLALCHEMY_DATABASE_URL", "Base"]
+__all__ = [
+    "TheSession",
+    "SQLALCHEMY_DATABASE_URL",
+    "Base",
+    "ConfigSnapshot",
+    "config_snapshot",
+]
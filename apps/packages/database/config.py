@@ -1,3 +1,5 @@
+from pydantic import Field
+
 from packages.config import BaseConfig
 
 
@@ -11,6 +13,13 @@ class DatabaseConfig(BaseConfig):
     db_user: str
     db_password: str
     db_name: str
+    config_snapshot_ttl: float = Field(
+        default=1.0,
+        description=(
+            "Seconds the configuration is used in every process before its version "
+            "is checked against the database"
+        ),
+    )
 
 
 config = DatabaseConfig()  # pyright: ignore[reportCallIssue]
@@ -1,7 +1,7 @@
 import enum
 import uuid
 
-from sqlalchemy import Boolean, DateTime, Enum, Integer, Text
+from sqlalchemy import Boolean, DateTime, Enum, Index, Integer, Text
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import mapped_column
 
@@ -109,16 +109,46 @@ class WebsiteSource(Base):
         Text,
         comment="Regex that matches the pagination URLs on the website",
     )
+    discovery_mode = mapped_column(
+        Text,
+        nullable=False,
+        default="pagination",
+        server_default="pagination",
+        comment=(
+            "How the products are discovered: `pagination` of the listing pages, "
+            "`sitemap` or `auto` (sitemap if the website has one)"
+        ),
+    )
+    sitemap_url = mapped_column(
+        Text,
+        comment="The URL of the sitemap, discovered via robots.txt if not set",
+    )
     props_xpaths = mapped_column(
         JSONB,
         comment="Mapping between the website properties and the XPATHs",
     )
+    listing_item_xpath = mapped_column(
+        Text,
+        comment="XPath of the repeating product item on the listing pages",
+    )
+    listing_xpaths = mapped_column(
+        JSONB,
+        comment="Mapping between the website properties and the XPATHs relative to the listing item",
+    )
     state = mapped_column(
         Enum(WebsiteSourceState),
         nullable=False,
         default=WebsiteSourceState.CREATED,
         comment="The FSM state of the website source",
     )
+    crawl_stats = mapped_column(
+        JSONB,
+        comment="Statistics of the last data collection (scheduling window, etc.)",
+    )
+    boilerplate = mapped_column(
+        JSONB,
+        comment="The hashes of the text blocks repeated across the product pages",
+    )
 
 
 class ExcelSource(Base):
@@ -167,6 +197,10 @@ class Product(Base):
     """
 
     __tablename__ = "product"
+    __table_args__ = (
+        # The known URLs of the source are loaded at the start of every data collection
+        Index("ix_product_source_id_url", "source_id", "url"),
+    )
 
     id = mapped_column(
         UUID(as_uuid=False),
@@ -189,6 +223,10 @@ class Product(Base):
         JSONB,
         comment="The data of the product for Satu.kz",
     )
+    fingerprints = mapped_column(
+        JSONB,
+        comment="The hashes of the raw fields the data was produced from",
+    )
     last_processed = mapped_column(
         DateTime,
         comment="The last time the product was processed",
@@ -197,6 +235,19 @@ class Product(Base):
         UUID(as_uuid=False),
         comment="The UUID of the source",
     )
+    etag = mapped_column(
+        Text,
+        comment="The ETag of the product page the data was extracted from",
+    )
+    last_modified = mapped_column(
+        Text,
+        comment="The Last-Modified of the product page the data was extracted from",
+    )
+    revision = mapped_column(
+        Text,
+        comment="The hash of the extraction rules and the LLM settings the data was "
+        "extracted with",
+    )
     reprocessing = mapped_column(
         Boolean,
         nullable=False,
@@ -239,6 +290,36 @@ class Config(Base):
         nullable=False,
         comment="The number of concurrent products to scrape",
     )
+    scheduling_mode = mapped_column(
+        Text,
+        nullable=False,
+        default="adaptive",
+        server_default="adaptive",
+        comment=(
+            "How the requests are scheduled: `adaptive` per-domain windows "
+            "or `static` batches of `pages_concurrency`/`products_concurrency`"
+        ),
+    )
+    keywords_mode = mapped_column(
+        Text,
+        nullable=False,
+        default="llm",
+        server_default="llm",
+        comment=(
+            "How the keywords are extracted: by the `llm`, `local`ly with TF-IDF "
+            "or `local-then-llm` when the local keywords are not confident"
+        ),
+    )
+    product_ttl = mapped_column(
+        Integer,
+        nullable=False,
+        default=3600,
+        server_default="3600",
+        comment=(
+            "Seconds after the extraction during which the product is not fetched "
+            "again by the data collection, 0 to always fetch"
+        ),
+    )
     required = mapped_column(
         JSONB,
         nullable=False,
@@ -269,3 +350,10 @@ class Config(Base):
         nullable=False,
         comment="The prompt used to match columns between Excel and Satu",
     )
+    version = mapped_column(
+        Integer,
+        nullable=False,
+        default=1,
+        server_default="1",
+        comment="Incremented on every update, so the processes notice the change",
+    )
@@ -0,0 +1,68 @@
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import select
+
+from .config import config
+from .database import TheSession
+from .models import Config
+
+__all__ = ["ConfigSnapshot", "config_snapshot"]
+
+
+class ConfigSnapshot:
+    """
+    In-process snapshot of the `Config` row
+
+    Every update of the configuration increments its version. The snapshot is used
+    for `config_snapshot_ttl` seconds, then only the version is read, and the whole
+    row is read again once the version differs, so every process picks the update
+    up within the TTL without reading the row on every use.
+    """
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._config: Optional[Config] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> Config:
+        """
+        Get the configuration, detached from the session
+
+        :return: The configuration
+        """
+
+        with self._lock:
+            if (
+                self._config is not None
+                and time.monotonic() - self._checked_at <= self._ttl
+            ):
+                return self._config
+
+            with TheSession() as session:
+                if self._config is not None:
+                    version = session.scalars(select(Config.version)).one()
+                    if version == self._config.version:
+                        self._checked_at = time.monotonic()
+                        return self._config
+
+                global_config = session.query(Config).one()
+                session.expunge(global_config)
+
+            self._config = global_config
+            self._checked_at = time.monotonic()
+
+            return self._config
+
+    def invalidate(self):
+        """
+        Drop the snapshot, so that the next `get` reads the database
+        """
+
+        with self._lock:
+            self._config = None
+
+
+config_snapshot = ConfigSnapshot(config.config_snapshot_ttl)
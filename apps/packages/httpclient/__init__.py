@@ -0,0 +1,3 @@
+from .pool import HTTPClientPool, adaptive_scheduling, http_pool
+
+__all__ = ["HTTPClientPool", "adaptive_scheduling", "http_pool"]
@@ -0,0 +1,52 @@
+from pydantic import Field
+
+from packages.config import BaseConfig
+
+
+class HTTPClientConfig(BaseConfig):
+    """
+    Shared HTTP client configuration
+    """
+
+    http_max_connections: int = Field(
+        default=100,
+        description="The total number of connections kept by the pool",
+    )
+    http_max_connections_per_host: int = Field(
+        default=8,
+        description=(
+            "The number of simultaneous requests allowed to a single host "
+            "when the adaptive scheduling is disabled"
+        ),
+    )
+    http_adaptive_initial_window: int = Field(
+        default=2,
+        description="The initial per-host window of the adaptive scheduling",
+    )
+    http_adaptive_max_window: int = Field(
+        default=32,
+        description="The largest per-host window the adaptive scheduling may grow to",
+    )
+    http_retries: int = Field(
+        default=2,
+        description="How many times to retry the request after 429, 503 or a timeout",
+    )
+    http_keepalive_expiry: float = Field(
+        default=30.0,
+        description="Seconds an idle keep-alive connection is kept open",
+    )
+    http_timeout: float = Field(
+        default=30.0,
+        description="Request timeout in seconds",
+    )
+    http2: bool = Field(
+        default=False,
+        description="Whether to negotiate HTTP/2 when the server supports it",
+    )
+    user_agents_pool_size: int = Field(
+        default=32,
+        description="The number of User-Agent strings precomputed for rotation",
+    )
+
+
+config = HTTPClientConfig()
@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+
+__all__ = ["AdaptiveLimiter", "parse_retry_after"]
+
+# Weight of the latest observation in the moving averages
+SMOOTHING = 0.2
+# How much slower than the best observed latency the host may get before we back off
+LATENCY_TOLERANCE = 2.0
+# Error rate above which the window stops growing and starts shrinking
+ERROR_RATE_THRESHOLD = 0.1
+# The best observed latency slowly drifts up, so that one lucky request does not
+# pin the baseline forever
+BASELINE_DRIFT = 0.01
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the `Retry-After` header
+
+    :param value: The header value, either delay in seconds or HTTP-date
+    :return: The delay in seconds or None
+    """
+
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency window of a single host
+
+    The window grows by one request per window of healthy responses and is halved
+    when the host responds with 429/503 or times out. When the host sends
+    `Retry-After`, no new requests are started until the delay passes.
+    When `adaptive` is disabled, the window stays fixed and only `Retry-After`
+    is honored.
+    """
+
+    def __init__(self, initial: int, maximum: int, adaptive: bool = True):
+        self._window = float(initial)
+        self._maximum = float(maximum)
+        self._adaptive = adaptive
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+        self._paused_until = 0.0
+        self._latency: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._error_rate = 0.0
+
+    @property
+    def window(self) -> int:
+        """
+        The current number of simultaneous requests allowed
+        """
+
+        return max(1, int(self._window))
+
+    def snapshot(self) -> dict:
+        """
+        The current state of the limiter, suitable for logging and storing
+        """
+
+        return {
+            "window": self.window,
+            "in_flight": self._in_flight,
+            "latency": round(self._latency, 3) if self._latency is not None else None,
+            "error_rate": round(self._error_rate, 3),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 1),
+        }
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Wait until the request fits into the window and the host is not paused
+        """
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.window)
+            self._in_flight += 1
+
+        try:
+            while (delay := self._paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+
+            yield
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self, latency: float):
+        """
+        Register a healthy response
+
+        :param latency: The time it took to receive the response, in seconds
+        """
+
+        self._error_rate *= 1 - SMOOTHING
+        self._latency = (
+            latency
+            if self._latency is None
+            else self._latency * (1 - SMOOTHING) + latency * SMOOTHING
+        )
+        self._baseline = (
+            self._latency
+            if self._baseline is None
+            else min(self._latency, self._baseline * (1 + BASELINE_DRIFT))
+        )
+
+        if not self._adaptive:
+            return
+
+        if (
+            self._latency > self._baseline * LATENCY_TOLERANCE
+            or self._error_rate > ERROR_RATE_THRESHOLD
+        ):
+            self._window = max(1.0, self._window * 0.9)
+        else:
+            self._window = min(self._maximum, self._window + 1 / self._window)
+
+    def on_error(self):
+        """
+        Register a failed request which does not indicate overload (e.g. 500)
+        """
+
+        self._error_rate = self._error_rate * (1 - SMOOTHING) + SMOOTHING
+        if self._adaptive and self._error_rate > ERROR_RATE_THRESHOLD:
+            self._window = max(1.0, self._window * 0.9)
+
+    def on_overload(self, retry_after: Optional[float] = None):
+        """
+        Register a response telling us to slow down (429, 503 or a timeout)
+
+        :param retry_after: The delay requested by the host, in seconds
+        """
+
+        self._error_rate = self._error_rate * (1 - SMOOTHING) + SMOOTHING
+        if self._adaptive:
+            self._window = max(1.0, self._window / 2)
+
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
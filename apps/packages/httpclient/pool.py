@@ -0,0 +1,328 @@
+import asyncio
+import contextlib
+import itertools
+import time
+from contextvars import ContextVar
+from importlib.util import find_spec
+from typing import AsyncIterator, Iterator, Optional
+from urllib.parse import urlparse
+
+from fake_useragent import UserAgent
+from httpx import AsyncClient, Limits, Response, Timeout, TimeoutException
+from httpx._decoders import SUPPORTED_DECODERS
+
+from packages.log import get_logger
+
+from .config import config
+from .limiter import AdaptiveLimiter, parse_retry_after
+
+__all__ = ["HTTPClientPool", "adaptive_scheduling", "http_pool"]
+
+# Whether the requests made in the current context, like a flow run, are scheduled
+# by the adaptive per-host windows. Falls back to the mode of the pool when not set
+adaptive_scheduling: ContextVar[Optional[bool]] = ContextVar(
+    "adaptive_scheduling", default=None
+)
+
+
+def _accept_encoding() -> str:
+    """
+    Build the `Accept-Encoding` header out of the decoders httpx actually has,
+    so that the server never responds with the encoding we are unable to decode.
+    Having the `zstandard` package is not enough, the older httpx do not use it
+    """
+
+    return ", ".join(
+        encoding for encoding in SUPPORTED_DECODERS if encoding != "identity"
+    )
+
+
+class HTTPClientPool:
+    """
+    Process-wide pool of keep-alive HTTP connections
+
+    The underlying client is created lazily and bound to the running event loop,
+    so every Prefect flow run reuses the same TCP/TLS connections for all of its
+    requests instead of doing a handshake for each URL. Requests to each host are
+    scheduled by the `AdaptiveLimiter` of that host.
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: Optional[int] = None,
+        rotate_user_agents: bool = True,
+        adaptive: bool = True,
+        retries: Optional[int] = None,
+    ):
+        self._max_connections_per_host = (
+            max_connections_per_host or config.http_max_connections_per_host
+        )
+        self._rotate_user_agents = rotate_user_agents
+        self._adaptive = adaptive
+        self._retries = config.http_retries if retries is None else retries
+        self._client: Optional[AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # The limiters of the hosts, separate for either scheduling mode
+        self._limiters: dict[tuple[str, bool], AdaptiveLimiter] = {}
+        self._user_agents: Optional[Iterator[str]] = None
+        self._sessions = 0
+        self._closing: set[asyncio.Future] = set()
+
+    @staticmethod
+    async def _close_client(client: AsyncClient):
+        try:
+            await client.aclose()
+        except RuntimeError:
+            # The client was bound to the event loop which is already closed
+            get_logger().warning("Failed to gracefully close the HTTP client")
+
+    def _bind_loop(self):
+        """
+        Drop the client and the limiters created in another event loop,
+        closing the connections of the stale client
+        """
+
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        stale, stale_loop = self._client, self._loop
+        self._loop = loop
+        self._client = None
+        self._limiters = {}
+
+        if stale is None or stale.is_closed:
+            return
+
+        if stale_loop is not None and stale_loop.is_running():
+            # The connections are closed by the loop they belong to
+            future = asyncio.run_coroutine_threadsafe(
+                self._close_client(stale), stale_loop
+            )
+        else:
+            future = loop.create_task(self._close_client(stale))
+
+        self._closing.add(future)
+        future.add_done_callback(self._closing.discard)
+
+    @property
+    def client(self) -> AsyncClient:
+        """
+        Get the client bound to the current event loop, creating it if needed
+        """
+
+        self._bind_loop()
+        if self._client is None or self._client.is_closed:
+            self._client = AsyncClient(
+                http2=config.http2 and find_spec("h2") is not None,
+                limits=Limits(
+                    max_connections=config.http_max_connections,
+                    max_keepalive_connections=config.http_max_connections,
+                    keepalive_expiry=config.http_keepalive_expiry,
+                ),
+                timeout=Timeout(config.http_timeout),
+                headers={"Accept-Encoding": _accept_encoding()},
+                follow_redirects=True,
+            )
+
+        return self._client
+
+    @property
+    def user_agent(self) -> str:
+        """
+        Get the next User-Agent from the precomputed rotation
+        """
+
+        if self._user_agents is None:
+            generator = UserAgent(browsers=["chrome"], os=["macos"], platforms=["pc"])
+            self._user_agents = itertools.cycle(
+                {generator.random for _ in range(config.user_agents_pool_size)}
+            )
+
+        return next(self._user_agents)
+
+    @property
+    def adaptive(self) -> bool:
+        """
+        Whether the requests of the current context use the adaptive per-host windows,
+        see `adaptive_scheduling`
+        """
+
+        adaptive = adaptive_scheduling.get()
+        return self._adaptive if adaptive is None else adaptive
+
+    def limiter(self, url: str) -> AdaptiveLimiter:
+        """
+        Get the limiter of the host of the URL in the scheduling mode
+        of the current context
+
+        :param url: Any URL of the host
+        :return: The limiter
+        """
+
+        self._bind_loop()
+        key = (urlparse(url).hostname or "", self.adaptive)
+        if key not in self._limiters:
+            self._limiters[key] = (
+                AdaptiveLimiter(
+                    initial=config.http_adaptive_initial_window,
+                    maximum=config.http_adaptive_max_window,
+                )
+                if key[1]
+                else AdaptiveLimiter(
+                    initial=self._max_connections_per_host,
+                    maximum=self._max_connections_per_host,
+                    adaptive=False,
+                )
+            )
+
+        return self._limiters[key]
+
+    @property
+    def max_window(self) -> int:
+        """
+        The largest number of simultaneous requests a single host may get
+        in the scheduling mode of the current context
+        """
+
+        return (
+            config.http_adaptive_max_window
+            if self.adaptive
+            else self._max_connections_per_host
+        )
+
+    def windows(self) -> dict[str, int]:
+        """
+        The current window of every host requested so far
+        in the scheduling mode of the current context
+        """
+
+        adaptive = self.adaptive
+        return {
+            host: limiter.window
+            for (host, mode), limiter in self._limiters.items()
+            if mode == adaptive
+        }
+
+    async def request(self, method: str, url: str, **kwargs) -> Response:
+        """
+        Perform the request through the shared client.
+        429, 503 and timeouts are retried after the delay requested by the host
+
+        :param method: The HTTP method
+        :param url: The URL to request
+        :return: The response with the body already read
+        """
+
+        client = self.client
+        limiter = self.limiter(url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if self._rotate_user_agents:
+            headers.setdefault("User-Agent", self.user_agent)
+
+        attempt = 0
+        while True:
+            async with limiter.slot():
+                started = time.monotonic()
+                try:
+                    response = await client.request(
+                        method, url, headers=headers, **kwargs
+                    )
+                except TimeoutException:
+                    limiter.on_overload(2**attempt)
+                    if attempt == self._retries:
+                        raise
+
+                    attempt += 1
+                    continue
+
+            if response.status_code in {429, 503}:
+                limiter.on_overload(
+                    parse_retry_after(response.headers.get("Retry-After")) or 2**attempt
+                )
+                if attempt < self._retries:
+                    attempt += 1
+                    continue
+            elif response.status_code >= 500:
+                limiter.on_error()
+            else:
+                limiter.on_success(time.monotonic() - started)
+
+            return response
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[Response]:
+        """
+        Perform the request through the shared client without reading the body.
+        The slot of the host is held until the body is consumed, the request
+        is not retried
+
+        :param method: The HTTP method
+        :param url: The URL to request
+        :return: The response with the body to be iterated over
+        """
+
+        client = self.client
+        limiter = self.limiter(url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if self._rotate_user_agents:
+            headers.setdefault("User-Agent", self.user_agent)
+
+        async with limiter.slot():
+            started = time.monotonic()
+            try:
+                async with client.stream(
+                    method, url, headers=headers, **kwargs
+                ) as response:
+                    if response.status_code in {429, 503}:
+                        limiter.on_overload(
+                            parse_retry_after(response.headers.get("Retry-After"))
+                        )
+                    elif response.status_code >= 500:
+                        limiter.on_error()
+                    else:
+                        limiter.on_success(time.monotonic() - started)
+
+                    yield response
+            except TimeoutException:
+                limiter.on_overload()
+                raise
+
+    async def get(self, url: str, **kwargs) -> Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        """
+        Close all the pooled connections
+        """
+
+        if self._client is None or self._client.is_closed:
+            return
+
+        await self._close_client(self._client)
+        self._client = None
+        self._loop = None
+        self._limiters = {}
+
+    @contextlib.asynccontextmanager
+    async def session(self) -> AsyncIterator["HTTPClientPool"]:
+        """
+        Keep the pooled connections open while the block runs.
+        The last of the simultaneous blocks to exit closes them
+
+        :return: The pool
+        """
+
+        self._sessions += 1
+        try:
+            yield self
+        finally:
+            self._sessions -= 1
+            if not self._sessions:
+                await self.aclose()
+
+
+http_pool = HTTPClientPool()
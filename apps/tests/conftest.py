@@ -0,0 +1,17 @@
+import os
+
+# The configurations are read when the packages are imported. The tests do not
+# reach the database, MinIO or the backend, but the settings without defaults
+# must be set for the modules to import
+for name, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USER": "test",
+    "DB_PASSWORD": "test",
+    "DB_NAME": "test",
+    "MINIO_ENDPOINT": "localhost:9000",
+    "MINIO_ACCESS_KEY": "test",
+    "MINIO_SECRET_KEY": "test",
+    "BACKEND_URL": "http://localhost:8000",
+}.items():
+    os.environ.setdefault(name, value)
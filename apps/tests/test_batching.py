@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import pytest
+
+from packages.chatgpt.batching import PromptBatcher, batch_query, parse_batch
+from packages.chatgpt.models import ChatGPTQuery
+from packages.database import Config
+from transformations.benchmarks.llm_stub import canned_response
+
+SYSTEM_MESSAGE = "Extract the keywords of the product"
+
+
+class Sender:
+    """
+    Answers the queries like the stub API, dropping the `missing` inputs
+    from the batched responses
+    """
+
+    def __init__(self, missing: int = 0, error: bool = False):
+        self.sizes: list[int] = []
+        self._missing = missing
+        self._error = error
+
+    async def __call__(
+        self, query: ChatGPTQuery, global_config: Config
+    ) -> tuple[dict, str]:
+        await asyncio.sleep(0)
+        try:
+            size = len(json.loads(query.user_message))
+        except ValueError:
+            size = 1
+        self.sizes.append(size)
+
+        if self._error:
+            raise RuntimeError("The API is down")
+
+        response = canned_response(query.system_message, query.user_message)
+        if "results" in response and self._missing:
+            response["results"] = response["results"][self._missing :]
+            self._missing = 0
+
+        return response, "stub:model"
+
+
+def submit_all(batcher: PromptBatcher, messages: list[str]) -> list:
+    async def run():
+        return await asyncio.gather(
+            *(
+                batcher.submit(
+                    ChatGPTQuery(system_message=SYSTEM_MESSAGE, user_message=message),
+                    Config(model="test-model"),
+                )
+                for message in messages
+            ),
+            return_exceptions=True,
+        )
+
+    return asyncio.run(run())
+
+
+MESSAGES = [f"Lamp number {number} with a brass stand" for number in range(5)]
+EXPECTED = [
+    (canned_response(SYSTEM_MESSAGE, message), "stub:model") for message in MESSAGES
+]
+
+
+@pytest.mark.parametrize(
+    ("max_size", "sizes"),
+    [(10, [5]), (2, [2, 2, 1]), (3, [3, 2]), (1, [1] * 5)],
+)
+def test_batcher_splits_by_max_size(max_size, sizes):
+    send = Sender()
+    batcher = PromptBatcher(send, max_size=max_size, window=0.01, retries=1)
+
+    assert submit_all(batcher, MESSAGES) == EXPECTED
+    assert sorted(send.sizes, reverse=True) == sizes
+
+
+def test_batcher_resends_missing_inputs():
+    send = Sender(missing=2)
+    batcher = PromptBatcher(send, max_size=10, window=0.01, retries=1)
+
+    assert submit_all(batcher, MESSAGES) == EXPECTED
+    assert send.sizes == [5, 2]
+
+
+def test_batcher_sends_missing_inputs_alone_after_retries():
+    send = Sender(missing=3)
+    batcher = PromptBatcher(send, max_size=10, window=0.01, retries=0)
+
+    assert submit_all(batcher, MESSAGES) == EXPECTED
+    assert send.sizes == [5, 1, 1, 1]
+
+
+def test_batcher_fails_every_query_of_failed_batch():
+    send = Sender(error=True)
+    batcher = PromptBatcher(send, max_size=10, window=0.01, retries=1)
+
+    results = submit_all(batcher, MESSAGES)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert send.sizes == [5]
+
+
+def test_batch_query_round_trip():
+    query = batch_query(SYSTEM_MESSAGE, MESSAGES)
+
+    assert query.system_message.startswith(SYSTEM_MESSAGE)
+    assert [item["input"] for item in json.loads(query.user_message)] == MESSAGES
+
+
+@pytest.mark.parametrize(
+    ("response", "expected"),
+    [
+        ({"results": [{"index": 1, "response": {"a": 1}}]}, {1: {"a": 1}}),
+        ({"results": [{"index": 0, "response": "text"}]}, {}),
+        ({"results": [{"index": 3, "response": {}}]}, {}),
+        ({"results": [{"index": "0", "response": {}}]}, {}),
+        ({"results": ["garbage", None]}, {}),
+        (
+            {
+                "results": [
+                    {"index": 0, "response": {"a": 1}},
+                    {"index": 0, "response": {}},
+                ]
+            },
+            {0: {"a": 1}},
+        ),
+        ({"results": None}, {}),
+        ({}, {}),
+    ],
+)
+def test_parse_batch_skips_malformed_entries(response, expected):
+    assert parse_batch(response, 2) == expected
@@ -0,0 +1,99 @@
+import pytest
+
+from transformations.boilerplate import Boilerplate
+
+DELIVERY = "Доставка по Казахстану от 2 дней, самовывоз из магазина в Алматы"
+WARRANTY = "Гарантия 12 месяцев на всю продукцию магазина, обмен в течение 14 дней"
+BRAND = "Бренд: Lumina"
+
+
+def description(number: int, *blocks: str) -> str:
+    return "\n".join([f"Латунная лампа номер {number} с льняным абажуром", *blocks])
+
+
+def learn(pages: list[str], **kwargs) -> Boilerplate:
+    boilerplate = Boilerplate(sample_size=len(pages), **kwargs)
+    for page in pages:
+        boilerplate.observe([page])
+
+    assert boilerplate.learned
+    return boilerplate
+
+
+@pytest.mark.parametrize(
+    ("pages_with_block", "min_share", "stripped"),
+    [
+        (10, 0.6, True),
+        (6, 0.6, True),
+        (5, 0.6, False),
+        (5, 0.5, True),
+        (1, 0.6, False),
+    ],
+)
+def test_block_share_threshold(pages_with_block, min_share, stripped):
+    pages = [
+        description(number, DELIVERY)
+        if number < pages_with_block
+        else description(number)
+        for number in range(10)
+    ]
+    boilerplate = learn(pages, min_share=min_share)
+
+    text = description(100, DELIVERY)
+    assert (boilerplate.strip(text) == description(100)) is stripped
+
+
+@pytest.mark.parametrize(
+    ("line", "min_chars", "stripped"),
+    [
+        (DELIVERY, 40, True),
+        (BRAND, 40, False),
+        (BRAND, 10, True),
+        (DELIVERY, len(DELIVERY) + 1, False),
+    ],
+)
+def test_block_length_threshold(line, min_chars, stripped):
+    boilerplate = learn(
+        [description(number, line) for number in range(5)], min_chars=min_chars
+    )
+
+    assert (boilerplate.strip(description(100, line)) == description(100)) is stripped
+
+
+def test_blocks_match_normalized_lines():
+    boilerplate = learn([description(number, DELIVERY) for number in range(5)])
+
+    text = description(100, f"  {DELIVERY.upper()}  ", WARRANTY)
+    assert boilerplate.strip(text) == description(100, WARRANTY)
+    assert boilerplate.stats["lines"] == 1
+
+
+def test_text_of_blocks_alone_is_kept():
+    boilerplate = learn([description(number, DELIVERY, WARRANTY) for number in range(5)])
+
+    text = f"{DELIVERY}\n\n{WARRANTY}"
+    assert boilerplate.strip(text) == text
+    assert boilerplate.stats["lines"] == 0
+
+
+def test_previous_blocks_are_used_until_learned():
+    previous = learn([description(number, DELIVERY) for number in range(5)])
+    boilerplate = Boilerplate(previous.blocks, sample_size=5)
+
+    boilerplate.observe([description(1, WARRANTY)])
+    assert not boilerplate.learned
+    assert boilerplate.strip(description(100, DELIVERY)) == description(100)
+
+    for number in range(2, 6):
+        boilerplate.observe([description(number, WARRANTY)])
+    assert boilerplate.learned
+    assert boilerplate.strip(description(100, DELIVERY, WARRANTY)) == description(
+        100, DELIVERY
+    )
+
+
+def test_nothing_is_stripped_without_blocks():
+    boilerplate = Boilerplate()
+
+    assert boilerplate.strip(description(1, DELIVERY)) == description(1, DELIVERY)
+    assert boilerplate.blocks == []
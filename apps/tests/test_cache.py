@@ -0,0 +1,159 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from packages.cache import store
+from packages.cache.singleflight import SingleFlight
+from packages.cache.store import DiskCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=10_000, ttl=60)
+    yield cache
+    cache.close()
+
+
+def test_set_get_round_trip(cache):
+    cache.set("page", "Товар".encode(), {"etag": '"v1"'})
+    entry = cache.get("page")
+
+    assert entry is not None
+    assert entry.content.decode() == "Товар"
+    assert entry.meta == {"etag": '"v1"'}
+    assert not entry.stale
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_identical_contents_share_blob(cache):
+    cache.set("a", b"same contents")
+    cache.set("b", b"same contents")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["blobs"] == 1
+
+
+def test_stale_entry_is_returned_only_when_allowed(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=10_000, ttl=0.05)
+    cache.set("page", b"contents")
+    time.sleep(0.1)
+
+    assert cache.get("page") is None
+    entry = cache.get("page", allow_stale=True)
+    assert entry is not None and entry.stale
+
+    cache.touch("page", {"etag": '"v2"'})
+    entry = cache.get("page")
+    assert entry is not None and entry.meta == {"etag": '"v2"'}
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=2_500, ttl=60)
+    # Random bytes do not compress
+    cache.set("first", os.urandom(1_000))
+    cache.set("second", os.urandom(1_000))
+    time.sleep(0.01)
+    cache.get("first")
+    cache.set("third", os.urandom(1_000))
+
+    assert cache.stats()["bytes"] <= 2_500
+    assert cache.get("second") is None
+    assert cache.get("first") is not None
+    assert cache.get("third") is not None
+    cache.close()
+
+
+def test_sweep_drops_expired_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "SWEEP_INTERVAL", 0.0)
+    cache = DiskCache(tmp_path, max_bytes=10_000, ttl=0.1, keep_stale=0.1)
+    cache.set("old", b"old contents")
+    time.sleep(0.1)
+    cache.set("kept", b"kept contents")
+    assert cache.get("old", allow_stale=True) is not None
+
+    time.sleep(0.15)
+    cache.set("new", b"new contents")
+
+    assert cache.get("old", allow_stale=True) is None
+    assert cache.get("kept", allow_stale=True) is not None
+    assert cache.stats()["entries"] == 2
+    cache.close()
+
+
+def test_replaced_contents_free_their_blob(cache):
+    cache.set("page", b"version 1")
+    cache.set("page", b"version 2")
+
+    assert cache.stats()["blobs"] == 1
+    cache.delete("page")
+    stats = cache.stats()
+    assert (stats["entries"], stats["blobs"], stats["bytes"]) == (0, 0, 0)
+
+
+def test_cache_is_shared_between_threads(cache):
+    cache.set("page", b"contents")
+
+    async def main():
+        return await asyncio.gather(
+            *(asyncio.to_thread(cache.get, "page") for _ in range(8))
+        )
+
+    assert all(entry and entry.content == b"contents" for entry in asyncio.run(main()))
+
+
+def test_single_flight_shares_the_call():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def main():
+        flight: SingleFlight[int] = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+        assert flight.in_flight == 0
+        # The finished call is not remembered
+        return results, await flight.do("key", fetch)
+
+    results, again = asyncio.run(main())
+    assert results == [1] * 5
+    assert again == 2
+
+
+def test_single_flight_propagates_the_error():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("unavailable")
+
+    async def main():
+        flight: SingleFlight[int] = SingleFlight()
+        results = await asyncio.gather(
+            *(flight.do("key", fail) for _ in range(3)), return_exceptions=True
+        )
+        assert "key" not in flight
+        return results
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(main()))
+
+
+def test_single_flight_survives_a_cancelled_waiter():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "page"
+
+    async def main():
+        flight: SingleFlight[str] = SingleFlight()
+        owner = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await owner
+
+    assert asyncio.run(main()) == "page"
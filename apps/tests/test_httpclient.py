@@ -0,0 +1,24 @@
+import zstandard
+from httpx import Response
+from httpx._decoders import SUPPORTED_DECODERS
+
+from packages.httpclient.pool import _accept_encoding
+
+
+def test_accept_encoding_has_decoders():
+    encodings = _accept_encoding().split(", ")
+
+    assert {"gzip", "deflate"} <= set(encodings)
+    assert set(encodings) <= set(SUPPORTED_DECODERS)
+
+
+def test_zstd_response_is_decoded():
+    text = "<html><body>Товар</body></html>"
+    response = Response(
+        200,
+        headers={"Content-Encoding": "zstd"},
+        content=zstandard.ZstdCompressor().compress(text.encode()),
+    )
+
+    assert "zstd" in _accept_encoding()
+    assert response.text == text
@@ -0,0 +1,123 @@
+import pytest
+from lxml import etree
+
+from transformations.key_values import (
+    MAX_KEY_LENGTH,
+    extract_key_values,
+    is_key_value_layout,
+)
+from transformations.parsing import process_properties
+
+
+def element(html: str) -> etree._Element:
+    return etree.HTML(f"<html><body><div>{html}</div></body></html>").find(".//div")
+
+
+CASES = {
+    "table": (
+        """
+        <table>
+          <tr><th>Цвет:</th><td> Латунь </td></tr>
+          <tr><td>Высота</td><td>45
+            см</td></tr>
+          <tr><td colspan="2">Характеристики</td></tr>
+          <tr><td>Патрон</td><td>E27</td><td>1 шт.</td></tr>
+        </table>
+        """,
+        {"Цвет": "Латунь", "Высота": "45 см"},
+    ),
+    "nested tables": (
+        """
+        <table><tr><td>
+          <table><tr><td>Вес</td><td>2 кг</td></tr></table>
+        </td><td>Outer</td></tr></table>
+        """,
+        {"Вес": "2 кг"},
+    ),
+    "definition list": (
+        """
+        <dl>
+          <dt>Материал</dt><dd>Латунь</dd>
+          <dt>Абажур:</dt><dd>Лён</dd>
+          <dd>Without a key</dd>
+          <dt>Without a value</dt>
+        </dl>
+        """,
+        {"Материал": "Латунь", "Абажур": "Лён"},
+    ),
+    "list of spans": (
+        """
+        <ul>
+          <li><span>Мощность</span><span>60 Вт</span></li>
+          <li><b>Цоколь:</b> <i>E27</i></li>
+          <li><span>Only the key</span><span></span></li>
+        </ul>
+        """,
+        {"Мощность": "60 Вт", "Цоколь": "E27"},
+    ),
+    "list of colon pairs": (
+        """
+        <ul>
+          <li>Страна: Италия</li>
+          <li>Гарантия : 2 года</li>
+          <li>Без пары</li>
+          <li>Время: 10:30</li>
+        </ul>
+        """,
+        {"Страна": "Италия", "Гарантия": "2 года", "Время": "10:30"},
+    ),
+    "first key wins": (
+        """
+        <table><tr><td>Цвет</td><td>Латунь</td></tr></table>
+        <ul><li>Цвет: Чёрный</li></ul>
+        """,
+        {"Цвет": "Латунь"},
+    ),
+    "long key is a sentence": (
+        f"<ul><li>{'К' * (MAX_KEY_LENGTH + 1)}: не ключ</li><li>Вес: 2 кг</li></ul>",
+        {"Вес": "2 кг"},
+    ),
+    "plain text": ("<p>Латунная лампа с льняным абажуром</p>", {}),
+}
+
+
+@pytest.mark.parametrize(("html", "expected"), CASES.values(), ids=CASES.keys())
+def test_extract_key_values(html, expected):
+    assert extract_key_values(element(html)) == expected
+
+
+LAYOUT_CASES = {
+    "pairs only": ({"Цвет": "Латунь", "Вес": "2 кг"}, "Цвет: Латунь\nВес: 2 кг", True),
+    "single pair": ({"Цвет": "Латунь"}, "Цвет: Латунь", False),
+    "pairs in a text": (
+        {"Цвет": "Латунь", "Вес": "2 кг"},
+        "Цвет: Латунь. Вес: 2 кг. Лампа создаёт мягкий свет и подходит для спальни, "
+        "гостиной и кабинета, абажур из натурального льна.",
+        False,
+    ),
+    "empty text": ({"Цвет": "Латунь", "Вес": "2 кг"}, "", False),
+}
+
+
+@pytest.mark.parametrize(
+    ("properties", "text", "expected"), LAYOUT_CASES.values(), ids=LAYOUT_CASES.keys()
+)
+def test_is_key_value_layout(properties, text, expected):
+    assert is_key_value_layout(properties, text) is expected
+
+
+def test_properties_table_skips_the_llm():
+    html = (
+        "<table><tr><td>Цвет</td><td>Латунь</td></tr>"
+        "<tr><td>Вес</td><td>2 кг</td></tr></table>"
+    )
+
+    assert process_properties("", [element(html)]) == {"Цвет": "Латунь", "Вес": "2 кг"}
+
+
+def test_properties_text_goes_to_the_llm():
+    html = "<p>Лампа из латуни, высота 45 см, абажур из натурального льна.</p>"
+
+    assert process_properties("", [element(html)]) == (
+        "Лампа из латуни, высота 45 см, абажур из натурального льна."
+    )
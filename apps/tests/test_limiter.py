@@ -0,0 +1,118 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from packages.httpclient.limiter import AdaptiveLimiter, parse_retry_after
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [(None, None), ("", None), ("120", 120.0), (" 5 ", 5.0), ("soon", None)],
+)
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=60)
+    delay = parse_retry_after(format_datetime(retry_at, usegmt=True))
+
+    assert delay is not None
+    assert 55 <= delay <= 60
+
+
+def test_parse_retry_after_past_http_date():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_window_grows_additively():
+    limiter = AdaptiveLimiter(initial=2, maximum=10)
+    for _ in range(2):
+        limiter.on_success(0.1)
+
+    # One request per window of healthy responses
+    assert limiter.window == 2
+    for _ in range(4):
+        limiter.on_success(0.1)
+
+    assert limiter.window == 4
+
+
+def test_window_is_capped_by_maximum():
+    limiter = AdaptiveLimiter(initial=2, maximum=3)
+    for _ in range(100):
+        limiter.on_success(0.1)
+
+    assert limiter.window == 3
+
+
+def test_overload_halves_window_down_to_one():
+    limiter = AdaptiveLimiter(initial=8, maximum=10)
+    limiter.on_overload()
+    assert limiter.window == 4
+
+    for _ in range(10):
+        limiter.on_overload()
+    assert limiter.window == 1
+
+
+def test_slow_responses_shrink_window():
+    limiter = AdaptiveLimiter(initial=8, maximum=10)
+    limiter.on_success(0.1)
+    for _ in range(10):
+        limiter.on_success(5.0)
+
+    assert limiter.window < 8
+
+
+def test_errors_shrink_window():
+    limiter = AdaptiveLimiter(initial=8, maximum=10)
+    for _ in range(5):
+        limiter.on_error()
+
+    assert limiter.window < 8
+
+
+def test_static_window_is_fixed():
+    limiter = AdaptiveLimiter(initial=4, maximum=10, adaptive=False)
+    for _ in range(20):
+        limiter.on_success(0.1)
+    limiter.on_overload()
+    limiter.on_error()
+
+    assert limiter.window == 4
+
+
+def test_slot_waits_for_window():
+    limiter = AdaptiveLimiter(initial=2, maximum=2, adaptive=False)
+    running = 0
+    peak = 0
+
+    async def request():
+        nonlocal running, peak
+        async with limiter.slot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def main():
+        await asyncio.gather(*(request() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
+
+
+def test_retry_after_pauses_host():
+    limiter = AdaptiveLimiter(initial=2, maximum=2)
+    limiter.on_overload(retry_after=0.2)
+
+    async def main():
+        started = time.monotonic()
+        async with limiter.slot():
+            return time.monotonic() - started
+
+    assert asyncio.run(main()) >= 0.15
@@ -0,0 +1,106 @@
+import pytest
+
+from transformations.parsing import _iter_dom_links, extract_links, iter_links
+
+PAGE_URL = "https://shop.example.com/catalog/lamps/?page=2"
+
+PAGES = {
+    "plain": """
+        <html><body>
+          <a href="/product/1">One</a>
+          <a class="card" href='/product/2?color=red'>Two</a>
+          <a href=/product/3>Three</a>
+          <A HREF="https://shop.example.com/product/4#reviews">Four</A>
+          <a href="product/5">Relative</a>
+          <a href="../product/6">Parent</a>
+          <a href="//cdn.example.com/file.pdf">Protocol relative</a>
+          <a href="https://SHOP.example.com:443/product/7">Default port</a>
+          <a href="/product/8?a=1&amp;b=2">Entity</a>
+          <a name="top">No link</a>
+        </body></html>
+    """,
+    "skipped": """
+        <html><head>
+          <style>a[href="/product/style"] { color: red; }</style>
+          <script>document.write('<a href="/product/script">x</a>');</script>
+        </head><body>
+          <!-- <a href="/product/comment">Commented out</a> -->
+          <div data-href="/product/data">Not a link</div>
+          <a data-href="/product/data-attr" href="/product/real">Real</a>
+          <link href="/style.css" rel="stylesheet">
+        </body></html>
+    """,
+    "base": """
+        <html><head><base href="https://mirror.example.com/shop/"></head><body>
+          <a href="product/1">Relative to base</a>
+          <a href="/product/2">Root relative</a>
+        </body></html>
+    """,
+    "multiline": """
+        <html><body>
+          <a
+            class="card"
+            href="/product/1"
+          >One</a>
+          <SCRIPT type="text/javascript">
+            var html = "<a href='/product/script'></a>";
+          </SCRIPT>
+        </body></html>
+    """,
+}
+
+
+@pytest.mark.parametrize("page", PAGES.values(), ids=PAGES.keys())
+def test_stream_and_dom_links_agree(page):
+    dom_links = list(_iter_dom_links(page, PAGE_URL))
+
+    assert dom_links
+    assert list(iter_links(page, PAGE_URL)) == dom_links
+    assert list(iter_links(page.encode(), PAGE_URL)) == dom_links
+
+
+def test_links_are_canonical():
+    links = list(iter_links(PAGES["plain"], PAGE_URL))
+
+    assert links == [
+        "https://shop.example.com/product/1",
+        "https://shop.example.com/product/2?color=red",
+        "https://shop.example.com/product/3",
+        "https://shop.example.com/product/4",
+        "https://shop.example.com/catalog/lamps/product/5",
+        "https://shop.example.com/catalog/product/6",
+        "https://cdn.example.com/file.pdf",
+        "https://shop.example.com/product/7",
+        "https://shop.example.com/product/8?a=1&b=2",
+    ]
+
+
+def test_links_in_scripts_styles_and_comments_are_skipped():
+    links = list(iter_links(PAGES["skipped"], PAGE_URL))
+
+    assert links == ["https://shop.example.com/product/real"]
+
+
+def test_links_are_resolved_against_base():
+    links = list(iter_links(PAGES["base"], PAGE_URL))
+
+    assert links == [
+        "https://mirror.example.com/shop/product/1",
+        "https://mirror.example.com/product/2",
+    ]
+
+
+@pytest.mark.parametrize("mode", ["stream", "dom"])
+def test_extract_links_keeps_unique_product_urls(mode):
+    spec = {
+        "props_xpaths": {},
+        "product_regex": r"https://shop\.example\.com/product/\d+",
+        "pagination": None,
+    }
+
+    product_urls, total = extract_links(PAGES["plain"], PAGE_URL, spec, mode)
+
+    assert total == 9
+    assert product_urls == [
+        f"https://shop.example.com/product/{i}" for i in (1, 2, 3, 4, 7, 8)
+    ]
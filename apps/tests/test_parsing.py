@@ -0,0 +1,156 @@
+import hashlib
+import json
+
+from lxml import etree
+
+from transformations.parsing import extract_fields, extract_listing
+from transformations.websites.tasks.xpath_extraction import product_row
+
+URL = "https://shop.example.com/product/1"
+PROPS_XPATHS = {
+    "name": "//h1",
+    "sku": "//*[@class='sku']",
+    "price": "//*[@class='price']",
+    "measure_unit": "//*[@class='unit']",
+    "currency": "//*[@class='currency']",
+    "description": "//*[@class='description']",
+    "properties": "//*[@class='properties']",
+    "main_image": "//img[@class='photo']",
+}
+SPEC = {"props_xpaths": PROPS_XPATHS, "product_regex": None, "pagination": None}
+
+
+def product_page(price: str = "12 500,00", structured: bool = True) -> str:
+    json_ld = {
+        "@context": "https://schema.org",
+        "@type": "Product",
+        "name": "Brass table lamp",
+        "sku": "LMP-1",
+        "offers": {"@type": "Offer", "price": "12500", "priceCurrency": "KZT"},
+    }
+    script = (
+        f'<script type="application/ld+json">{json.dumps(json_ld)}</script>'
+        if structured
+        else ""
+    )
+    return f"""
+        <html><head>{script}</head><body>
+          <h1>
+            Brass table lamp
+          </h1>
+          <span class="sku">LMP-1</span>
+          <span class="price">{price}</span>
+          <span class="currency">₸</span>
+          <span class="unit">шт.</span>
+          <div class="description">A lamp with a linen shade</div>
+          <div class="properties">Height: 45 cm</div>
+          <img class="photo" src="/images/lamp.jpg">
+        </body></html>
+    """
+
+
+def test_name_keeps_the_stored_product_hash():
+    page = product_page()
+    # The name as the products were stored before the structured data was read
+    stored_name = "".join(etree.HTML(page).xpath("//h1//text()"))
+
+    data = extract_fields(URL, page, SPEC, False, ["name"], [])
+    assert data is not None
+    assert data["name"] == stored_name
+
+    stored_hash = hashlib.sha256(stored_name.encode()).hexdigest()
+    assert product_row(data, "source")["hash"] == stored_hash
+
+    # The same page without the structured data gets the same hash
+    plain = extract_fields(URL, product_page(structured=False), SPEC, False, [], [])
+    assert plain is not None
+    assert product_row(plain, "source")["hash"] == stored_hash
+
+
+def test_name_falls_back_to_structured_data():
+    spec = {**SPEC, "props_xpaths": {**PROPS_XPATHS, "name": "//h2"}}
+
+    data = extract_fields(URL, product_page(), spec, False, ["name"], [])
+
+    assert data is not None
+    assert data["name"] == "Brass table lamp"
+
+
+def test_open_graph_fills_in_missing_fields():
+    spec = {**SPEC, "props_xpaths": {**PROPS_XPATHS, "description": "//article"}}
+    page = product_page().replace(
+        "<head>",
+        '<head><meta property="og:description" content="Lamp, brass, 45 cm">',
+    )
+
+    data = extract_fields(URL, page, spec, False, ["description"], [])
+
+    assert data is not None
+    assert data["description"] == "Lamp, brass, 45 cm"
+    # The schema.org offer is preferred to the XPath
+    assert data["currency"] == "KZT"
+
+
+def test_unparsable_price_is_stored_as_negative():
+    page = product_page(price="По запросу", structured=False)
+
+    data = extract_fields(URL, page, SPEC, False, ["name", "price"], [])
+
+    assert data is not None
+    assert data["price"] == -1
+
+
+LISTING_PAGE = """
+    <html><body><ul>
+      <li class="card">
+        <a href="/product/1"><span class="title">Brass table lamp</span></a>
+        <span class="cost">12 500</span>
+      </li>
+      <li class="card">
+        <a href="/product/2"><span class="title">Floor lamp</span></a>
+        <span class="cost">По запросу</span>
+      </li>
+      <li class="card">
+        <a href="/product/3"></a>
+        <span class="cost">9 900</span>
+      </li>
+    </ul></body></html>
+"""
+LISTING = {
+    "item": "//li[@class='card']",
+    "xpaths": {"name": "//*[@class='title']", "price": "//*[@class='cost']"},
+}
+LISTING_SPEC = {**SPEC, "product_regex": r"https://shop\.example\.com/product/\d+"}
+
+
+def test_listing_with_name_price_and_link_is_complete():
+    products = extract_listing(
+        LISTING_PAGE, "https://shop.example.com/lamps", LISTING_SPEC, LISTING, ["name"]
+    )
+
+    assert [(product.url, product.complete) for product in products] == [
+        ("https://shop.example.com/product/1", True),
+        ("https://shop.example.com/product/2", True),
+        ("https://shop.example.com/product/3", False),
+    ]
+    # The fields the listing does not map are left to the enrichment
+    assert products[0].data == {
+        "name": "Brass table lamp",
+        "price": 12500.0,
+        "url": "https://shop.example.com/product/1",
+    }
+    assert products[1].data["price"] == -1
+    assert products[2].data == {"price": 9900.0}
+
+
+def test_listing_without_mandatory_field_is_incomplete():
+    products = extract_listing(
+        LISTING_PAGE,
+        "https://shop.example.com/lamps",
+        LISTING_SPEC,
+        LISTING,
+        ["name", "description"],
+    )
+
+    assert not any(product.complete for product in products)
+    assert "url" not in products[0].data
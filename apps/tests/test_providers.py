@@ -0,0 +1,239 @@
+import asyncio
+import json
+import time
+from typing import Optional
+
+import pytest
+from httpx import Response
+
+from packages.chatgpt import providers
+from packages.chatgpt.config import config
+from packages.chatgpt.exceptions import ChatGPTException
+from packages.chatgpt.models import ChatGPTQuery
+from packages.chatgpt.providers import (
+    AttemptBudget,
+    OpenAIProvider,
+    Provider,
+    ProviderRouter,
+)
+from packages.database import Config
+from packages.httpclient import HTTPClientPool
+from transformations.benchmarks.llm_stub import LatencyModel, LLMStub, canned_response
+
+QUERY = ChatGPTQuery(
+    system_message="Extract the keywords of the product",
+    user_message="Brass table lamp with a linen shade",
+)
+GLOBAL_CONFIG = Config(model="test-model")
+
+
+class ScriptedProvider(Provider):
+    """
+    Responds with the statuses in turn, then with the last one, after the delay
+    """
+
+    def __init__(self, name: str, statuses: tuple[int, ...] = (200,), delay: float = 0):
+        super().__init__(name, HTTPClientPool())
+        self.sent = 0
+        self._statuses = statuses
+        self._delay = delay
+
+    async def _send(self, query: ChatGPTQuery, global_config: Config) -> Response:
+        status = self._statuses[min(self.sent, len(self._statuses) - 1)]
+        self.sent += 1
+        await asyncio.sleep(self._delay)
+        if status != 200:
+            return Response(status, text="Unavailable")
+
+        return Response(200, json={"content": json.dumps({"by": self.name}), "tokens": 1})
+
+    def _parse(self, body: dict) -> tuple[str, Optional[int]]:
+        return body["content"], body["tokens"]
+
+    def model(self, global_config: Config) -> str:
+        return "model"
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setattr(providers, "backoff_delay", lambda attempt: 0.0)
+    monkeypatch.setattr(config, "chatgpt_retries", 2)
+    monkeypatch.setattr(config, "chatgpt_failover_retries", 1)
+    monkeypatch.setattr(config, "chatgpt_max_attempts", 6)
+    monkeypatch.setattr(config, "chatgpt_failover_errors", 2)
+    monkeypatch.setattr(config, "chatgpt_failover_cooldown", 0.2)
+    monkeypatch.setattr(config, "chatgpt_hedge_min_samples", 5)
+
+
+def complete(router: ProviderRouter) -> tuple[dict, str]:
+    return asyncio.run(router.complete(QUERY, GLOBAL_CONFIG))
+
+
+def test_first_provider_answers():
+    first, second = ScriptedProvider("first"), ScriptedProvider("second")
+
+    assert complete(ProviderRouter([first, second])) == ({"by": "first"}, "first:model")
+    assert (first.sent, second.sent) == (1, 0)
+
+
+def test_failover_after_retries():
+    first, second = ScriptedProvider("first", (500,)), ScriptedProvider("second")
+
+    assert complete(ProviderRouter([first, second])) == ({"by": "second"}, "second:model")
+    # The failover retries, not the full ones, are spent on the first provider
+    assert (first.sent, second.sent) == (2, 1)
+
+
+def test_transient_error_is_retried():
+    first, second = ScriptedProvider("first", (503, 200)), ScriptedProvider("second")
+
+    assert complete(ProviderRouter([first, second])) == ({"by": "first"}, "first:model")
+    assert (first.sent, second.sent) == (2, 0)
+
+
+def test_circuit_breaker_skips_erroring_provider():
+    first, second = ScriptedProvider("first", (500,)), ScriptedProvider("second")
+    router = ProviderRouter([first, second])
+
+    complete(router)
+    assert not first.available
+    assert router.route(GLOBAL_CONFIG) == "second:model"
+
+    assert complete(router) == ({"by": "second"}, "second:model")
+    assert first.sent == 2
+
+    time.sleep(config.chatgpt_failover_cooldown)
+    assert first.available
+    assert router.route(GLOBAL_CONFIG) == "first:model"
+
+
+def test_circuit_breaker_keeps_last_provider():
+    first = ScriptedProvider("first", (500, 500, 200))
+    router = ProviderRouter([first])
+
+    with pytest.raises(ChatGPTException):
+        asyncio.run(
+            first.complete(QUERY, GLOBAL_CONFIG, retries=1, budget=AttemptBudget(6))
+        )
+    assert not first.available
+
+    # The only provider is used even while its breaker is open
+    assert complete(router) == ({"by": "first"}, "first:model")
+
+
+def test_attempt_budget_is_shared(monkeypatch):
+    monkeypatch.setattr(config, "chatgpt_max_attempts", 3)
+    first, second = ScriptedProvider("first", (500,)), ScriptedProvider("second", (500,))
+
+    with pytest.raises(ChatGPTException):
+        complete(ProviderRouter([first, second]))
+
+    # The retries alone would have sent 2 + 3 requests
+    assert (first.sent, second.sent) == (2, 1)
+
+
+def test_invalid_response_fails_over():
+    class InvalidProvider(ScriptedProvider):
+        def _parse(self, body: dict) -> tuple[str, Optional[int]]:
+            return "[]", None
+
+    first, second = InvalidProvider("first"), ScriptedProvider("second")
+
+    assert complete(ProviderRouter([first, second])) == ({"by": "second"}, "second:model")
+    assert first.sent == 1
+
+
+def slow_primary(
+    hedging: bool,
+) -> tuple[float, str, ScriptedProvider, ScriptedProvider]:
+    first, second = ScriptedProvider("first", delay=0.5), ScriptedProvider("second")
+    for _ in range(config.chatgpt_hedge_min_samples):
+        first.latency.add(0.05)
+
+    started = time.monotonic()
+    result, route = complete(ProviderRouter([first, second], hedging=hedging))
+    return time.monotonic() - started, route, first, second
+
+
+def test_slow_request_is_hedged():
+    elapsed, route, first, second = slow_primary(hedging=True)
+
+    assert route == "second:model"
+    assert elapsed < 0.4
+    assert (first.sent, second.sent) == (1, 1)
+
+
+def test_hedging_can_be_disabled():
+    elapsed, route, first, second = slow_primary(hedging=False)
+
+    assert route == "first:model"
+    assert elapsed >= 0.5
+    assert second.sent == 0
+
+
+def test_hedging_waits_for_latency_samples():
+    first, second = ScriptedProvider("first", delay=0.2), ScriptedProvider("second")
+    first.latency.add(0.01)
+
+    assert complete(ProviderRouter([first, second]))[1] == "first:model"
+    assert second.sent == 0
+
+
+def test_openai_provider_against_stub():
+    stub = LLMStub(LatencyModel("fixed:0"), rpm=120, tpm=50_000)
+
+    async def run():
+        url = await stub.start()
+        pool = HTTPClientPool(rotate_user_agents=False, adaptive=False, retries=0)
+        provider = OpenAIProvider("openai", pool, url, api_key="test")
+        try:
+            async with pool.session():
+                result = await provider.complete(
+                    QUERY, GLOBAL_CONFIG, retries=0, budget=AttemptBudget(1)
+                )
+        finally:
+            await stub.stop()
+
+        return result, provider.stats()
+
+    result, stats = asyncio.run(run())
+
+    assert result == canned_response(QUERY.system_message, QUERY.user_message)
+    assert stub.stats["requests"] == 1
+    # The budget is learned from the rate limit headers of the response
+    assert stats["rate"]["rpm"] == 120
+    assert stats["rate"]["tpm"] == 50_000
+    assert stats["rate"]["requests"] == 1
+    assert stats["samples"] == 1
+
+
+def test_rate_limited_request_waits_for_retry_after():
+    stub = LLMStub(LatencyModel("fixed:0"), rate_limit_ratio=0.5, seed=3)
+
+    async def run():
+        url = await stub.start()
+        pool = HTTPClientPool(rotate_user_agents=False, adaptive=False, retries=0)
+        provider = OpenAIProvider("openai", pool, url, api_key="test")
+        try:
+            async with pool.session():
+                return await asyncio.gather(
+                    *(
+                        provider.complete(
+                            QUERY.model_copy(update={"user_message": f"Lamp {number}"}),
+                            GLOBAL_CONFIG,
+                            retries=5,
+                            budget=AttemptBudget(6),
+                        )
+                        for number in range(6)
+                    )
+                )
+        finally:
+            await stub.stop()
+
+    started = time.monotonic()
+    results = asyncio.run(run())
+
+    assert len(results) == 6
+    assert stub.stats["rate_limited"] > 0
+    # The stub asks to retry after a second
+    assert time.monotonic() - started >= 1.0
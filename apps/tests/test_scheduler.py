@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import pytest
+
+from packages.chatgpt import scheduler
+from packages.chatgpt.scheduler import LLMScheduler, Priority, parse_reset
+
+
+@pytest.fixture
+def window(monkeypatch):
+    """
+    Shrink the minute window of the budgets
+    """
+
+    monkeypatch.setattr(scheduler, "WINDOW", 0.2)
+    return 0.2
+
+
+def acquire_times(llm: LLMScheduler, requests: list[tuple[int, Priority]]) -> list:
+    """
+    Acquire the budget for the requests at once and return the order they got it in
+    along with the seconds they waited
+    """
+
+    async def run():
+        started = time.monotonic()
+        order = []
+
+        async def acquire(index: int, tokens: int, priority: Priority):
+            await llm.acquire(tokens, priority)
+            order.append((index, time.monotonic() - started))
+
+        await asyncio.gather(
+            *(
+                acquire(index, tokens, priority)
+                for index, (tokens, priority) in enumerate(requests)
+            )
+        )
+        return order
+
+    return asyncio.run(run())
+
+
+def test_rpm_window(window):
+    llm = LLMScheduler(rpm=2)
+
+    order = acquire_times(llm, [(1, Priority.BULK)] * 3)
+
+    assert [index for index, _ in order] == [0, 1, 2]
+    assert order[1][1] < window / 2
+    assert order[2][1] >= window * 0.9
+
+
+def test_tpm_window(window):
+    llm = LLMScheduler(tpm=100)
+
+    order = acquire_times(
+        llm, [(60, Priority.BULK), (30, Priority.BULK), (60, Priority.BULK)]
+    )
+
+    assert order[1][1] < window / 2
+    assert order[2][1] >= window * 0.9
+
+
+def test_settled_usage_frees_the_budget(window):
+    llm = LLMScheduler(tpm=100)
+
+    async def run():
+        reservation = await llm.acquire(90)
+        waiter = asyncio.create_task(llm.acquire(50))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        llm.settle(reservation, 20)
+        started = time.monotonic()
+        await waiter
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < window / 2
+    assert llm.stats()["tokens"] == 70
+
+
+def test_interactive_requests_go_first(window):
+    llm = LLMScheduler(rpm=1)
+
+    async def run():
+        await llm.acquire(1)
+        order = []
+
+        async def acquire(name: str, priority: Priority):
+            await llm.acquire(1, priority)
+            order.append(name)
+
+        bulk = asyncio.create_task(acquire("bulk", Priority.BULK))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(acquire("interactive", Priority.INTERACTIVE))
+        await asyncio.gather(bulk, interactive)
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "bulk"]
+
+
+def test_cancelled_waiter_leaves_the_queue(window):
+    llm = LLMScheduler(rpm=1)
+
+    async def run():
+        await llm.acquire(1)
+        waiter = asyncio.create_task(llm.acquire(1))
+        await asyncio.sleep(0.01)
+        assert llm.stats()["waiting"] == 1
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        return llm.stats()["waiting"]
+
+    assert asyncio.run(run()) == 0
+
+
+def test_limits_are_learned_from_headers():
+    llm = LLMScheduler()
+    llm.update({"x-ratelimit-limit-requests": "500", "x-ratelimit-limit-tokens": "30000"})
+
+    assert llm.stats()["rpm"] == 500
+    assert llm.stats()["tpm"] == 30000
+
+
+def test_configured_limits_are_kept():
+    llm = LLMScheduler(rpm=10, tpm=1000)
+    llm.update({"x-ratelimit-limit-requests": "500", "x-ratelimit-limit-tokens": "30000"})
+
+    assert llm.stats()["rpm"] == 10
+    assert llm.stats()["tpm"] == 1000
+
+
+def test_exhausted_budget_pauses_the_requests():
+    llm = LLMScheduler()
+    llm.update(
+        {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "150ms"}
+    )
+
+    order = acquire_times(llm, [(1, Priority.INTERACTIVE)])
+
+    assert 0.1 <= order[0][1] < 1.0
+
+
+def test_bulk_requests_leave_the_reserve(window):
+    llm = LLMScheduler(rpm=100, reserve=0.2)
+    llm.update({"x-ratelimit-remaining-requests": "10"})
+
+    order = acquire_times(llm, [(1, Priority.BULK), (1, Priority.INTERACTIVE)])
+
+    assert [index for index, _ in order] == [1, 0]
+    assert order[0][1] < window / 2
+    assert order[1][1] >= window * 0.9
+
+
+@pytest.mark.parametrize(
+    ("value", "seconds"),
+    [
+        ("6m0s", 360.0),
+        ("1h2m3s", 3723.0),
+        ("20ms", 0.02),
+        ("1.5s", 1.5),
+        ("", None),
+        (None, None),
+        ("soon", None),
+    ],
+)
+def test_parse_reset(value, seconds):
+    assert parse_reset(value) == pytest.approx(seconds)
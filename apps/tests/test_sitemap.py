@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import httpx
+import pytest
+
+from transformations.parsing import SitemapEntry, SitemapParser
+from transformations.websites.tasks import sitemap
+
+URLSET = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc> https://shop.example.com/product/1 </loc>
+    <lastmod>2024-05-01T12:30:00+03:00</lastmod>
+  </url>
+  <url>
+    <loc>https://shop.example.com/product/2</loc>
+    <lastmod>2024-05-02T08:00:00Z</lastmod>
+  </url>
+  <url>
+    <loc>https://shop.example.com/product/3</loc>
+    <lastmod>2024-05-03</lastmod>
+  </url>
+  <url><loc>https://shop.example.com/product/4</loc><lastmod>yesterday</lastmod></url>
+  <url><lastmod>2024-05-05</lastmod></url>
+</urlset>
+"""
+
+URLSET_ENTRIES = [
+    SitemapEntry(
+        "https://shop.example.com/product/1", datetime(2024, 5, 1, 9, 30), False
+    ),
+    SitemapEntry("https://shop.example.com/product/2", datetime(2024, 5, 2, 8), False),
+    SitemapEntry("https://shop.example.com/product/3", datetime(2024, 5, 3), False),
+    SitemapEntry("https://shop.example.com/product/4", None, False),
+]
+
+SITEMAP_INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://shop.example.com/sitemap-products.xml.gz</loc></sitemap>
+  <sitemap><loc>/sitemap-index-2.xml</loc></sitemap>
+</sitemapindex>
+"""
+
+
+def parse(contents: bytes, chunk_size: int) -> list[SitemapEntry]:
+    parser = SitemapParser()
+    entries = []
+    for start in range(0, len(contents), chunk_size):
+        entries.extend(parser.feed(contents[start : start + chunk_size]))
+
+    return entries + parser.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+@pytest.mark.parametrize("compress", [False, True], ids=["plain", "gzip"])
+def test_parser_yields_page_entries(chunk_size, compress):
+    contents = gzip.compress(URLSET) if compress else URLSET
+
+    assert parse(contents, chunk_size) == URLSET_ENTRIES
+
+
+def test_parser_marks_nested_sitemaps():
+    assert parse(SITEMAP_INDEX, 16) == [
+        SitemapEntry("https://shop.example.com/sitemap-products.xml.gz", None, True),
+        SitemapEntry("/sitemap-index-2.xml", None, True),
+    ]
+
+
+def test_parser_recovers_from_truncated_sitemap():
+    truncated = URLSET[
+        : URLSET.index(b"<url>\n    <loc>https://shop.example.com/product/3")
+    ]
+
+    assert parse(truncated, 64) == URLSET_ENTRIES[:2]
+
+
+def test_parser_handles_tiny_contents():
+    assert parse(b"<", 1) == []
+    assert parse(b"", 1) == []
+
+
+def test_iter_sitemaps_follows_indexes(monkeypatch):
+    sitemaps = {
+        "https://shop.example.com/sitemap.xml": SITEMAP_INDEX,
+        "https://shop.example.com/sitemap-products.xml.gz": gzip.compress(URLSET),
+        # Refers back to the first sitemap, which is not fetched again
+        "https://shop.example.com/sitemap-index-2.xml": b"""
+            <sitemapindex>
+              <sitemap><loc>https://shop.example.com/sitemap.xml</loc></sitemap>
+              <sitemap><loc>https://shop.example.com/missing.xml</loc></sitemap>
+            </sitemapindex>
+        """,
+    }
+    fetched = []
+
+    @asynccontextmanager
+    async def stream(method, url, **kwargs):
+        fetched.append(url)
+        if url in sitemaps:
+            yield httpx.Response(200, content=sitemaps[url])
+        else:
+            yield httpx.Response(404)
+
+    async def collect():
+        return [
+            entry
+            async for entry in sitemap.iter_sitemaps(
+                ["https://shop.example.com/sitemap.xml"]
+            )
+        ]
+
+    monkeypatch.setattr(sitemap.http_pool, "stream", stream)
+    entries = asyncio.run(collect())
+
+    assert entries == URLSET_ENTRIES
+    assert fetched == [
+        "https://shop.example.com/sitemap.xml",
+        "https://shop.example.com/sitemap-products.xml.gz",
+        "https://shop.example.com/sitemap-index-2.xml",
+        "https://shop.example.com/missing.xml",
+    ]
@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from transformations.streaming import StreamingPipeline
+
+
+def test_pipeline_processes_every_item_in_batches():
+    batches = []
+
+    async def double(item):
+        yield item
+        yield item * 10
+
+    async def odd(item):
+        if item % 2:
+            yield item
+
+    async def write(batch):
+        batches.append(batch)
+
+    pipeline = (
+        StreamingPipeline("test", queue_size=2)
+        .stage("double", double, concurrency=3)
+        .stage("odd", odd)
+        .sink(write, batch_size=2, flush_interval=10)
+    )
+    asyncio.run(pipeline.run(range(5)))
+
+    assert sorted(item for batch in batches for item in batch) == [1, 3]
+    assert all(len(batch) <= 2 for batch in batches)
+    assert pipeline.stats["double"] == 5
+    assert pipeline.stats["sink"] == 2
+
+
+def test_bounded_queue_holds_back_the_feed():
+    fed = 0
+    release = asyncio.Event()
+
+    async def items():
+        nonlocal fed
+        for item in range(100):
+            fed += 1
+            yield item
+
+    async def blocked(item):
+        await release.wait()
+        yield item
+
+    async def main():
+        pipeline = StreamingPipeline("test", queue_size=2).stage("blocked", blocked)
+        run = asyncio.create_task(pipeline.run(items()))
+        await asyncio.sleep(0.05)
+        # The queue, the item the worker holds and the one waiting to be put
+        held = fed
+        release.set()
+        await run
+        return held
+
+    assert asyncio.run(main()) <= 4
+    assert fed == 100
+
+
+def test_stage_error_skips_only_the_item():
+    written = []
+
+    async def fail_on_two(item):
+        if item == 2:
+            raise ValueError("broken item")
+        yield item
+
+    async def write(batch):
+        written.extend(batch)
+
+    pipeline = (
+        StreamingPipeline("test")
+        .stage("fail", fail_on_two)
+        .sink(write, batch_size=10, flush_interval=10)
+    )
+    asyncio.run(pipeline.run(range(4)))
+
+    assert sorted(written) == [0, 1, 3]
+
+
+def test_sink_error_cancels_the_stages():
+    cancelled = asyncio.Event()
+
+    async def slow_after_first(item):
+        # The first item reaches the sink right away, the rest are stuck
+        if item:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        yield item
+
+    async def write(batch):
+        raise RuntimeError("database is gone")
+
+    async def main():
+        pipeline = (
+            StreamingPipeline("test")
+            .stage("slow", slow_after_first, concurrency=2)
+            .sink(write, batch_size=1, flush_interval=10)
+        )
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(pipeline.run(range(3)), timeout=5)
+
+    asyncio.run(main())
+    assert cancelled.is_set()
+
+
+def test_cancelling_the_run_cancels_the_workers():
+    cancelled = asyncio.Event()
+
+    async def slow(item):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        yield item
+
+    async def main():
+        pipeline = StreamingPipeline("test").stage("slow", slow)
+        run = asyncio.create_task(pipeline.run(range(3)))
+        await asyncio.sleep(0.05)
+        run.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await run
+
+    asyncio.run(main())
+    assert cancelled.is_set()
@@ -0,0 +1,190 @@
+import json
+
+import pytest
+from lxml import etree
+
+from transformations.structured_data import extract_structured_data
+
+URL = "https://shop.example.com/catalog/lamp"
+
+
+def json_ld(document) -> str:
+    return f'<script type="application/ld+json">{json.dumps(document)}</script>'
+
+
+PRODUCT = {
+    "@context": "https://schema.org",
+    "@type": "Product",
+    "name": " Brass table lamp ",
+    "sku": "LMP-1",
+    "description": "A lamp with a linen shade",
+    "image": "/images/lamp.jpg",
+    "offers": {"@type": "Offer", "price": "12 500,50", "priceCurrency": "KZT"},
+}
+EXPECTED = {
+    "name": "Brass table lamp",
+    "sku": "LMP-1",
+    "description": "A lamp with a linen shade",
+    "main_image": "https://shop.example.com/images/lamp.jpg",
+    "price": 12500.5,
+    "currency": "KZT",
+}
+
+CASES = {
+    "json-ld": (json_ld(PRODUCT), EXPECTED),
+    "json-ld graph": (
+        json_ld(
+            {
+                "@context": "https://schema.org",
+                "@graph": [
+                    {"@type": "WebPage", "name": "Lamps | Shop"},
+                    {"@type": "BreadcrumbList", "itemListElement": []},
+                    PRODUCT,
+                ],
+            }
+        ),
+        EXPECTED,
+    ),
+    "json-ld list": (
+        json_ld([{"@type": "Organization", "name": "Shop"}, PRODUCT]),
+        EXPECTED,
+    ),
+    "json-ld nested in page": (
+        json_ld({"@type": "ItemPage", "mainEntity": PRODUCT}),
+        EXPECTED,
+    ),
+    "json-ld type list and url": (
+        json_ld(
+            {
+                **PRODUCT,
+                "@type": ["http://schema.org/Product", "IndividualProduct"],
+                "image": [{"@type": "ImageObject", "url": "/images/lamp.jpg"}],
+                "offers": [
+                    {
+                        "@type": "AggregateOffer",
+                        "lowPrice": 12500.5,
+                        "priceCurrency": "KZT",
+                    }
+                ],
+            }
+        ),
+        EXPECTED,
+    ),
+    "json-ld price specification and mpn": (
+        json_ld(
+            {
+                **PRODUCT,
+                "sku": "",
+                "mpn": "LMP-1",
+                "offers": {
+                    "@type": "Offer",
+                    "priceSpecification": {"price": "12500.50", "priceCurrency": "KZT"},
+                },
+            }
+        ),
+        EXPECTED,
+    ),
+    "json-ld broken, then valid": (
+        '<script type="application/ld+json">{"@type": "Product",</script>'
+        + json_ld(PRODUCT),
+        EXPECTED,
+    ),
+    "json-ld without product": (json_ld({"@type": "Organization", "name": "Shop"}), {}),
+    "microdata": (
+        """
+        <div itemscope itemtype="https://schema.org/Product">
+          <h1 itemprop="name">
+            Brass table lamp
+          </h1>
+          <meta itemprop="sku" content="LMP-1">
+          <p itemprop="description">A lamp with a linen shade</p>
+          <img itemprop="image" src="/images/lamp.jpg">
+          <div itemprop="offers" itemscope itemtype="https://schema.org/Offer">
+            <span itemprop="price" content="12500.50">12 500,50 ₸</span>
+            <meta itemprop="priceCurrency" content="KZT">
+          </div>
+          <div itemprop="isRelatedTo" itemscope itemtype="https://schema.org/Product">
+            <span itemprop="name">Lamp shade</span>
+            <span itemprop="sku">SHD-2</span>
+          </div>
+        </div>
+        """,
+        EXPECTED,
+    ),
+    "json-ld preferred to microdata": (
+        json_ld({"@type": "Product", "name": "Brass table lamp"})
+        + """
+        <div itemscope itemtype="http://schema.org/Product">
+          <span itemprop="name">Another name</span>
+          <span itemprop="sku">LMP-1</span>
+        </div>
+        """,
+        {"name": "Brass table lamp", "sku": "LMP-1"},
+    ),
+    "nothing": ("<p>Brass table lamp</p>", {}),
+}
+
+
+@pytest.mark.parametrize(("html", "expected"), CASES.values(), ids=CASES.keys())
+def test_product_fields(html, expected):
+    tree = etree.HTML(f"<html><head></head><body>{html}</body></html>")
+
+    assert extract_structured_data(tree, URL).product == expected
+
+
+OPEN_GRAPH_CASES = {
+    "product": (
+        """
+        <meta property="og:title" content="Brass table lamp | Shop">
+        <meta property="og:description" content="A lamp with a linen shade">
+        <meta property="og:image" content="/images/lamp.jpg">
+        <meta property="product:price:amount" content="12500.50">
+        <meta property="product:price:currency" content="KZT">
+        <meta property="product:retailer_item_id" content="LMP-1">
+        """,
+        {
+            "name": "Brass table lamp | Shop",
+            "description": "A lamp with a linen shade",
+            "main_image": "https://shop.example.com/images/lamp.jpg",
+            "price": 12500.5,
+            "currency": "KZT",
+            "sku": "LMP-1",
+        },
+    ),
+    "alternative properties": (
+        """
+        <meta property="og:image" content="">
+        <meta property="og:image:secure_url" content="https://cdn.example.com/lamp.jpg">
+        <meta property="og:price:amount" content="12 500">
+        <meta property="og:price:currency" content="KZT">
+        """,
+        {
+            "main_image": "https://cdn.example.com/lamp.jpg",
+            "price": 12500.0,
+            "currency": "KZT",
+        },
+    ),
+    "first occurrence wins": (
+        """
+        <meta property="og:title" content="Brass table lamp">
+        <meta property="og:title" content="Shop">
+        """,
+        {"name": "Brass table lamp"},
+    ),
+    "price not a number": (
+        '<meta property="product:price:amount" content="По запросу">',
+        {},
+    ),
+}
+
+
+@pytest.mark.parametrize(
+    ("html", "expected"), OPEN_GRAPH_CASES.values(), ids=OPEN_GRAPH_CASES.keys()
+)
+def test_open_graph_fields(html, expected):
+    tree = etree.HTML(f"<html><head>{html}</head><body></body></html>")
+
+    structured = extract_structured_data(tree, URL)
+
+    assert structured.open_graph == expected
+    assert structured.product == {}
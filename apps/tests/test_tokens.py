@@ -0,0 +1,20 @@
+from packages.chatgpt.tokens import dedup_lines
+
+
+def test_dedup_lines_keeps_repeated_values():
+    text = "Водонепроницаемость\nДа\nBluetooth\nДа\nWi-Fi\nНет\nNFC\nНет"
+
+    assert dedup_lines(text) == text
+
+
+def test_dedup_lines_drops_repeated_block():
+    table = "Цвет\nКрасный\nВес\n1 кг\nNFC\nНет"
+
+    assert dedup_lines(f"{table}\n\n{table}") == table
+
+
+def test_dedup_lines_drops_consecutive_and_long_lines():
+    line = "The same long paragraph of the description is repeated"
+    text = f"  {line}\nДа\nДа\n\nx\n{line.upper()}"
+
+    assert dedup_lines(text) == f"{line}\nДа\nx"
@@ -0,0 +1 @@
+"""Benchmarks of the transformations, each module is run with `python3 -m`"""
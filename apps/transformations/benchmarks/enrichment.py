@@ -0,0 +1,312 @@
+"""
+Measure the throughput of the product extraction and enrichment against
+the local LLM stub, without the network and the database. The tasks are called
+directly, so the Prefect bookkeeping of the task runs is not measured.
+Run with `python3 -m transformations.benchmarks.enrichment`
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Awaitable, Callable
+from unittest.mock import patch
+
+from aiohttp import web
+
+from .llm_stub import LatencyModel, LLMStub
+
+PROMPTS = {
+    "properties_prompt": "You are a data scientist. You are given the set of data "
+    "from the website and your goal is to extract the properties of the product "
+    'from the text. Respond with a valid JSON object, for example: {"color": "red"}.',
+    "description_prompt": "You are a data scientist. You are given a product "
+    "description and your goal is to normalize the text. Respond with a valid JSON "
+    'object containing a single field - "text" with the normalized text.',
+    "keywords_prompt": "You are a data scientist. You are given a product description "
+    "and your goal is to extract the keywords from the text. Respond with a valid "
+    'JSON object containing a single field - "keywords" with a list of keywords.',
+    "columns_prompt": "Find the column with the SKU. Respond with a valid JSON object "
+    'containing a single field - "column" with the name of the column.',
+}
+UNUSED_SERVICES = {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USER": "benchmark",
+    "DB_PASSWORD": "benchmark",
+    "DB_NAME": "benchmark",
+    "BACKEND_URL": "http://localhost",
+    "MINIO_ENDPOINT": "localhost:9000",
+    "MINIO_ACCESS_KEY": "benchmark",
+    "MINIO_SECRET_KEY": "benchmark",
+}
+# The shop the Excel sources are enriched from
+SEARCH_ORIGIN = "https://kz.obo-bettermann.com"
+PROPS_XPATHS = {
+    "name": "//h1",
+    "sku": "//span[@class='sku']",
+    "price": "//span[@class='price']",
+    "currency": "//span[@class='currency']",
+    "measure_unit": "//span[@class='unit']",
+    "main_image": "//img[@id='main']",
+    "description": "//div[@id='description']",
+    "properties": "//table[@id='specs']",
+}
+
+
+def description(index: int, rng: random.Random) -> str:
+    words = [f"feature{rng.randrange(500)}" for _ in range(rng.randrange(80, 400))]
+    # The shops repeat the delivery terms under every description
+    return (
+        f"Product {index}. {' '.join(words)}\n"
+        + "Free delivery in Almaty within two days, the payment upon receipt.\n" * 3
+    )
+
+
+def specs(rng: random.Random) -> list[tuple[str, str]]:
+    return [
+        (f"Property {key}", f"{rng.randrange(1000)} mm")
+        for key in rng.sample(range(200), rng.randrange(5, 60))
+    ]
+
+
+def product_page(index: int, seed: int) -> str:
+    """
+    Build the product page of the synthetic shop
+
+    :param index: The number of the product
+    :param seed: The seed of the random generator
+    :return: The contents of the page
+    """
+
+    rng = random.Random(f"{seed}:{index}")
+    rows = "".join(
+        f"<tr><th>{key}:</th><td>{value}</td></tr>\n" for key, value in specs(rng)
+    )
+    return f"""<!DOCTYPE html>
+        <html><head><title>Product {index}</title></head><body>
+        <h1>Product {index}</h1>
+        <span class="sku">SKU-{index}</span>
+        <span class="price">{rng.randrange(100, 100000)}</span>
+        <span class="currency">KZT</span> <span class="unit">pcs</span>
+        <img id="main" src="/img/{index}.jpg">
+        <div id="description">{description(index, rng)}</div>
+        <table id="specs">{rows}</table>
+        </body></html>"""
+
+
+def search_page(sku: str, seed: int) -> str:
+    """
+    Build the search page of the product, in the markup of obo-bettermann.com
+
+    :param sku: The SKU of the product
+    :param seed: The seed of the random generator
+    :return: The contents of the page
+    """
+
+    rng = random.Random(f"{seed}:{sku}")
+    rows = "".join(
+        f"<tr><th>{key}</th><td>{value}</td></tr>" for key, value in specs(rng)
+    )
+    return f"""<!DOCTYPE html>
+        <html><body>
+        <h1 id="productTitle">Product {sku}</h1>
+        <div class="amount-field-wrapper"><div></div><div><label>pcs</label></div></div>
+        <a id="zoom-v"><img src="/img/{sku}.jpg"></a>
+        <div id="variants"><form><table>{rows}</table></form></div>
+        <div id="productDescriptionText">{description(0, rng)}</div>
+        </body></html>"""
+
+
+def add_shop(app: web.Application, seed: int):
+    """
+    Serve the product pages and the search pages next to the LLM stub
+    """
+
+    async def product(request: web.Request) -> web.Response:
+        return web.Response(
+            text=product_page(int(request.match_info["index"]), seed),
+            content_type="text/html",
+        )
+
+    async def search(request: web.Request) -> web.Response:
+        return web.Response(
+            text=search_page(request.query["searchparam"], seed),
+            content_type="text/html",
+        )
+
+    app.router.add_get("/products/{index}", product)
+    app.router.add_get("/poisk/", search)
+
+
+async def measure(
+    name: str,
+    calls: list[Callable[[], Awaitable]],
+    concurrency: int,
+    stub: LLMStub,
+) -> list:
+    """
+    Run the calls with the limited concurrency and print the throughput
+
+    :param name: The name of the measured stage
+    :param calls: The calls to make
+    :param concurrency: The number of the simultaneous calls
+    :param stub: The LLM stub
+    :return: The results of the calls
+    """
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    requests = stub.stats["requests"]
+
+    async def run(call: Callable[[], Awaitable]):
+        async with semaphore:
+            started = time.perf_counter()
+            result = await call()
+            latencies.append(time.perf_counter() - started)
+            return result
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run(call) for call in calls))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(
+        f"{name:>16}: {len(calls) / elapsed:7.1f} products/s, "
+        f"p50 {statistics.median(latencies) * 1000:6.0f} ms, "
+        f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1000:6.0f} ms, "
+        f"{stub.stats['requests'] - requests} LLM requests"
+    )
+    return results
+
+
+async def benchmark(args: argparse.Namespace):
+    stub = LLMStub(
+        LatencyModel(args.latency),
+        rate_limit_ratio=args.rate_limit_ratio,
+        seed=args.seed,
+    )
+    add_shop(stub.app, args.seed)
+    api_url = await stub.start()
+    origin = api_url.removesuffix("/v1")
+
+    # The packages read their configuration on import
+    os.environ.update(
+        CHATGPT_API_URL=api_url,
+        CHATGPT_PROVIDERS='["openai"]',
+        CACHE_DIR=tempfile.mkdtemp(prefix="nekoparser-benchmark-"),
+    )
+    # The services the benchmark does not touch only need to be configured
+    for name, value in UNUSED_SERVICES.items():
+        os.environ.setdefault(name, value)
+
+    from packages.database import Config, config_snapshot
+    from packages.httpclient import http_pool
+    from transformations import parsing
+    from transformations.boilerplate import Boilerplate
+    from transformations.config import config
+    from transformations.excel.tasks import enrich_product
+    from transformations.websites.tasks.scrape_website import scrape_website
+    from transformations.websites.tasks.xpath_extraction import (
+        enrich_fields,
+        parse_fields,
+    )
+
+    # The configuration is not read from the database
+    snapshot = patch.object(
+        config_snapshot,
+        "get",
+        return_value=Config(
+            chatgpt_key="benchmark",
+            model="gpt-4o-mini",
+            required=["name"],
+            not_reprocess=[],
+            **PROMPTS,
+        ),
+    )
+    spec = parsing.PlanSpec(
+        props_xpaths=PROPS_XPATHS,
+        product_regex=rf"{origin}/products/\d+",
+        pagination=None,
+    )
+
+    # The Excel enrichment searches the products on the live shop,
+    # the synthetic one answers instead
+    get = http_pool.get
+    search = patch.object(
+        http_pool,
+        "get",
+        lambda url, *args, **kwargs: get(
+            url.replace(SEARCH_ORIGIN, origin), *args, **kwargs
+        ),
+    )
+
+    boilerplate = Boilerplate(sample_size=config.boilerplate_sample_size)
+
+    async def extract_product(url: str):
+        # The steps of the `extract_products` flow
+        result = await scrape_website.fn(url)
+        data = await parse_fields(url, result["contents"], spec, False, ["name"], [])
+        if data is None:
+            return None
+
+        boilerplate.observe(
+            value
+            for value in (data["description"], data["properties"])
+            if isinstance(value, str)
+        )
+        return await enrich_fields(data, boilerplate=boilerplate)
+
+    snapshot.start()
+    search.start()
+    try:
+        products = await measure(
+            "extract_product",
+            [
+                lambda index=index: extract_product(f"{origin}/products/{index}")
+                for index in range(args.products)
+            ],
+            args.concurrency,
+            stub,
+        )
+        enriched = await measure(
+            "enrich_product",
+            [
+                lambda index=index: enrich_product.fn(f"SKU-{index}")
+                for index in range(args.products)
+            ],
+            args.concurrency,
+            stub,
+        )
+    finally:
+        snapshot.stop()
+        search.stop()
+        await stub.stop()
+
+    failed = sum(
+        1 for product in products if not product or product["description"] == "N/A"
+    ) + sum(1 for _, product in enriched if product["description"] == "N/A")
+    print(
+        f"{'LLM stub':>16}: {stub.stats['requests']} requests, "
+        f"{stub.stats['rate_limited']} rate limited, {stub.stats['tokens']} tokens, "
+        f"{failed} products without the description, "
+        f"{boilerplate.stats['chars']} boilerplate characters stripped"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--latency", default="lognormal:0.3:0.5")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+
+    asyncio.run(benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Compare the link extraction modes on a synthetic category page.
+Run with `python3 -m transformations.benchmarks.link_extraction`
+"""
+
+import argparse
+import random
+import timeit
+
+from transformations import parsing
+
+PAGE_URL = "https://shop.example/catalog/tools/?page=3"
+SPEC = parsing.PlanSpec(
+    props_xpaths={},
+    product_regex=r"https://shop\.example/product/[\w-]+",
+    pagination=None,
+)
+
+
+def category_page(products: int, seed: int = 0) -> str:
+    """
+    Build the category page, similar to the ones of the real shops: navigation,
+    product cards with several links each, pagination, scripts and comments
+
+    :param products: The number of product cards
+    :param seed: The seed of the random generator
+    :return: The contents of the page
+    """
+
+    rng = random.Random(seed)
+    navigation = "".join(
+        f'<li><a class="nav-link" href="/catalog/{i}/">Category {i}</a></li>'
+        for i in range(150)
+    )
+    cards = []
+    for i in range(products):
+        slug = f"product-{i}-{rng.randrange(10**6)}"
+        href = (
+            f"/product/{slug}"
+            if i % 3
+            else f"https://shop.example/product/{slug}?utm_source=list&amp;ref={i}"
+        )
+        cards.append(
+            f"""
+            <div class="card" data-id="{i}">
+              <a href="{href}" class="card-image"><img src="/img/{slug}.jpg"></a>
+              <div class="card-body">
+                <a href='{href}' title="Product {i}">Product {i}</a>
+                <span class="price">{rng.randrange(100, 100000)} ₸</span>
+                <a href="/compare/add/{i}" rel="nofollow">Compare</a>
+              </div>
+            </div>
+            """
+        )
+
+    pagination = "".join(f'<a href="?page={i}">{i}</a>' for i in range(1, 40))
+    return f"""<!DOCTYPE html>
+        <html><head><title>Tools</title>
+        <script>window.__STATE__ = {{"items": [{",".join(map(str, range(2000)))}]}}</script>
+        </head><body>
+        <nav><ul>{navigation}</ul></nav>
+        <!-- <a href="/product/removed-from-the-template">Old</a> -->
+        <main>{"".join(cards)}</main>
+        <div class="pagination">{pagination}</div>
+        <footer>{"<p>Lorem ipsum dolor sit amet</p>" * 200}</footer>
+        </body></html>"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    contents = category_page(args.products)
+    inputs = {"str": contents, "bytes": contents.encode()}
+
+    expected = None
+    print(f"{len(contents.encode()) / 1024:.0f} KiB, {args.products} products")
+    for mode in ("dom", "stream"):
+        for kind, page in inputs.items():
+            urls, total = parsing.extract_links(page, PAGE_URL, SPEC, mode)
+            if expected is None:
+                expected = urls
+            elif set(urls) != set(expected):
+                raise AssertionError(f"{mode} ({kind}) found different product URLs")
+
+            best = min(
+                timeit.repeat(
+                    lambda: parsing.extract_links(page, PAGE_URL, SPEC, mode),
+                    number=1,
+                    repeat=args.repeat,
+                )
+            )
+            print(
+                f"{mode:>6} {kind:>5}: {best * 1000:7.2f} ms, "
+                f"{len(urls)} product URLs out of {total} links"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Deterministic stub of the OpenAI chat completions API, for the offline benchmarks.
+Run with `python3 -m transformations.benchmarks.llm_stub --port 8000` and point
+`CHATGPT_API_URL` or `LOCAL_LLM_URL` to `http://localhost:8000/v1`
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from collections import Counter
+from typing import Any, Optional
+
+from aiohttp import web
+
+__all__ = ["LatencyModel", "LLMStub", "canned_response"]
+
+
+class LatencyModel:
+    """
+    The distribution of the response latency: `fixed:SECONDS`,
+    `uniform:LOW:HIGH` or `lognormal:MEDIAN:SIGMA`
+    """
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(":")
+        if kind not in {"fixed", "uniform", "lognormal"}:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+
+        self._kind = kind
+        self._params = list(map(float, params))
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        Get the latency of a single response
+
+        :param rng: The random generator of the request
+        :return: The latency in seconds
+        """
+
+        if self._kind == "fixed":
+            return self._params[0]
+
+        if self._kind == "uniform":
+            return rng.uniform(*self._params)
+
+        median, sigma = self._params
+        return rng.lognormvariate(math.log(median), sigma)
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r"\w{4,}", text.lower())
+
+
+def _properties(text: str) -> dict[str, str]:
+    properties = {}
+    for line in text.splitlines():
+        key, separator, value = line.partition(":")
+        if separator and key.strip() and value.strip():
+            properties[key.strip()] = value.strip()
+
+    return properties
+
+
+def canned_response(system_message: str, user_message: str) -> dict[str, Any]:
+    """
+    Build the response of the prompt, the prompt type is recognized by its wording.
+    The response only depends on the input
+
+    :param system_message: The system message
+    :param user_message: The user message
+    :return: The JSON object the model would respond with
+    """
+
+    try:
+        batch = json.loads(user_message)
+    except ValueError:
+        batch = None
+
+    if isinstance(batch, list) and all(
+        isinstance(item, dict) and "index" in item for item in batch
+    ):
+        instructions = system_message.rsplit("\n\n", 1)[0]
+        return {
+            "results": [
+                {
+                    "index": item["index"],
+                    "response": canned_response(instructions, item["input"]),
+                }
+                for item in batch
+            ]
+        }
+
+    prompt = system_message.lower()
+    if 'task "description"' in prompt:
+        product = json.loads(user_message)
+        response: dict[str, Any] = {"description": {"text": product["description"][:500]}}
+        if 'task "keywords"' in prompt:
+            response["keywords"] = {
+                "keywords": list(dict.fromkeys(_words(product["description"])))[:8]
+            }
+        if "properties" in product:
+            response["properties"] = _properties(product["properties"])
+
+        return response
+
+    if "keywords" in prompt:
+        return {"keywords": list(dict.fromkeys(_words(user_message)))[:8]}
+
+    if "propert" in prompt:
+        return _properties(user_message)
+
+    if "column" in prompt:
+        return {"column": next(iter(json.loads(user_message)), None)}
+
+    return {"text": user_message[:500]}
+
+
+class LLMStub:
+    """
+    Chat completions server with the configurable latency and injected 429s
+
+    The random generator of every request is seeded with the input and the number
+    of times it was seen, so the run does not depend on the order of the requests
+    and the retried request eventually succeeds.
+    """
+
+    def __init__(
+        self,
+        latency: LatencyModel,
+        rate_limit_ratio: float = 0.0,
+        seed: int = 0,
+        rpm: int = 10_000,
+        tpm: int = 10_000_000,
+    ):
+        self._latency = latency
+        self._rate_limit_ratio = rate_limit_ratio
+        self._seed = seed
+        self._rpm = rpm
+        self._tpm = tpm
+        self._seen: Counter = Counter()
+        self._runner: Optional[web.AppRunner] = None
+        self.stats: Counter = Counter()
+        self.latencies: list[float] = []
+        self.app = web.Application()
+        self.app.router.add_post("/v1/chat/completions", self._completions)
+
+    async def _completions(self, request: web.Request) -> web.Response:
+        started = time.monotonic()
+        body = await request.json()
+        messages = {message["role"]: message["content"] for message in body["messages"]}
+        system, user = messages.get("system", ""), messages.get("user", "")
+
+        key = f"{self._seed}:{system}:{user}"
+        self._seen[key] += 1
+        rng = random.Random(f"{key}:{self._seen[key]}")
+        self.stats["requests"] += 1
+
+        if rng.random() < self._rate_limit_ratio:
+            self.stats["rate_limited"] += 1
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status=429,
+                headers={"Retry-After": "1"},
+            )
+
+        await asyncio.sleep(self._latency.sample(rng))
+        content = json.dumps(canned_response(system, user), ensure_ascii=False)
+        prompt_tokens = (len(system) + len(user)) // 4
+        completion_tokens = len(content) // 4
+        self.stats["tokens"] += prompt_tokens + completion_tokens
+        self.latencies.append(time.monotonic() - started)
+
+        return web.json_response(
+            {
+                "id": f"chatcmpl-{self.stats['requests']}",
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            },
+            headers={
+                "x-ratelimit-limit-requests": str(self._rpm),
+                "x-ratelimit-limit-tokens": str(self._tpm),
+            },
+        )
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Start serving
+
+        :param host: The host to listen on
+        :param port: The port, 0 for any free one
+        :return: The base URL of the API
+        """
+
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        return f"http://{host}:{self._runner.addresses[0][1]}/v1"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def serve(args: argparse.Namespace):
+    stub = LLMStub(
+        LatencyModel(args.latency),
+        rate_limit_ratio=args.rate_limit_ratio,
+        seed=args.seed,
+    )
+    url = await stub.start(args.host, args.port)
+    print(f"Serving the chat completions API at {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="lognormal:0.8:0.5")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import hashlib
+import re
+from collections import Counter
+from typing import Iterable, Optional
+
+__all__ = ["Boilerplate"]
+
+
+def _digest(line: str) -> Optional[str]:
+    """
+    Hash the normalized line, None for the empty ones
+    """
+
+    key = re.sub(r"\s+", " ", line).strip().casefold()
+    if not key:
+        return None
+
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+class Boilerplate:
+    """
+    The text blocks repeated across the product pages of a single source,
+    like the delivery terms or the warranty text under every description
+
+    The blocks are the lines found on at least `min_share` of the first
+    `sample_size` product pages of the run. Until the pages are sampled,
+    the blocks learned by the previous run are used. Only the hashes of the
+    blocks are kept, so they are cheap to store with the source. The lines
+    shorter than `min_chars` are never stripped: the same short property,
+    like the brand of a single-brand shop, is still a property of the product.
+    """
+
+    def __init__(
+        self,
+        blocks: Optional[Iterable[str]] = None,
+        sample_size: int = 30,
+        min_share: float = 0.6,
+        min_chars: int = 40,
+    ):
+        """
+        :param blocks: The hashes of the blocks learned by the previous run
+        :param sample_size: The number of product pages to learn from
+        :param min_share: The share of the sampled pages a block is found on
+        :param min_chars: The shortest block
+        """
+
+        self._blocks = set(blocks or ())
+        self._sample_size = sample_size
+        self._min_share = min_share
+        self._min_chars = min_chars
+        self._samples: Counter = Counter()
+        self._sampled = 0
+        self.stats: Counter = Counter()
+
+    @property
+    def blocks(self) -> list[str]:
+        """
+        The hashes of the blocks, to be stored with the source
+        """
+
+        return sorted(self._blocks)
+
+    @property
+    def learned(self) -> bool:
+        """
+        Whether the blocks were learned in this run
+        """
+
+        return self._sampled >= self._sample_size
+
+    def observe(self, texts: Iterable[str]):
+        """
+        Sample the texts of a product page
+
+        :param texts: The raw texts of the page, like the description and properties
+        """
+
+        if self.learned:
+            return
+
+        self._sampled += 1
+        self._samples.update(
+            {
+                digest
+                for text in texts
+                for line in text.splitlines()
+                if len(line.strip()) >= self._min_chars
+                and (digest := _digest(line)) is not None
+            }
+        )
+
+        if self.learned:
+            self._blocks = {
+                digest
+                for digest, pages in self._samples.items()
+                if pages >= self._min_share * self._sampled
+            }
+            self._samples.clear()
+
+    def strip(self, text: str) -> str:
+        """
+        Remove the blocks from the text. The text made of the blocks alone
+        is kept as is, the field is not emptied
+
+        :param text: The text
+        :return: The text without the blocks
+        """
+
+        if not self._blocks:
+            return text
+
+        lines = []
+        stripped = []
+        for line in text.splitlines():
+            if len(line.strip()) >= self._min_chars and _digest(line) in self._blocks:
+                stripped.append(line)
+            else:
+                lines.append(line)
+
+        if not any(line.strip() for line in lines):
+            return text
+
+        self.stats["lines"] += len(stripped)
+        self.stats["chars"] += sum(map(len, stripped))
+        return "\n".join(lines)
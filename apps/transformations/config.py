@@ -1,3 +1,7 @@
+from typing import Literal, Optional
+
+from pydantic import Field
+
 from packages.config import BaseConfig
 
 
@@ -6,8 +10,84 @@ class TransformationsConfig(BaseConfig):
     Transformations configuration
     """
 
-    gemini_api_key: str
     backend_url: str
+    pipeline_queue_size: int = Field(
+        default=100,
+        description="The capacity of the queues between the crawling stages",
+    )
+    pipeline_write_batch_size: int = Field(
+        default=50,
+        description="The number of products upserted to the database at once",
+    )
+    pipeline_flush_interval: float = Field(
+        default=5.0,
+        description="Seconds after which an incomplete batch of products is upserted",
+    )
+    extraction_executor: Literal["inline", "thread", "process"] = Field(
+        default="thread",
+        description="Where the HTML pages are parsed: in the event loop, "
+        "in a thread pool or in a process pool",
+    )
+    link_extraction_mode: Literal["stream", "dom"] = Field(
+        default="stream",
+        description="How the product links are found on the listing pages: "
+        "by scanning the raw contents or by parsing the whole page",
+    )
+    extraction_workers: Optional[int] = Field(
+        default=None,
+        description="The number of parsing workers, defaults to the number of CPUs",
+    )
+    llm_description_tokens: int = Field(
+        default=2000,
+        description="The tokens of the description sent to the LLM, the rest is dropped",
+    )
+    llm_keywords_tokens: int = Field(
+        default=2000,
+        description="The tokens of the text the keywords are extracted from",
+    )
+    llm_properties_tokens: int = Field(
+        default=2000,
+        description="The tokens of a single chunk of the properties sent to the LLM",
+    )
+    llm_properties_max_chunks: int = Field(
+        default=4,
+        description="The number of chunks of the properties, the rest is dropped",
+    )
+
+    keywords_local_count: int = Field(
+        default=10,
+        description="The number of keywords extracted without the LLM",
+    )
+    keywords_min_confidence: float = Field(
+        default=0.75,
+        description="The confidence below which the `local-then-llm` keywords mode "
+        "asks the LLM instead",
+    )
+    keywords_corpus_size: int = Field(
+        default=1000,
+        description="The number of collected products of the source the keyword "
+        "frequencies are learned from",
+    )
+    keywords_min_corpus: int = Field(
+        default=50,
+        description="The number of products of the source the local keywords are "
+        "fully confident with",
+    )
+
+    boilerplate_sample_size: int = Field(
+        default=30,
+        description="The number of product pages the repeated text blocks of the "
+        "source are learned from",
+    )
+    boilerplate_min_share: float = Field(
+        default=0.6,
+        description="The share of the sampled pages a text block is repeated on "
+        "to be stripped",
+    )
+    boilerplate_min_chars: int = Field(
+        default=40,
+        description="The shortest text block which is stripped",
+    )
 
 
 config = TransformationsConfig()  # pyright: ignore[reportCallIssue]
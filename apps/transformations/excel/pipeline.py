@@ -4,8 +4,9 @@ from typing import Optional
 from prefect import flow
 from sqlalchemy.dialects.postgresql import insert
 
+from packages.chatgpt import Priority, llm_priority
 from packages.database import Config, ExcelSource, ExcelSourceState, Product, TheSession
-from transformations.utils import reload_sources
+from transformations.utils import pooled_connections, reload_sources
 
 from .tasks import enrich_product, initial_excel_processing
 
@@ -13,6 +14,7 @@ __all__ = ["excel_processing"]
 
 
 @flow(name="Excel Processing", log_prints=True)
+@pooled_connections
 async def excel_processing(id: str) -> Optional[str]:
     """
     Processes the Excel file
@@ -21,6 +23,8 @@ async def excel_processing(id: str) -> Optional[str]:
     :return: The flow run ID or None
     """
 
+    llm_priority.set(Priority.BULK)
+
     with TheSession() as session:
         if not (
             excel_source := session.query(ExcelSource)
@@ -0,0 +1,98 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Literal, Optional, ParamSpec, TypeVar
+
+from .config import config
+
+__all__ = ["ExtractionExecutor", "extraction_executor"]
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+class ExtractionExecutor:
+    """
+    Runs the CPU-bound parsing off the event loop
+
+    - `inline` parses right in the event loop, as before
+    - `thread` uses a thread pool, lxml releases the GIL while parsing
+    - `process` uses a pool of spawned processes, so parsing scales across the cores.
+      The functions and their arguments are pickled, so only the module-level
+      functions of `transformations.parsing` taking and returning plain data fit
+    """
+
+    def __init__(
+        self,
+        mode: Literal["inline", "thread", "process"],
+        workers: Optional[int] = None,
+    ):
+        self._mode = mode
+        self._workers = workers or os.cpu_count() or 1
+        self._executor: Optional[Executor] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def executor(self) -> Optional[Executor]:
+        """
+        Get the pool of the workers, creating it if needed
+        """
+
+        if self._mode == "inline":
+            return None
+
+        # The pools are not inherited by the forked processes
+        if self._executor is None or self._pid != os.getpid():
+            if self._mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers,
+                    thread_name_prefix="extraction",
+                )
+
+            self._pid = os.getpid()
+
+        return self._executor
+
+    async def run(self, fn: Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        """
+        Run the function in the pool
+
+        :param fn: The parsing function
+        :return: The result of the function
+        """
+
+        executor = self.executor
+        if executor is None:
+            return fn(*args, **kwargs)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, functools.partial(fn, *args, **kwargs)
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. killed by OOM), the next call starts a new pool
+            self.shutdown()
+            raise
+
+    def shutdown(self):
+        """
+        Stop the workers
+        """
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+extraction_executor = ExtractionExecutor(
+    config.extraction_executor,
+    config.extraction_workers,
+)
@@ -0,0 +1,101 @@
+"""
+The properties laid out as the key-value pairs: the table rows, the definition
+lists and the "key: value" list items.
+"""
+
+import re
+from typing import Iterator
+
+from lxml import etree
+
+__all__ = ["extract_key_values", "is_key_value_layout"]
+
+_ROWS = etree.XPath("descendant-or-self::tr[not(.//table)]")
+_DEFINITION_LISTS = etree.XPath("descendant-or-self::dl[not(.//dl)]")
+_LIST_ITEMS = etree.XPath("descendant-or-self::li[not(.//li)]")
+_TEXT = etree.XPath(".//text()")
+
+# The longest key, the longer text is a sentence rather than a property name
+MAX_KEY_LENGTH = 60
+
+
+def _text(element: etree._Element) -> str:
+    return re.sub(r"\s+", " ", "".join(map(str, _TEXT(element)))).strip()
+
+
+def _key(text: str) -> str:
+    return text.rstrip(":").strip()
+
+
+def _table_pairs(root: etree._Element) -> Iterator[tuple[str, str]]:
+    for row in _ROWS(root):
+        cells = [cell for cell in row if cell.tag in ("th", "td")]
+        if len(cells) == 2:
+            yield _key(_text(cells[0])), _text(cells[1])
+
+
+def _definition_pairs(root: etree._Element) -> Iterator[tuple[str, str]]:
+    for definitions in _DEFINITION_LISTS(root):
+        key = None
+        for child in definitions.iter("dt", "dd"):
+            if child.tag == "dt":
+                key = _key(_text(child))
+            elif key is not None:
+                yield key, _text(child)
+                key = None
+
+
+def _list_pairs(root: etree._Element) -> Iterator[tuple[str, str]]:
+    for item in _LIST_ITEMS(root):
+        children = [child for child in item if isinstance(child.tag, str)]
+        if len(children) == 2 and all(map(_text, children)):
+            yield _key(_text(children[0])), _text(children[1])
+            continue
+
+        key, separator, value = _text(item).partition(":")
+        if separator:
+            yield key.strip(), value.strip()
+
+
+def extract_key_values(root: etree._Element) -> dict[str, str]:
+    """
+    Get the key-value pairs of the element, the first occurrence of the key wins
+
+    :param root: The element containing the properties
+    :return: The properties
+    """
+
+    properties: dict[str, str] = {}
+    for pairs in (_table_pairs, _definition_pairs, _list_pairs):
+        for key, value in pairs(root):
+            if key and value and len(key) <= MAX_KEY_LENGTH:
+                properties.setdefault(key, value)
+
+    return properties
+
+
+def is_key_value_layout(
+    properties: dict[str, str],
+    text: str,
+    min_pairs: int = 2,
+    min_coverage: float = 0.6,
+) -> bool:
+    """
+    Check whether the pairs are the whole of the properties, rather than
+    a part of an unstructured text which should go to the LLM
+
+    :param properties: The pairs extracted from the element
+    :param text: The text of the element
+    :param min_pairs: The fewest pairs
+    :param min_coverage: The share of the text the pairs should make
+    :return: Whether the pairs can be used as they are
+    """
+
+    if len(properties) < min_pairs:
+        return False
+
+    total = len(re.sub(r"\s+", "", text))
+    covered = sum(
+        len(re.sub(r"\s+", "", key + value)) for key, value in properties.items()
+    )
+    return total > 0 and covered / total >= min_coverage
@@ -0,0 +1,204 @@
+import math
+import re
+from collections import Counter
+from contextvars import ContextVar
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from packages.database import Product
+
+__all__ = ["KeywordCorpus", "Keywords", "extract_keywords", "keyword_corpus"]
+
+# The words which neither start nor end a keyword
+STOPWORDS = frozenset(
+    """
+    и в во не что он на я с со как а то все она так его но да ты к у же вы за бы
+    по только ее мне было вот от меня еще нет о из ему теперь когда даже ну вдруг
+    ли если уже или ни быть был него до вас нибудь опять уж вам ведь там потом
+    себя ничего ей может они тут где есть надо ней для мы тебя их чем была сам
+    чтоб без будто чего раз тоже себе под будет ж тогда кто этот того потому этого
+    какой совсем ним здесь этом один почти мой тем чтобы нее сейчас были куда
+    зачем всех никогда можно при наконец два об другой хоть после над больше тот
+    через эти нас про всего них какая много разве три эту моя впрочем хорошо свою
+    этой перед иногда лучше чуть том нельзя такой им более всегда конечно всю
+    между это также является являются которые который которая которое
+    шт мм см м кг г л
+    a an and are as at be by for from has have in is it its of on or that the
+    this to was were will with your our you we can all not more
+    """.split()
+)
+# The parts of the text a keyword does not cross
+_CLAUSE_PATTERN = re.compile(r"[.,;:!?]+(?=\s|$)|[()\[\]{}\"«»„“”|/\\\n]+")
+_WORD_PATTERN = re.compile(r"[^\W_]+(?:[-.,'][^\W_]+)*")
+
+# The corpus of the source of the products processed in the current context.
+# Set by the flows, without it the local keywords are less confident
+keyword_corpus: ContextVar[Optional["KeywordCorpus"]] = ContextVar(
+    "keyword_corpus", default=None
+)
+
+
+def _words(text: str) -> list[str]:
+    return _WORD_PATTERN.findall(text)
+
+
+class KeywordCorpus:
+    """
+    Document frequencies of the words of the products of a single source
+
+    The words common to the most products of the source, like the name of the
+    shop or the delivery terms, get the lowest weight in their keywords.
+    """
+
+    def __init__(self):
+        self.documents = 0
+        self._frequencies: Counter = Counter()
+
+    @classmethod
+    def load(cls, session: Session, source_id: str, limit: int) -> "KeywordCorpus":
+        """
+        Build the corpus from the already collected products of the source
+
+        :param session: The database session
+        :param source_id: The ID of the source
+        :param limit: The number of products to use
+        :return: The corpus
+        """
+
+        corpus = cls()
+        for (data,) in (
+            session.query(Product.data)
+            .filter(Product.source_id == source_id)
+            .order_by(Product.last_processed.desc())
+            .limit(limit)
+        ):
+            corpus.add(
+                " ".join(
+                    str(data[field])
+                    for field in ("name", "description")
+                    if data.get(field) and data[field] != "N/A"
+                )
+            )
+
+        return corpus
+
+    def add(self, text: str):
+        """
+        Count the words of a product
+
+        :param text: The text of the product
+        """
+
+        self.documents += 1
+        self._frequencies.update({word.casefold() for word in _words(text)})
+
+    def idf(self, word: str) -> float:
+        """
+        The inverse document frequency of the word, 1 for the words never seen
+
+        :param word: The casefolded word
+        :return: The weight of the word
+        """
+
+        return math.log((1 + self.documents) / (1 + self._frequencies[word])) + 1
+
+
+class Keywords(NamedTuple):
+    """
+    Represents the keywords extracted without the LLM
+    """
+
+    keywords: list[str]
+    # From 0 to 1, grows with the number of keywords found and the size of the corpus
+    confidence: float
+
+
+def _candidates(
+    text: str, max_words: int
+) -> Iterable[tuple[int, tuple[str, ...], list[str]]]:
+    """
+    Get the phrases of up to `max_words` words not starting or ending with
+    a stopword, along with the number of the clause they appear in.
+    The phrases are yielded both casefolded and as spelled
+    """
+
+    for position, clause in enumerate(_CLAUSE_PATTERN.split(text)):
+        words = _words(clause)
+        folded = [word.casefold() for word in words]
+        for start, first in enumerate(folded):
+            if first in STOPWORDS:
+                continue
+
+            for end in range(start, min(start + max_words, len(words))):
+                last = folded[end]
+                if last in STOPWORDS:
+                    continue
+
+                # The numbers alone are kept only if they look like a model number
+                if start == end and (len(last) < 2 or last.isdigit() and len(last) < 3):
+                    continue
+
+                yield position, tuple(folded[start : end + 1]), words[start : end + 1]
+
+
+def extract_keywords(
+    text: str,
+    corpus: Optional[KeywordCorpus] = None,
+    limit: int = 10,
+    max_words: int = 3,
+    min_corpus: int = 50,
+) -> Keywords:
+    """
+    Extract the keywords of the text with TF-IDF: a phrase is weighted by the
+    frequency of its words in the text, their rarity across the corpus, the number
+    of its occurrences and how early it first appears
+
+    :param text: The text
+    :param corpus: The corpus of the source, without it all the words are equally rare
+    :param limit: The number of keywords
+    :param max_words: The longest keyword, in words
+    :param min_corpus: The number of products the corpus is reliable with
+    :return: The keywords, the best first
+    """
+
+    # The spelling of the first occurrence, the first clause and the count
+    phrases: dict[tuple[str, ...], list] = {}
+    term_frequencies: Counter = Counter()
+    for position, key, phrase in _candidates(text, max_words):
+        if len(key) == 1:
+            term_frequencies[key[0]] += 1
+        if key in phrases:
+            phrases[key][2] += 1
+        else:
+            phrases[key] = [phrase, position, 1]
+
+    weights: dict[str, float] = {}
+
+    def weight(word: str) -> float:
+        if word not in weights:
+            idf = corpus.idf(word) if corpus is not None else 1.0
+            weights[word] = (1 + math.log(max(1, term_frequencies[word]))) * idf
+
+        return weights[word]
+
+    scores = []
+    for key, (phrase, position, count) in phrases.items():
+        words = [word for word in key if word not in STOPWORDS]
+        score = (
+            sum(map(weight, words))
+            / len(words)
+            * (1 + 0.25 * (len(key) - 1))
+            * math.sqrt(count)
+            / math.log2(2 + position)
+        )
+        scores.append((score, " ".join(phrase)))
+
+    scores.sort(key=lambda item: item[0], reverse=True)
+    keywords = [phrase for _, phrase in scores[:limit]]
+
+    coverage = 0.0
+    if corpus is not None:
+        coverage = min(1.0, corpus.documents / min_corpus) if min_corpus else 1.0
+
+    return Keywords(keywords, min(1.0, len(keywords) / limit) * (0.5 + 0.5 * coverage))
@@ -0,0 +1,836 @@
+"""
+CPU-bound HTML parsing, run by the `extraction_executor`.
+
+The functions here take the page contents and plain data and return plain data,
+so that they can be executed in another process. Keep the imports light, they are
+repeated by every worker process.
+"""
+
+import functools
+import html
+import re
+import zlib
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    Literal,
+    NamedTuple,
+    Optional,
+    TypedDict,
+    Union,
+)
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit
+
+from lxml import etree
+
+from packages.schemas.satu import UserFilledData
+
+from .key_values import extract_key_values, is_key_value_layout
+from .structured_data import extract_structured_data
+
+__all__ = [
+    "CUSTOM_EXTRACTORS",
+    "CUSTOM_TRANSFORMERS",
+    "DERIVED_FIELDS",
+    "ExtractionPlan",
+    "ListedProduct",
+    "ListingSpec",
+    "PlanSpec",
+    "STRUCTURED_FIELDS",
+    "SitemapEntry",
+    "SitemapParser",
+    "canonical_url",
+    "extract_fields",
+    "extract_links",
+    "extract_listing",
+    "extract_meta",
+    "extract_obo_product",
+    "extraction_plan",
+    "is_missing",
+    "iter_links",
+    "parse_html",
+    "process_arbitrary_string",
+    "process_image",
+    "process_price",
+    "process_properties",
+]
+
+
+def parse_html(contents: Union[str, bytes]) -> etree._Element:
+    """
+    Parse the HTML page
+
+    :param contents: The contents of the page
+    :return: The root element
+    """
+
+    parser = etree.HTMLParser()
+    return etree.fromstring(contents, parser)
+
+
+def process_image(url: str, img: etree._Element) -> str:
+    if img.tag == "img":
+        img_url = img.get("src", "")
+        if img_url.startswith("/"):
+            return f"{urlparse(url).scheme}://{urlparse(url).hostname}{img_url}"
+
+        return str(img_url)
+
+    closest_imgs = img.xpath(".//img")
+    if not isinstance(closest_imgs, list) or not closest_imgs:
+        return "N/A"
+
+    closest_img = list(
+        sorted(
+            filter(
+                lambda x: isinstance(x, etree._Element) and hasattr(x, "get"),
+                closest_imgs,
+            ),
+            key=lambda x: len(x.get("src", "")),  # type: ignore
+            reverse=True,
+        )
+    )[0]
+
+    img_url = closest_img.get("src", "")  # type: ignore
+    if img_url.startswith("/"):
+        return f"{urlparse(url).scheme}://{urlparse(url).hostname}{img_url}"
+
+    return str(img_url)
+
+
+def process_price(price: str) -> float:
+    try:
+        return float(re.sub(r"[^\d.]", "", price.replace(",", ".")))
+    except ValueError:
+        return -1
+
+
+def process_arbitrary_string(currency: str) -> str:
+    return re.sub(r"[^A-Za-zА-Яа-яЁёÀ-ÿ.]", "", currency)
+
+
+# Cheap transformers of the extracted text, the LLM-backed ones are applied later
+CUSTOM_TRANSFORMERS = {
+    "price": process_price,
+    "currency": process_arbitrary_string,
+    "measure_unit": process_arbitrary_string,
+}
+
+
+def process_properties(url: str, elements: list[etree._Element]) -> Any:
+    """
+    Get the properties laid out as the key-value pairs as they are,
+    so that only the unstructured text of the properties goes to the LLM
+
+    :param url: The URL of the product
+    :param elements: The elements of the properties
+    :return: The properties or their text
+    """
+
+    text = "".join(
+        str(text) for element in elements for text in element.xpath(".//text()")
+    )
+    properties: dict[str, str] = {}
+    for element in elements:
+        for key, value in extract_key_values(element).items():
+            properties.setdefault(key, value)
+
+    return properties if is_key_value_layout(properties, text) else text
+
+
+# The extractors of the fields which need the matched elements, not only their text
+CUSTOM_EXTRACTORS: dict[str, Callable[[str, list[etree._Element]], Any]] = {
+    "main_image": lambda url, elements: process_image(url, elements[0]),
+    "properties": process_properties,
+}
+# The fields produced from the other fields, which are validated through them
+DERIVED_FIELDS = {"keywords": "description"}
+# The fields the schema.org data describes unambiguously, so it is preferred
+# to the XPaths. The description there is usually a short summary of the page.
+# The name is the key of the stored product (see `product_row`), so it is taken
+# from the XPath as it always was, and from the structured data only when
+# the XPath finds nothing
+STRUCTURED_FIELDS = ("sku", "price", "currency", "main_image")
+
+
+class PlanSpec(TypedDict):
+    """
+    The extraction rules of the website source, as stored in the database
+    """
+
+    props_xpaths: dict[str, str]
+    product_regex: Optional[str]
+    pagination: Optional[str]
+
+
+class ExtractionPlan(NamedTuple):
+    """
+    The compiled extraction rules of the website source
+    """
+
+    # The XPath of every field, None if the field has no valid XPath.
+    # The fields with a custom extractor select the element, the others the text nodes
+    fields: dict[str, Optional[etree.XPath]]
+    product_regex: Optional[re.Pattern]
+    pagination_regex: Optional[re.Pattern]
+
+
+def _compile_xpath(xpath: str) -> Optional[etree.XPath]:
+    try:
+        return etree.XPath(xpath)
+    except etree.XPathSyntaxError:
+        return None
+
+
+def _pagination_regex(pagination: str) -> re.Pattern:
+    """
+    Build the regex matching the page numbers in the pagination URLs
+    """
+
+    pagination_regex = re.escape(pagination).replace(r"%swp\-new\-pagination%", r"(\d+)")
+    if pagination_regex.startswith("http"):
+        pagination_regex = re.sub(
+            r"(https?://[^/]+)",
+            r"(?:\g<1>)?",
+            pagination_regex,
+        )
+
+    return re.compile(pagination_regex)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_plan(
+    props_xpaths: tuple[tuple[str, str], ...],
+    product_regex: Optional[str],
+    pagination: Optional[str],
+) -> ExtractionPlan:
+    xpaths = dict(props_xpaths)
+    fields = {}
+    for field in UserFilledData.model_fields.keys():
+        xpath = xpaths.get(field)
+        if not xpath:
+            fields[field] = None
+        elif field in CUSTOM_EXTRACTORS:
+            fields[field] = _compile_xpath(xpath)
+        else:
+            fields[field] = _compile_xpath(f"{xpath}//text()")
+
+    return ExtractionPlan(
+        fields=fields,
+        product_regex=re.compile(product_regex) if product_regex else None,
+        pagination_regex=_pagination_regex(pagination) if pagination else None,
+    )
+
+
+def extraction_plan(spec: PlanSpec) -> ExtractionPlan:
+    """
+    Get the compiled extraction plan. The plans are cached per process by the rules,
+    so a source is compiled once and reused by all of its products and flow runs
+    until its rules change
+
+    :param spec: The extraction rules of the source
+    :return: The compiled plan
+    """
+
+    return _compile_plan(
+        tuple(sorted((spec["props_xpaths"] or {}).items())),
+        spec["product_regex"],
+        spec["pagination"],
+    )
+
+
+def is_missing(value: Any) -> bool:
+    """
+    Check whether the extracted value is a placeholder: nothing matched,
+    a blank text or no properties. The price which is not a number is not
+    missing, it is stored as -1 like it always was
+
+    :param value: The extracted value
+    :return: Whether the field is missing
+    """
+
+    if value is None or value == "N/A":
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, dict):
+        return not value
+
+    return False
+
+
+def _transform(field: str, value: Any) -> Any:
+    """
+    Apply the `CUSTOM_TRANSFORMERS` to the text value, wherever it was found
+    """
+
+    if isinstance(value, str) and (transformer := CUSTOM_TRANSFORMERS.get(field)):
+        return transformer(value)
+
+    return value
+
+
+def _extract_field(
+    url: str, tree: etree._Element, field: str, xpath: etree.XPath
+) -> Optional[Any]:
+    """
+    Extract the field with its XPath, None if nothing matched
+    """
+
+    elems = xpath(tree)
+    if field in CUSTOM_EXTRACTORS:
+        elements = [
+            elem
+            for elem in (elems if isinstance(elems, list) else [])
+            if isinstance(elem, etree._Element)
+        ]
+        return CUSTOM_EXTRACTORS[field](url, elements) if elements else None
+
+    if isinstance(elems, list) and elems:
+        return _transform(field, "".join(map(str, elems)))
+
+    return None
+
+
+def extract_fields(
+    url: str,
+    contents: Union[str, bytes],
+    spec: PlanSpec,
+    exists: bool,
+    mandatory_fields: list[str],
+    do_not_reprocess: list[str],
+    listed: Optional[dict[str, Any]] = None,
+) -> Optional[dict[str, Any]]:
+    """
+    Extract and validate the product fields from the page. The `STRUCTURED_FIELDS`
+    found in the schema.org data of the page (JSON-LD or microdata) are taken from
+    it without evaluating their XPaths. The values from the structured data pass
+    through the same `CUSTOM_TRANSFORMERS`, so a field has the same form whatever
+    it was found in.
+
+    This is the cheap phase of the extraction: the product missing a mandatory
+    field is discarded here, before any of its fields goes to the LLM.
+    The mandatory `DERIVED_FIELDS` require the fields they are produced from
+
+    :param url: The URL of the product
+    :param contents: The contents of the product page
+    :param spec: The extraction rules of the source
+    :param exists: Whether the product is already in the database
+    :param mandatory_fields: The fields without which the product is discarded
+    :param do_not_reprocess: The fields which are not extracted for existing products
+    :param listed: The fields found in the item of the listing page, see `extract_listing`
+    :return: The extracted data or None if the product should be discarded
+    """
+
+    plan = extraction_plan(spec)
+    tree = parse_html(contents)
+    structured = extract_structured_data(tree, url)
+    # The rest of the structured data and the listing item fill in the fields
+    # the XPaths did not find
+    fallback = {**structured.open_graph, **(listed or {}), **structured.product}
+    mandatory = {DERIVED_FIELDS.get(field, field) for field in mandatory_fields}
+
+    data = {}
+    for field, xpath in plan.fields.items():
+        if exists and field in do_not_reprocess:
+            continue
+
+        if field in STRUCTURED_FIELDS and field in structured.product:
+            data[field] = _transform(field, structured.product[field])
+            continue
+
+        value = _extract_field(url, tree, field, xpath) if xpath is not None else None
+        if is_missing(value):
+            value = _transform(field, fallback.get(field))
+        if is_missing(value):
+            if xpath is None or field in mandatory:
+                return None
+
+            value = "N/A"
+
+        data[field] = value
+
+    data["url"] = url
+    return data
+
+
+# Comments, scripts and styles are matched only to be skipped, the links in them
+# are not a part of the page. `data-href` and the like are not links either
+_LINK_PATTERN = (
+    r"""<!--.*?-->|<script\b.*?</script\s*>|<style\b.*?</style\s*>"""
+    r"""|<a\s[^>]*?(?<![\w-])href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))"""
+)
+_BASE_PATTERN = r"""<base\s[^>]*?\bhref\s*=\s*["']?([^\s"'>]+)"""
+_LINK_REGEX = re.compile(_LINK_PATTERN, re.IGNORECASE | re.DOTALL)
+_LINK_REGEX_BYTES = re.compile(_LINK_PATTERN.encode(), re.IGNORECASE | re.DOTALL)
+_BASE_REGEX = re.compile(_BASE_PATTERN, re.IGNORECASE)
+_BASE_REGEX_BYTES = re.compile(_BASE_PATTERN.encode(), re.IGNORECASE)
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+# The links which `canonical_url` would not change, apart from prepending the origin
+_CANONICAL_PATH_REGEX = re.compile(r"/(?!/)[^#&\s]*(?<!\?)\Z")
+_CANONICAL_URL_REGEX = re.compile(r"https?://[a-z0-9.-]+/[^#&\s]*(?<!\?)\Z")
+
+
+def canonical_url(url: str, base: Optional[str] = None) -> str:
+    """
+    Resolve the URL against the base and normalize it, so that the same page
+    is always represented by the same string
+
+    :param url: The absolute or relative URL
+    :param base: The URL of the page the link was found on
+    :return: The absolute URL with lowercase scheme and host, without
+             the default port and the fragment
+    """
+
+    if "&" in url:
+        url = html.unescape(url)
+
+    url = url.strip()
+    if base:
+        url = urljoin(base, url)
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    try:
+        if parts.port and _DEFAULT_PORTS.get(scheme) == parts.port:
+            netloc = netloc.rsplit(":", 1)[0]
+    except ValueError:
+        # Invalid port, the URL is kept as is
+        pass
+
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def _link_resolver(base: str) -> Callable[[str], str]:
+    """
+    Build the function resolving the links found on the page to the canonical URLs.
+    Most of the links are either root-relative or already canonical, so they skip
+    the comparatively slow `urllib.parse` machinery
+    """
+
+    origin = canonical_url("/", base)[:-1]
+
+    def resolve(href: str) -> str:
+        if "/." not in href:
+            if _CANONICAL_PATH_REGEX.match(href):
+                return origin + href
+
+            if _CANONICAL_URL_REGEX.match(href):
+                return href
+
+        return canonical_url(href, base)
+
+    return resolve
+
+
+def _decode(value: Union[str, bytes]) -> str:
+    return value if isinstance(value, str) else value.decode(errors="replace")
+
+
+def iter_links(contents: Union[str, bytes], page_url: str) -> Iterator[str]:
+    """
+    Scan the page for the links without building the DOM
+
+    :param contents: The raw contents of the page
+    :param page_url: The URL of the page, the relative links are resolved against it
+    :return: The canonical URLs of the links, in the order of appearance
+    """
+
+    if isinstance(contents, bytes):
+        link_regex, base_regex = _LINK_REGEX_BYTES, _BASE_REGEX_BYTES
+    else:
+        link_regex, base_regex = _LINK_REGEX, _BASE_REGEX
+
+    base = page_url
+    if base_match := base_regex.search(contents):
+        base = urljoin(page_url, _decode(base_match.group(1)))
+
+    resolve = _link_resolver(base)
+    for match in link_regex.finditer(contents):
+        href = match.group(1) or match.group(2) or match.group(3)
+        if href:
+            yield resolve(_decode(href))
+
+
+def _iter_dom_links(contents: Union[str, bytes], page_url: str) -> Iterator[str]:
+    tree = parse_html(contents)
+    base = page_url
+    if (base_tag := tree.find(".//base[@href]")) is not None:
+        base = urljoin(page_url, base_tag.get("href", ""))
+
+    resolve = _link_resolver(base)
+    for link in tree.iterfind(".//a[@href]"):
+        if href := link.get("href"):
+            yield resolve(href)
+
+
+def extract_links(
+    contents: Union[str, bytes],
+    page_url: str,
+    spec: PlanSpec,
+    mode: Literal["stream", "dom"] = "stream",
+) -> tuple[list[str], int]:
+    """
+    Extract the product URLs from the listing page
+
+    :param contents: The contents of the listing page
+    :param page_url: The URL of the listing page
+    :param spec: The extraction rules of the source
+    :param mode: `stream` scans the raw contents, `dom` parses the whole page
+    :return: The unique canonical product URLs and the total number of links
+             on the page
+    """
+
+    product_regex = extraction_plan(spec).product_regex
+    if product_regex is None:
+        return [], 0
+
+    links = iter_links if mode == "stream" else _iter_dom_links
+
+    total = 0
+    product_urls = {}
+    for link in links(contents, page_url):
+        total += 1
+        if product_url := product_regex.search(link):
+            product_urls[product_url.group(0)] = None
+
+    return list(product_urls), total
+
+
+class ListingSpec(TypedDict):
+    """
+    The extraction rules of the products listed on the listing pages of the source
+    """
+
+    # The XPath of the repeating element of a single product
+    item: str
+    # The XPaths of the fields, relative to the item
+    xpaths: dict[str, str]
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_listing(
+    item: str, xpaths: tuple[tuple[str, str], ...]
+) -> tuple[Optional[etree.XPath], dict[str, etree.XPath]]:
+    fields = {}
+    for field, xpath in xpaths:
+        if field not in UserFilledData.model_fields or not xpath:
+            continue
+
+        # The XPaths are evaluated against the item, not the whole page
+        if xpath.startswith("/"):
+            xpath = f".{xpath}"
+
+        compiled = _compile_xpath(
+            xpath if field in CUSTOM_EXTRACTORS else f"{xpath}//text()"
+        )
+        if compiled is not None:
+            fields[field] = compiled
+
+    return _compile_xpath(item), fields
+
+
+class ListedProduct(NamedTuple):
+    """
+    Represents the product found on the listing page
+    """
+
+    url: str
+    # The fields found in the item, with the URL if the product page is not needed
+    data: dict[str, Any]
+    # Whether the item has every field the listing maps, the name and every
+    # mandatory field, so the product page does not have to be fetched
+    complete: bool
+
+
+def extract_listing(
+    contents: Union[str, bytes],
+    page_url: str,
+    spec: PlanSpec,
+    listing: ListingSpec,
+    mandatory_fields: list[str],
+) -> list[ListedProduct]:
+    """
+    Extract the products from the repeating items of the listing page.
+    The URL of the product is the first link of the item matching the product regex.
+
+    The product is complete when the item has every field the listing maps,
+    the name and every mandatory field, so its page does not have to be fetched.
+    The data of the complete product has only the fields found in the item,
+    the rest are left to the enrichment. Otherwise its page is extracted with
+    `extract_fields` as usual
+
+    :param contents: The contents of the listing page
+    :param page_url: The URL of the listing page
+    :param spec: The extraction rules of the source
+    :param listing: The extraction rules of the listing items
+    :param mandatory_fields: The fields without which the product is discarded
+    :return: The products, unique by the canonical URL
+    """
+
+    plan = extraction_plan(spec)
+    item_xpath, fields = _compile_listing(
+        listing["item"], tuple(sorted(listing["xpaths"].items()))
+    )
+    if item_xpath is None or plan.product_regex is None:
+        return []
+
+    tree = parse_html(contents)
+    base = page_url
+    if (base_tag := tree.find(".//base[@href]")) is not None:
+        base = urljoin(page_url, base_tag.get("href", ""))
+
+    resolve = _link_resolver(base)
+    # The name is the key of the stored product
+    needed = {*fields, "name"}
+    needed |= {DERIVED_FIELDS.get(field, field) for field in mandatory_fields}
+
+    products: dict[str, ListedProduct] = {}
+    for item in item_xpath(tree):
+        if not isinstance(item, etree._Element):
+            continue
+
+        url = next(
+            (
+                product_url.group(0)
+                for href in item.xpath("descendant-or-self::a/@href")
+                if (product_url := plan.product_regex.search(resolve(str(href))))
+            ),
+            None,
+        )
+        if url is None or url in products:
+            continue
+
+        data = {}
+        for field, xpath in fields.items():
+            value = _extract_field(page_url, item, field, xpath)
+            if not is_missing(value):
+                data[field] = value
+
+        complete = needed <= data.keys()
+        if complete:
+            data["url"] = url
+
+        products[url] = ListedProduct(url, data, complete)
+
+    return list(products.values())
+
+
+class SitemapEntry(NamedTuple):
+    """
+    Represents the entry of the sitemap
+    """
+
+    loc: str
+    lastmod: Optional[datetime]
+    # Whether the entry is a nested sitemap of the sitemap index, not a page
+    is_sitemap: bool
+
+
+def _parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse the W3C datetime of the sitemap into the naive UTC datetime
+    """
+
+    if not value:
+        return None
+
+    try:
+        lastmod = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+    if lastmod.tzinfo is not None:
+        lastmod = lastmod.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return lastmod
+
+
+class SitemapParser:
+    """
+    Incremental parser of the sitemaps and the sitemap indexes, gzipped or not
+
+    The contents are fed in chunks as they are received. The parsed entries
+    are removed from the tree right away, so the memory does not grow with
+    the size of the sitemap.
+    """
+
+    def __init__(self):
+        self._parser = etree.XMLPullParser(
+            events=("end",),
+            recover=True,
+            resolve_entities=False,
+            no_network=True,
+        )
+        self._decompressor: Optional[zlib._Decompress] = None
+        self._head = b""
+
+    def feed(self, chunk: bytes) -> list[SitemapEntry]:
+        """
+        Parse the next chunk of the sitemap
+
+        :param chunk: The raw bytes
+        :return: The entries completed by the chunk
+        """
+
+        if self._head is not None:
+            # Gzipped sitemaps are often served without `Content-Encoding`
+            self._head += chunk
+            if len(self._head) < 2:
+                return []
+
+            if self._head.startswith(b"\x1f\x8b"):
+                self._decompressor = zlib.decompressobj(wbits=31)
+
+            chunk, self._head = self._head, None
+
+        if self._decompressor is not None:
+            chunk = self._decompressor.decompress(chunk)
+
+        self._parser.feed(chunk)
+        return self._entries()
+
+    def close(self) -> list[SitemapEntry]:
+        """
+        Finish parsing
+
+        :return: The remaining entries
+        """
+
+        if self._head:
+            self._parser.feed(self._head)
+        elif self._decompressor is not None:
+            self._parser.feed(self._decompressor.flush())
+
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            pass
+
+        return self._entries()
+
+    def _entries(self) -> list[SitemapEntry]:
+        entries = []
+        for _, element in self._parser.read_events():
+            if not isinstance(element.tag, str):
+                continue
+
+            kind = etree.QName(element).localname
+            if kind not in {"url", "sitemap"}:
+                continue
+
+            loc, lastmod = None, None
+            for child in element:
+                if not isinstance(child.tag, str):
+                    continue
+
+                name = etree.QName(child).localname
+                if name == "loc":
+                    loc = (child.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = _parse_lastmod(child.text)
+
+            if loc:
+                entries.append(SitemapEntry(loc, lastmod, kind == "sitemap"))
+
+            element.clear()
+            while (previous := element.getprevious()) is not None:
+                del previous.getparent()[0]
+
+        return entries
+
+
+def extract_meta(base_url: str, contents: Union[str, bytes]) -> dict[str, Optional[str]]:
+    """
+    Extract the name, the description and the favicon of the website
+
+    :param base_url: The base URL of the website
+    :param contents: The contents of the website
+    :return: The extracted meta
+    """
+
+    name, description, favicon = None, None, None
+
+    tree = parse_html(contents)
+
+    title_tag = tree.find(".//title")
+    name = title_tag.text if title_tag is not None else None
+
+    description_tags = [
+        tree.find(".//meta[@name='description']"),
+        tree.find(".//meta[@property='og:description']"),
+        tree.find(".//meta[@property='twitter:description']"),
+    ]
+
+    for description_tag in description_tags:
+        if description_tag is not None:
+            description = description_tag.get("content")
+            break
+
+    links = tree.findall(".//link")
+    for link in links:
+        rel = link.get("rel")
+        if rel is not None and "icon" in rel:
+            favicon = link.get("href")
+            break
+    else:
+        image_tags = [
+            tree.find(".//meta[@property='og:image']"),
+            tree.find(".//meta[@property='twitter:image']"),
+            tree.find(".//meta[@name='twitter:image']"),
+            tree.find(".//link[@rel='image_src']"),
+        ]
+
+        for image_tag in image_tags:
+            if image_tag is not None:
+                favicon = image_tag.get("content")
+                break
+
+    if favicon and favicon.startswith("/"):
+        favicon = f"{base_url}{favicon}"
+
+    return {"name": name, "description": description, "favicon": favicon}
+
+
+def extract_obo_product(contents: Union[str, bytes]) -> dict[str, Any]:
+    """
+    Extract the product from the search page of obo-bettermann.com
+
+    :param contents: The contents of the search page
+    :return: The name, the measure unit, the main image, the properties
+             and the raw description of the product
+    """
+
+    tree = parse_html(contents)
+
+    def extract(xpath: str) -> str:
+        elems = tree.xpath(f"{xpath}//text()")
+        if isinstance(elems, list):
+            return " ".join(map(str, elems)).strip()
+
+        return ""
+
+    properties = {}
+    props_wrapper = tree.find(".//div[@id='variants']")
+    if props_wrapper is not None:
+        for prop in props_wrapper.findall(".//form"):
+            table = prop.find(".//table")
+            if table is not None:
+                properties.update(extract_key_values(table))
+
+    img_xpath = tree.xpath(".//a[@id='zoom-v']//img/@src")
+    if not isinstance(img_xpath, list) or not img_xpath:
+        img_xpath = [None]
+
+    return {
+        "name": extract(".//h1[@id='productTitle']") or None,
+        "measure_unit": (
+            extract(".//div[@class='amount-field-wrapper']//div[2]//label") or "N/A"
+        ),
+        "main_image": str(img_xpath[0]) if img_xpath[0] else "N/A",
+        "properties": properties or "N/A",
+        "description": extract(".//div[@id='productDescriptionText']"),
+    }
@@ -0,0 +1,170 @@
+import asyncio
+from collections import Counter
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, Union
+
+from packages.log import get_logger
+
+__all__ = ["StreamingPipeline"]
+
+Worker = Callable[[Any], AsyncIterator[Any]]
+Writer = Callable[[list[Any]], Awaitable[None]]
+
+_DONE = object()
+
+
+class StreamingPipeline:
+    """
+    Chain of asynchronous stages connected with bounded queues
+
+    Every stage runs its own number of workers. A worker is an async generator
+    which receives a single item and yields any number of results for the next stage,
+    so it can both filter and fan out. When a queue is full, the previous stage waits,
+    which caps the memory regardless of the number of items flowing through.
+    The last stage is a sink which receives the results in batches.
+    """
+
+    def __init__(self, name: str, queue_size: int = 100):
+        self._name = name
+        self._queue_size = queue_size
+        self._stages: list[tuple[str, Worker, int]] = []
+        self._sink: Optional[tuple[Writer, int, float]] = None
+        self.stats: Counter[str] = Counter()
+
+    def stage(
+        self, name: str, worker: Worker, concurrency: int = 1
+    ) -> "StreamingPipeline":
+        """
+        Add the stage to the pipeline
+
+        :param name: The name of the stage, used in logs and stats
+        :param worker: The async generator processing a single item
+        :param concurrency: The number of simultaneous workers
+        """
+
+        self._stages.append((name, worker, max(1, concurrency)))
+        return self
+
+    def sink(
+        self,
+        writer: Writer,
+        batch_size: int,
+        flush_interval: float,
+    ) -> "StreamingPipeline":
+        """
+        Set the final consumer of the pipeline
+
+        :param writer: The coroutine receiving the batch of results
+        :param batch_size: The largest batch passed to the writer
+        :param flush_interval: Seconds after which an incomplete batch is written
+        """
+
+        self._sink = (writer, batch_size, flush_interval)
+        return self
+
+    async def run(self, items: Union[Iterable[Any], AsyncIterator[Any]]):
+        """
+        Feed the items into the pipeline and wait until everything is processed.
+        When the sink or the feed raises, the rest of the stages are cancelled
+
+        :param items: The input of the first stage
+        """
+
+        queues = [asyncio.Queue(self._queue_size) for _ in range(len(self._stages) + 1)]
+        concurrencies = [stage[2] for stage in self._stages] + [1]
+
+        tasks = [
+            asyncio.create_task(self._feed(items, queues[0], concurrencies[0])),
+            *[
+                asyncio.create_task(
+                    self._run_stage(stage, queues[i], queues[i + 1], concurrencies[i + 1])
+                )
+                for i, stage in enumerate(self._stages)
+            ],
+            asyncio.create_task(self._run_sink(queues[-1])),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # Nothing is left running, even when the pipeline itself is cancelled
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _feed(
+        self,
+        items: Union[Iterable[Any], AsyncIterator[Any]],
+        outbox: asyncio.Queue,
+        consumers: int,
+    ):
+        if isinstance(items, AsyncIterator):
+            async for item in items:
+                await outbox.put(item)
+        else:
+            for item in items:
+                await outbox.put(item)
+
+        for _ in range(consumers):
+            await outbox.put(_DONE)
+
+    async def _run_stage(
+        self,
+        stage: tuple[str, Worker, int],
+        inbox: asyncio.Queue,
+        outbox: asyncio.Queue,
+        consumers: int,
+    ):
+        name, worker, concurrency = stage
+        logger = get_logger()
+
+        async def work():
+            while (item := await inbox.get()) is not _DONE:
+                self.stats[name] += 1
+                try:
+                    async for result in worker(item):
+                        await outbox.put(result)
+                except Exception as e:
+                    # A single broken item must not stop the whole pipeline
+                    logger.exception(
+                        "Pipeline stage failed",
+                        extra={"pipeline": self._name, "stage": name, "error": str(e)},
+                    )
+
+        await asyncio.gather(*[work() for _ in range(concurrency)])
+        for _ in range(consumers):
+            await outbox.put(_DONE)
+
+    async def _run_sink(self, inbox: asyncio.Queue):
+        if not self._sink:
+            while await inbox.get() is not _DONE:
+                pass
+
+            return
+
+        writer, batch_size, flush_interval = self._sink
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = loop.time() + flush_interval
+        done = False
+
+        while not done:
+            try:
+                item = await asyncio.wait_for(
+                    inbox.get(),
+                    timeout=max(0.0, deadline - loop.time()),
+                )
+            except asyncio.TimeoutError:
+                item = None
+            else:
+                if item is _DONE:
+                    done = True
+                else:
+                    batch.append(item)
+
+            if batch and (done or len(batch) >= batch_size or loop.time() >= deadline):
+                self.stats["sink"] += len(batch)
+                await writer(batch)
+                batch = []
+
+            if loop.time() >= deadline:
+                deadline = loop.time() + flush_interval
@@ -0,0 +1,215 @@
+"""
+The schema.org `Product` data embedded into the product pages:
+JSON-LD, microdata and OpenGraph.
+"""
+
+import json
+from typing import Any, Iterator, NamedTuple, Optional
+from urllib.parse import urljoin
+
+from lxml import etree
+
+__all__ = ["StructuredData", "extract_structured_data"]
+
+_JSON_LD = etree.XPath("//script[@type='application/ld+json']/text()")
+_MICRODATA = etree.XPath(
+    "//*[@itemscope][contains(@itemtype, 'schema.org/Product')]"
+    "[not(ancestor::*[@itemscope][contains(@itemtype, 'schema.org/Product')])]"
+)
+_ITEMPROP = etree.XPath(
+    ".//*[contains(concat(' ', normalize-space(@itemprop), ' '), concat(' ', $name, ' '))]"
+)
+_OPEN_GRAPH = etree.XPath("//meta[@property and @content]")
+
+# The OpenGraph properties of the fields, the first one present wins
+_OPEN_GRAPH_FIELDS = {
+    "name": ("og:title",),
+    "description": ("og:description",),
+    "main_image": ("og:image", "og:image:url", "og:image:secure_url"),
+    "price": ("product:price:amount", "og:price:amount"),
+    "currency": ("product:price:currency", "og:price:currency"),
+    "sku": ("product:retailer_item_id",),
+}
+
+
+def _is_type(node: dict, name: str) -> bool:
+    types = node.get("@type")
+    types = types if isinstance(types, list) else [types]
+    return any(
+        isinstance(value, str) and value.rsplit("/", 1)[-1] == name for value in types
+    )
+
+
+def _walk(node: Any) -> Iterator[dict]:
+    """
+    Get the JSON-LD objects, including the nested ones and the `@graph` members
+    """
+
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk(item)
+    elif isinstance(node, dict):
+        yield node
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                yield from _walk(value)
+
+
+def _first(value: Any) -> Any:
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _text(value: Any) -> Optional[str]:
+    value = _first(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+
+    return None
+
+
+def _price(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+
+    try:
+        return float(value.replace(" ", "").replace("\xa0", "").replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _from_json_ld(tree: etree._Element, url: str) -> dict[str, Any]:
+    for script in _JSON_LD(tree):
+        try:
+            document = json.loads(str(script), strict=False)
+        except ValueError:
+            continue
+
+        product = next(
+            (node for node in _walk(document) if _is_type(node, "Product")), None
+        )
+        if product is None:
+            continue
+
+        offer = _first(product.get("offers"))
+        offer = offer if isinstance(offer, dict) else {}
+        specification = _first(offer.get("priceSpecification"))
+        specification = specification if isinstance(specification, dict) else {}
+
+        image = _first(product.get("image"))
+        if isinstance(image, dict):
+            image = image.get("url") or image.get("contentUrl")
+
+        data = {
+            "name": _text(product.get("name")),
+            "sku": _text(product.get("sku")) or _text(product.get("mpn")),
+            "description": _text(product.get("description")),
+            "main_image": urljoin(url, image) if _text(image) else None,
+            "price": _price(
+                _text(offer.get("price"))
+                or _text(offer.get("lowPrice"))
+                or _text(specification.get("price"))
+            ),
+            "currency": _text(offer.get("priceCurrency"))
+            or _text(specification.get("priceCurrency")),
+        }
+        return {field: value for field, value in data.items() if value is not None}
+
+    return {}
+
+
+def _itemprop(scope: etree._Element, name: str, url: str) -> Optional[str]:
+    """
+    Get the value of the microdata property, skipping the nested items
+    other than the offers
+    """
+
+    for element in _ITEMPROP(scope, name=name):
+        owner = element.xpath("ancestor::*[@itemscope][1]")[0]
+        if owner is not scope and "Offer" not in owner.get("itemtype", ""):
+            continue
+
+        if element.tag == "meta":
+            value = element.get("content")
+        elif element.tag in ("img", "source"):
+            value = element.get("src") and urljoin(url, element.get("src"))
+        elif element.tag in ("a", "link"):
+            value = element.get("href") and urljoin(url, element.get("href"))
+        else:
+            value = element.get("content") or "".join(element.itertext())
+
+        if value and value.strip():
+            return value.strip()
+
+    return None
+
+
+def _from_microdata(tree: etree._Element, url: str) -> dict[str, Any]:
+    products = _MICRODATA(tree)
+    if not products:
+        return {}
+
+    product = products[0]
+    data = {
+        "name": _itemprop(product, "name", url),
+        "sku": _itemprop(product, "sku", url) or _itemprop(product, "mpn", url),
+        "description": _itemprop(product, "description", url),
+        "main_image": _itemprop(product, "image", url),
+        "price": _price(
+            _itemprop(product, "price", url) or _itemprop(product, "lowPrice", url)
+        ),
+        "currency": _itemprop(product, "priceCurrency", url),
+    }
+    return {field: value for field, value in data.items() if value is not None}
+
+
+def _from_open_graph(tree: etree._Element, url: str) -> dict[str, Any]:
+    properties: dict[str, str] = {}
+    for meta in _OPEN_GRAPH(tree):
+        properties.setdefault(meta.get("property").strip(), meta.get("content").strip())
+
+    data: dict[str, Any] = {}
+    for field, names in _OPEN_GRAPH_FIELDS.items():
+        value = next((properties[name] for name in names if properties.get(name)), None)
+        if value is None:
+            continue
+
+        if field == "price":
+            value = _price(value)
+        elif field == "main_image":
+            value = urljoin(url, value)
+
+        if value is not None:
+            data[field] = value
+
+    return data
+
+
+class StructuredData(NamedTuple):
+    """
+    Represents the product fields found in the structured data of the page
+    """
+
+    # JSON-LD and microdata, which describe the product itself
+    product: dict[str, Any]
+    # OpenGraph, which describes the page and may differ from the product,
+    # like the title with the name of the shop
+    open_graph: dict[str, Any]
+
+
+def extract_structured_data(tree: etree._Element, url: str) -> StructuredData:
+    """
+    Extract the product fields from the structured data of the page.
+    JSON-LD is preferred to microdata, field by field
+
+    :param tree: The parsed page
+    :param url: The URL of the page, to resolve the image URLs
+    :return: The fields found, with the price as a number
+    """
+
+    product = _from_json_ld(tree, url)
+    for field, value in _from_microdata(tree, url).items():
+        product.setdefault(field, value)
+
+    return StructuredData(product, _from_open_graph(tree, url))
@@ -1,15 +1,43 @@
+import asyncio
+import functools
 import re
-
-from httpx import AsyncClient
+from typing import Any, Awaitable, Callable, Optional, TypeVar
 
 from packages.chatgpt import (
+    EnrichProduct,
     ExtractKeywords,
+    ExtractProperties,
     NormalizeDescription,
     chatgpt,
 )
+from packages.chatgpt.tokens import prepare_input
+from packages.database import config_snapshot
+from packages.httpclient import http_pool
 from packages.log import get_logger
 
 from .config import config
+from .keywords import extract_keywords, keyword_corpus
+
+T = TypeVar("T")
+
+
+def pooled_connections(
+    func: Callable[..., Awaitable[T]],
+) -> Callable[..., Awaitable[T]]:
+    """
+    Close the pooled connections of the scraping and the LLM once the flow returns,
+    rather than leaving them to the garbage collector
+
+    :param func: The flow function
+    :return: The wrapped function
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs) -> T:
+        async with http_pool.session(), chatgpt.session():
+            return await func(*args, **kwargs)
+
+    return wrapper
 
 
 async def reload_sources():
@@ -20,8 +48,7 @@ async def reload_sources():
     logger = get_logger()
 
     try:
-        async with AsyncClient() as client:
-            await client.post(f"{config.backend_url}/api/v1/sources/reload")
+        await http_pool.post(f"{config.backend_url}/api/v1/sources/reload")
     except Exception as e:
         logger.exception(f"Failed to reload sources: {e}")
 
@@ -38,11 +65,7 @@ def arbitrary_cleanup(text: str) -> str:
     )
 
 
-async def process_description(description: str) -> str:
-    description = arbitrary_cleanup(description)
-    if not description:
-        return "N/A"
-
+async def _normalize_description(description: str) -> str:
     try:
         return await chatgpt(NormalizeDescription(description))
     except Exception as e:
@@ -53,13 +76,162 @@ async def process_description(description: str) -> str:
         return "N/A"
 
 
+async def _extract_properties(chunks: list[str]) -> dict[str, Any]:
+    """
+    Extract the properties of every chunk and merge them,
+    the first chunk mentioning the property wins
+    """
+
+    properties: dict[str, Any] = {}
+    results = await asyncio.gather(
+        *(chatgpt(ExtractProperties(chunk)) for chunk in chunks),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            get_logger().error(
+                "Failed to extract properties", extra={"error": str(result)}
+            )
+        elif isinstance(result, dict):
+            for key, value in result.items():
+                properties.setdefault(key, value)
+
+    return properties
+
+
+def _local_keywords(text: str) -> Optional[str]:
+    """
+    Extract the keywords without the LLM, as the `keywords_mode` says.
+    The frequencies of the words are taken from the `keyword_corpus` of the context
+
+    :param text: The cleaned up text
+    :return: The comma-joined keywords or None if the LLM should extract them
+    """
+
+    mode = config_snapshot.get().keywords_mode
+    if mode == "llm":
+        return None
+
+    keywords = extract_keywords(
+        text,
+        keyword_corpus.get(),
+        limit=config.keywords_local_count,
+        min_corpus=config.keywords_min_corpus,
+    )
+    if mode == "local-then-llm" and keywords.confidence < config.keywords_min_confidence:
+        return None
+
+    return ", ".join(keywords.keywords)
+
+
+async def process_description(description: str) -> str:
+    description = arbitrary_cleanup(description)
+    if not description:
+        return "N/A"
+
+    (description,) = prepare_input(description, config.llm_description_tokens)
+    return await _normalize_description(description)
+
+
 async def process_keywords(text: str) -> str:
     text = arbitrary_cleanup(text)
     if not text:
         return ""
 
+    if (keywords := _local_keywords(text)) is not None:
+        return keywords
+
+    (text,) = prepare_input(text, config.llm_keywords_tokens)
     try:
         return ", ".join(await chatgpt(ExtractKeywords(text)))
     except Exception as e:
         get_logger().exception("Failed to extract keywords", extra={"error": str(e)})
         return ""
+
+
+async def process_properties(properties: str) -> dict[str, Any]:
+    properties = arbitrary_cleanup(properties)
+    if not properties:
+        return {}
+
+    return await _extract_properties(
+        prepare_input(
+            properties,
+            config.llm_properties_tokens,
+            config.llm_properties_max_chunks,
+        )
+    )
+
+
+async def process_product(
+    description: Optional[str] = None,
+    properties: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Normalize the description, extract its keywords and the properties
+    with a single `EnrichProduct` request instead of three sequential ones.
+    The fields missing from its response are processed with the separate prompts,
+    as well as the properties which do not fit into a single chunk.
+    The keywords extracted locally are not requested from the LLM
+
+    :param description: The raw description, None to skip it and the keywords
+    :param properties: The raw properties, None to skip them
+    :return: The processed "description", "keywords" and "properties"
+    """
+
+    result: dict[str, Any] = {}
+
+    if description is not None:
+        description = arbitrary_cleanup(description)
+        if description:
+            if (keywords := _local_keywords(description)) is not None:
+                result["keywords"] = keywords
+
+            (description,) = prepare_input(description, config.llm_description_tokens)
+        else:
+            result["description"] = result["keywords"] = "N/A"
+            description = None
+
+    chunks = []
+    if properties is not None:
+        properties = arbitrary_cleanup(properties)
+        if properties:
+            chunks = prepare_input(
+                properties,
+                config.llm_properties_tokens,
+                config.llm_properties_max_chunks,
+            )
+        else:
+            result["properties"] = {}
+
+    # Without the description there is only one prompt to send anyway
+    if description is not None:
+        try:
+            enriched = await chatgpt(
+                EnrichProduct(
+                    description,
+                    chunks[0] if len(chunks) == 1 else None,
+                    keywords="keywords" not in result,
+                )
+            )
+        except Exception as e:
+            get_logger().exception(
+                "Failed to enrich product, falling back to separate prompts",
+                extra={"error": str(e)},
+            )
+            enriched = {}
+
+        result.update(enriched)
+        if "description" not in result:
+            result["description"] = await _normalize_description(description)
+        if "keywords" not in result:
+            result["keywords"] = (
+                await process_keywords(result["description"])
+                if result["description"] != "N/A"
+                else "N/A"
+            )
+
+    if chunks and "properties" not in result:
+        result["properties"] = await _extract_properties(chunks)
+
+    return result
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from packages.database import Product
+from transformations import parsing
+
+__all__ = ["KnownProduct", "KnownUrlIndex", "utc_now"]
+
+
+def utc_now() -> datetime:
+    """
+    The current time as the naive UTC, like the sitemap `lastmod`
+    and the `last_processed` of the products
+    """
+
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class KnownProduct(NamedTuple):
+    """
+    Represents the product of the source, as of the start of the run
+    """
+
+    # The URL as it is stored, it may predate the canonicalization
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    last_processed: Optional[datetime]
+    # The extraction revision the product was extracted with
+    revision: Optional[str]
+
+
+class KnownUrlIndex:
+    """
+    In-memory index of the products of a single source
+
+    The index is loaded from the database once per run, using the
+    `(source_id, url)` index, and is keyed by the canonical URLs. Only the columns
+    deciding whether the page is fetched are loaded, not the data of the products,
+    so the memory stays small however large the source is. It also remembers
+    the URLs claimed during the run, so every product page is fetched at most once,
+    however many listing pages or sitemaps it appears on.
+    """
+
+    def __init__(self, products: dict[str, KnownProduct], ttl: float = 0):
+        self._products = products
+        self._ttl = timedelta(seconds=ttl)
+        self._claimed: set[str] = set()
+
+    @classmethod
+    def load(cls, session: Session, source_id: str, ttl: float = 0) -> "KnownUrlIndex":
+        """
+        Load the products of the source
+
+        :param session: The database session
+        :param source_id: The ID of the source
+        :param ttl: Seconds after the extraction during which the product is fresh
+        :return: The index
+        """
+
+        return cls(
+            {
+                parsing.canonical_url(product.url): KnownProduct(*product)
+                for product in session.query(
+                    Product.url,
+                    Product.etag,
+                    Product.last_modified,
+                    Product.last_processed,
+                    Product.revision,
+                ).filter(Product.source_id == source_id)
+            },
+            ttl,
+        )
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def get(self, url: str) -> Optional[KnownProduct]:
+        """
+        Get the product
+
+        :param url: The canonical URL of the product
+        :return: The product or None if it is new
+        """
+
+        return self._products.get(url)
+
+    def claim(self, url: str) -> bool:
+        """
+        Mark the URL as processed in this run
+
+        :param url: The canonical URL of the product
+        :return: False if the URL was already claimed
+        """
+
+        if url in self._claimed:
+            return False
+
+        self._claimed.add(url)
+        return True
+
+    def is_fresh(self, url: str) -> bool:
+        """
+        Whether the product was extracted less than the TTL ago
+
+        :param url: The canonical URL of the product
+        """
+
+        product = self._products.get(url)
+        return bool(
+            self._ttl
+            and product
+            and product.last_processed
+            and utc_now() - product.last_processed < self._ttl
+        )
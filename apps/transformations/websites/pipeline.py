@@ -4,7 +4,7 @@ from prefect import flow
 from prefect.states import Completed, Failed
 
 from packages.database import TheSession, WebsiteSource, WebsiteSourceState
-from transformations.utils import reload_sources
+from transformations.utils import pooled_connections, reload_sources
 
 from .tasks import extract_website_meta, scrape_website
 from .tasks.xpath_extraction import extract_products, reprocess_products
@@ -13,6 +13,7 @@ __all__ = ["initial_processing", "extract_products", "reprocess_products"]
 
 
 @flow(name="Initial Website Processing", log_prints=True)
+@pooled_connections
 async def initial_processing(id: str):
     """
     Initial processing of the website
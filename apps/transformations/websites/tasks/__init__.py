@@ -1,4 +1,12 @@
 from .extract_meta import ScrapedMeta, extract_website_meta
 from .scrape_website import ScrapedWebsite, scrape_website
+from .sitemap import discover_sitemaps, iter_sitemaps
 
-__all__ = ["scrape_website", "extract_website_meta", "ScrapedWebsite", "ScrapedMeta"]
+__all__ = [
+    "scrape_website",
+    "extract_website_meta",
+    "discover_sitemaps",
+    "iter_sitemaps",
+    "ScrapedWebsite",
+    "ScrapedMeta",
+]
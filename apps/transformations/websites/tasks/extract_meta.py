@@ -2,12 +2,13 @@ import hashlib
 from datetime import timedelta
 from typing import Optional, TypedDict
 
-from lxml import etree
 from prefect import task
 from prefect.context import TaskRunContext
 
 from packages.database import WebsiteSourceState
 from packages.log import get_logger
+from transformations import parsing
+from transformations.executor import extraction_executor
 
 
 class ScrapedMeta(TypedDict):
@@ -47,55 +48,13 @@ async def extract_website_meta(base_url: str, contents: str) -> ScrapedMeta:
 
     logger = get_logger()
 
-    name, description, favicon = None, None, None
+    meta = await extraction_executor.run(parsing.extract_meta, base_url, contents)
 
-    parser = etree.HTMLParser()
-    tree = etree.fromstring(contents, parser)
-
-    title_tag = tree.find(".//title")
-    name = title_tag.text if title_tag is not None else None
-
-    description_tags = [
-        tree.find(".//meta[@name='description']"),
-        tree.find(".//meta[@property='og:description']"),
-        tree.find(".//meta[@property='twitter:description']"),
-    ]
-
-    for description_tag in description_tags:
-        if description_tag is not None:
-            description = description_tag.get("content")
-            break
-
-    links = tree.findall(".//link")
-    for link in links:
-        rel = link.get("rel")
-        if rel is not None and "icon" in rel:
-            favicon = link.get("href")
-            break
-    else:
-        image_tags = [
-            tree.find(".//meta[@property='og:image']"),
-            tree.find(".//meta[@property='twitter:image']"),
-            tree.find(".//meta[@name='twitter:image']"),
-            tree.find(".//link[@rel='image_src']"),
-        ]
-
-        for image_tag in image_tags:
-            if image_tag is not None:
-                favicon = image_tag.get("content")
-                break
-
-    if favicon and favicon.startswith("/"):
-        favicon = f"{base_url}{favicon}"
-
-    logger.info(
-        "Extracted the website meta",
-        extra={"name": name, "description": description, "favicon": favicon},
-    )
+    logger.info("Extracted the website meta", extra=meta)
 
     return ScrapedMeta(
-        name=name,
-        description=description,
-        favicon=favicon,
+        name=meta["name"],
+        description=meta["description"],
+        favicon=meta["favicon"],
         state=WebsiteSourceState.XPATHS_PENDING,
     )
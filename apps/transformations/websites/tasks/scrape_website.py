@@ -1,12 +1,12 @@
-from datetime import timedelta
+import asyncio
 from typing import Optional, TypedDict
 
-from fake_useragent import UserAgent
-from httpx import AsyncClient, HTTPError
+from httpx import HTTPError
 from prefect import task
-from prefect.tasks import task_input_hash
 
+from packages.cache import CacheEntry, SingleFlight, page_cache
 from packages.database import WebsiteSourceState
+from packages.httpclient import http_pool
 from packages.log import get_logger
 
 
@@ -17,39 +17,97 @@ class ScrapedWebsite(TypedDict):
 
     contents: Optional[str]
     state: WebsiteSourceState
+    # Whether the page did not change since the passed validators were received.
+    # The contents may be None in this case
+    not_modified: bool
+    etag: Optional[str]
+    last_modified: Optional[str]
 
 
-@task(
-    name="Scrape website",
-    cache_key_fn=task_input_hash,
-    cache_expiration=timedelta(days=1),
-    tags=["websites"],
-)
-async def scrape_website(url: str) -> ScrapedWebsite:
+# Concurrent requests of the same URL share a single fetch
+_fetches: SingleFlight[ScrapedWebsite] = SingleFlight()
+
+
+def _from_cache(
+    cached: CacheEntry,
+    etag: Optional[str],
+    last_modified: Optional[str],
+) -> ScrapedWebsite:
+    """
+    Build the result out of the cached page, comparing its validators to the passed ones
+    """
+
+    cached_etag = cached.meta.get("etag")
+    cached_last_modified = cached.meta.get("last_modified")
+
+    return ScrapedWebsite(
+        contents=cached.content.decode(),
+        state=WebsiteSourceState.SCRAPED,
+        not_modified=bool(
+            (etag and etag == cached_etag)
+            or (last_modified and last_modified == cached_last_modified)
+        ),
+        etag=cached_etag,
+        last_modified=cached_last_modified,
+    )
+
+
+async def _fetch(
+    url: str,
+    etag: Optional[str],
+    last_modified: Optional[str],
+) -> ScrapedWebsite:
     """
-    Scrape the website for the data
+    Get the page from the page cache, revalidating it if it is stale, or download it.
+    The cache is read and written in a thread, so the other fetches go on meanwhile
     """
 
     logger = get_logger()
 
+    cached = await asyncio.to_thread(page_cache.get, url, allow_stale=True)
+    if cached and not cached.stale:
+        return _from_cache(cached, etag, last_modified)
+
+    # The validators of the cached page are preferred, since on 304 we have its body
+    validators = cached.meta if cached else {"etag": etag, "last_modified": last_modified}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
     try:
-        async with AsyncClient() as client:
-            response = await client.get(
-                url,
-                follow_redirects=True,
-                headers={
-                    "User-Agent": UserAgent(
-                        browsers=["chrome"],
-                        os=["macos"],
-                        platforms=["pc"],
-                    ).random
-                },
-            )
+        response = await http_pool.get(url, headers=headers)
     except HTTPError:
         logger.error("Failed to scrape the website", extra={"url": url})
         return ScrapedWebsite(
             contents=None,
             state=WebsiteSourceState.UNAVAILABLE,
+            not_modified=False,
+            etag=None,
+            last_modified=None,
+        )
+
+    if response.status_code == 304:
+        meta = {
+            "etag": response.headers.get("ETag") or validators.get("etag"),
+            "last_modified": (
+                response.headers.get("Last-Modified") or validators.get("last_modified")
+            ),
+        }
+        logger.info("The website is not modified", extra={"url": url})
+
+        if cached:
+            await asyncio.to_thread(page_cache.touch, url, meta)
+            return _from_cache(cached._replace(meta=meta), etag, last_modified)
+
+        return ScrapedWebsite(
+            contents=None,
+            state=WebsiteSourceState.SCRAPED,
+            not_modified=True,
+            etag=meta["etag"],
+            last_modified=meta["last_modified"],
         )
 
     logger.info(
@@ -57,7 +115,40 @@ async def scrape_website(url: str) -> ScrapedWebsite:
         extra={"url": url, "content_length": len(response.text)},
     )
 
+    meta = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    if response.is_success:
+        await asyncio.to_thread(page_cache.set, url, response.text.encode(), meta)
+
     return ScrapedWebsite(
         contents=response.text,
         state=WebsiteSourceState.SCRAPED,
+        not_modified=False,
+        etag=meta["etag"],
+        last_modified=meta["last_modified"],
+    )
+
+
+@task(name="Scrape website", tags=["websites"])
+async def scrape_website(
+    url: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+) -> ScrapedWebsite:
+    """
+    Scrape the website for the data.
+    The pages are kept in the compressed `page_cache` instead of Prefect results
+
+    :param url: The URL of the page
+    :param etag: The ETag of the previously seen version of the page
+    :param last_modified: The Last-Modified of the previously seen version of the page
+    :return: The scraped data, `not_modified` is set if the page did not change
+             since the passed validators were received
+    """
+
+    return await _fetches.do(
+        (url, etag, last_modified),
+        lambda: _fetch(url, etag, last_modified),
     )
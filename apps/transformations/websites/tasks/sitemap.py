@@ -0,0 +1,105 @@
+from collections import deque
+from typing import AsyncIterator
+from urllib.parse import urljoin, urlparse
+
+from httpx import HTTPError
+from prefect import task
+
+from packages.database import WebsiteSourceState
+from packages.httpclient import http_pool
+from packages.log import get_logger
+from transformations import parsing
+
+from .scrape_website import scrape_website
+
+__all__ = ["discover_sitemaps", "iter_sitemaps"]
+
+# Sitemap indexes may be nested, but a sane website does not have more sitemaps
+MAX_SITEMAPS = 1000
+
+
+@task(name="Discover sitemaps", tags=["websites"])
+async def discover_sitemaps(url: str) -> list[str]:
+    """
+    Find the sitemaps of the website, listed in robots.txt or at the default location
+
+    :param url: Any URL of the website
+    :return: The URLs of the sitemaps
+    """
+
+    logger = get_logger()
+    origin = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
+
+    robots = await scrape_website(f"{origin}/robots.txt")
+    sitemaps = []
+    if robots["state"] != WebsiteSourceState.UNAVAILABLE and robots["contents"]:
+        for line in robots["contents"].splitlines():
+            key, _, value = line.partition(":")
+            if key.strip().lower() == "sitemap" and value.strip():
+                sitemaps.append(urljoin(origin, value.strip()))
+
+    if not sitemaps:
+        try:
+            async with http_pool.stream("GET", f"{origin}/sitemap.xml") as response:
+                if response.is_success:
+                    sitemaps.append(str(response.url))
+        except HTTPError:
+            pass
+
+    logger.info("Discovered sitemaps", extra={"url": url, "sitemaps": sitemaps})
+    return sitemaps
+
+
+async def iter_sitemaps(urls: list[str]) -> AsyncIterator[parsing.SitemapEntry]:
+    """
+    Stream the page entries of the sitemaps, following the sitemap indexes
+
+    Every sitemap is parsed while it is being downloaded. Its entries are yielded
+    once the download is over, so that the slot of the host is not held while
+    the consumer is busy (a sitemap has at most 50 000 entries by the protocol).
+
+    :param urls: The URLs of the sitemaps
+    :return: The entries of the pages
+    """
+
+    logger = get_logger()
+    queue = deque(urls)
+    seen = set()
+
+    while queue:
+        url = queue.popleft()
+        if url in seen:
+            continue
+
+        if len(seen) >= MAX_SITEMAPS:
+            logger.warning("Too many sitemaps", extra={"url": url})
+            break
+
+        seen.add(url)
+        parser = parsing.SitemapParser()
+        entries = []
+        try:
+            async with http_pool.stream("GET", url) as response:
+                if not response.is_success:
+                    logger.warning(
+                        "Failed to fetch the sitemap",
+                        extra={"url": url, "status": response.status_code},
+                    )
+                    continue
+
+                async for chunk in response.aiter_bytes():
+                    entries.extend(parser.feed(chunk))
+        except HTTPError as e:
+            logger.error(
+                "Failed to fetch the sitemap", extra={"url": url, "error": str(e)}
+            )
+            continue
+
+        entries.extend(parser.close())
+        logger.info("Parsed the sitemap", extra={"url": url, "entries": len(entries)})
+
+        for entry in entries:
+            if entry.is_sitemap:
+                queue.append(urljoin(url, entry.loc))
+            else:
+                yield entry
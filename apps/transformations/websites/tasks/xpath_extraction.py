@@ -1,16 +1,18 @@
 import asyncio
 import hashlib
-import inspect
-import re
+import json
+from collections import Counter, defaultdict
 from datetime import datetime
-from typing import Any
-from urllib.parse import urlparse
+from typing import Any, Callable, NamedTuple, Optional, Union
+from urllib.parse import urljoin
 
-from lxml import etree
-from prefect import flow, task
+from prefect import flow
+from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
 
-from packages.chatgpt import ExtractProperties, chatgpt
+from packages.chatgpt import Priority, chatgpt, llm_priority
+from packages.chatgpt.tokens import token_usage
 from packages.database import (
     Config,
     Product,
@@ -18,165 +20,446 @@ from packages.database import (
     WebsiteSource,
     WebsiteSourceState,
 )
+from packages.httpclient import adaptive_scheduling, http_pool
 from packages.log import get_logger
 from packages.schemas.satu import UserFilledData
+from transformations import parsing
+from transformations.boilerplate import Boilerplate
+from transformations.config import config
+from transformations.executor import extraction_executor
+from transformations.keywords import KeywordCorpus, keyword_corpus
+from transformations.streaming import StreamingPipeline
 from transformations.utils import (
-    arbitrary_cleanup,
-    process_description,
+    pooled_connections,
     process_keywords,
+    process_product,
     reload_sources,
 )
 
+from ..known_urls import KnownUrlIndex, utc_now
 from .scrape_website import scrape_website
+from .sitemap import discover_sitemaps, iter_sitemaps
+
+# The number of sitemap entries checked against the database at once
+SITEMAP_BATCH_SIZE = 200
+# The number of stored products loaded for the enrichment at once, and the seconds
+# the enrichment waits for the other lookups to join the query
+PREVIOUS_BATCH_SIZE = 100
+PREVIOUS_BATCH_WINDOW = 0.05
+
+
+# The fields processed by the LLM, along with the keywords of the description
+LLM_FIELDS = ("description", "properties")
+# The prompts and the settings the LLM-backed fields depend on
+LLM_PROMPTS: dict[str, Callable[[Config], tuple[str, ...]]] = {
+    "description": lambda config: (config.description_prompt,),
+    "properties": lambda config: (config.properties_prompt,),
+    "keywords": lambda config: (
+        config.description_prompt,
+        config.keywords_prompt,
+        config.keywords_mode,
+    ),
+}
 
 
-def process_image(url: str, img: etree._Element) -> str:
-    if img.tag == "img":
-        img_url = img.get("src", "")
-        if img_url.startswith("/"):
-            return f"{urlparse(url).scheme}://{urlparse(url).hostname}{img_url}"
+def plan_spec(source: WebsiteSource) -> parsing.PlanSpec:
+    """
+    Get the extraction rules of the source, the key of its compiled extraction plan
 
-        return str(img_url)
+    :param source: The website source
+    :return: The extraction rules
+    """
 
-    closest_imgs = img.xpath(".//img")
-    if not isinstance(closest_imgs, list) or not closest_imgs:
-        return "N/A"
+    return parsing.PlanSpec(
+        props_xpaths=source.props_xpaths or {},
+        product_regex=source.product_regex,
+        pagination=source.pagination_regex,
+    )
 
-    closest_img = list(
-        sorted(
-            filter(
-                lambda x: isinstance(x, etree._Element) and hasattr(x, "get"),
-                closest_imgs,
-            ),
-            key=lambda x: len(x.get("src", "")),  # type: ignore
-            reverse=True,
-        )
-    )[0]
 
-    img_url = closest_img.get("src", "")  # type: ignore
-    if img_url.startswith("/"):
-        return f"{urlparse(url).scheme}://{urlparse(url).hostname}{img_url}"
+def listing_spec(source: WebsiteSource) -> Optional[parsing.ListingSpec]:
+    """
+    Get the extraction rules of the listing items of the source
 
-    return str(img_url)
+    :param source: The website source
+    :return: The extraction rules or None if the products are taken from their pages
+    """
 
+    if not source.listing_item_xpath:
+        return None
 
-def process_price(price: str) -> float:
-    try:
-        return float(re.sub(r"[^\d.]", "", price.replace(",", ".")))
-    except ValueError:
-        return -1
+    return parsing.ListingSpec(
+        item=source.listing_item_xpath,
+        xpaths=source.listing_xpaths or {},
+    )
 
 
-def process_arbitrary_string(currency: str) -> str:
-    return re.sub(r"[^A-Za-zА-Яа-яЁёÀ-ÿ.]", "", currency)
+async def parse_fields(
+    url: str,
+    contents: str,
+    spec: parsing.PlanSpec,
+    exists: bool,
+    mandatory_fields: list[str],
+    do_not_reprocess: list[str],
+    listed: Optional[dict[str, Any]] = None,
+) -> Optional[dict[str, Any]]:
+    """
+    Extract the product fields from the page in the `extraction_executor`.
+    Only the cheap transformers are applied and the mandatory fields are validated,
+    the LLM-backed transformers are applied later by `enrich_fields` to the products
+    which passed
 
+    :param url: The URL of the product
+    :param contents: The contents of the product page
+    :param spec: The extraction rules of the source
+    :param listed: The fields found in the item of the listing page
+    :return: The extracted data or None if the product should be discarded
+    """
 
-async def process_properties(properties: str) -> dict[str, Any]:
-    properties = arbitrary_cleanup(properties)
-    if not properties:
-        return {}
+    data = await extraction_executor.run(
+        parsing.extract_fields,
+        url,
+        contents,
+        spec,
+        exists,
+        mandatory_fields,
+        do_not_reprocess,
+        listed,
+    )
+    if data is None:
+        get_logger().warning("Failed to extract product info", extra={"url": url})
 
-    try:
-        return await chatgpt(ExtractProperties(properties))
-    except Exception as e:
-        get_logger().exception("Failed to extract properties", extra={"error": str(e)})
-        return {}
+    return data
 
 
-CUSTOM_TRANSFORMERS = {
-    "price": process_price,
-    "currency": process_arbitrary_string,
-    "measure_unit": process_arbitrary_string,
-    "description": process_description,
-    "properties": process_properties,
-}
-CUSTOM_EXTRACTORS = {
-    "main_image": process_image,
-}
+class PreviousProduct(NamedTuple):
+    """
+    Represents the stored version of the product being extracted again
+    """
 
+    data: dict[str, Any]
+    fingerprints: dict[str, str]
 
-@task(name="Extract product info", tags=["lxml"])
-async def extract_product(
-    url: str,
-    props_xpaths: dict[str, str],
-    exists: bool,
-    mandatory_fields: list[str],
-    do_not_reprocess: list[str],
-):
+
+class PreviousProductLoader:
     """
-    Extract product info
+    Loads the stored versions of the products being extracted again
 
-    :param url: The URL of the product
-    :return: The scraped data
+    The `KnownUrlIndex` does not hold the data of the products, which is loaded
+    only for the pages that were fetched and extracted. The lookups made within
+    the `window` are gathered into a single query of at most `batch_size` products.
     """
 
-    logger = get_logger()
+    def __init__(self, session: Session, source_id: str, batch_size: int, window: float):
+        """
+        :param session: The database session
+        :param source_id: The ID of the source
+        :param batch_size: The maximum number of products loaded at once
+        :param window: Seconds to wait for more lookups
+        """
+
+        self._session = session
+        self._source_id = source_id
+        self._batch_size = batch_size
+        self._window = window
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def get(self, url: str) -> Optional[PreviousProduct]:
+        """
+        Load the stored version of the product
+
+        :param url: The URL of the product as it is stored
+        :return: The product or None if it has no data
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(url, []).append(future)
+        if len(self._pending) >= self._batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, self._pending = self._pending, {}
+        try:
+            products = {
+                url: PreviousProduct(data, fingerprints or {})
+                for url, data, fingerprints in self._session.query(
+                    Product.url, Product.data, Product.fingerprints
+                ).filter(
+                    Product.source_id == self._source_id,
+                    Product.url.in_(list(pending)),
+                )
+                if data
+            }
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
 
-    result = await scrape_website(url)
-    if result["state"] == WebsiteSourceState.UNAVAILABLE or not result["contents"]:
-        return
+        for url, futures in pending.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(products.get(url))
+
+
+def field_fingerprints(data: dict[str, Any], global_config: Config) -> dict[str, str]:
+    """
+    Hash the raw extracted fields, before they are passed to the LLM.
+    The fingerprints of the LLM-backed fields also cover the model and the prompts,
+    so that a new prompt makes them processed again
 
-    parser = etree.HTMLParser()
-    tree = etree.fromstring(result["contents"], parser)
+    :param data: The data returned by `parse_fields`
+    :param global_config: The configuration
+    :return: The fingerprint of every field
+    """
+
+    # The keywords are extracted from the description
+    raw = {**data, "keywords": data.get("description")}
 
-    data = {}
-    for field in UserFilledData.model_fields.keys():
-        if exists and field in do_not_reprocess:
+    fingerprints = {}
+    for field, value in raw.items():
+        if field == "url" or value is None:
             continue
 
-        xpath = props_xpaths.get(field)
-        if not xpath:
-            logger.warning("Failed to extract product info", extra={"url": url})
-            return None
+        parts = [str(value)]
+        if prompts := LLM_PROMPTS.get(field):
+            parts += [global_config.model, *map(str, prompts(global_config))]
 
-        if field in CUSTOM_EXTRACTORS:
-            elems = tree.xpath(xpath)
-            if isinstance(elems, list) and elems and isinstance(elems[0], etree._Element):
-                data[field] = CUSTOM_EXTRACTORS[field](url, elems[0])
-            else:
-                if field in mandatory_fields:
-                    logger.warning("Failed to extract product info", extra={"url": url})
-                    return None
+        fingerprints[field] = hashlib.sha256("\0".join(parts).encode()).hexdigest()
 
-                data[field] = "N/A"
-        else:
-            elems = tree.xpath(f"{xpath}//text()")
-            if isinstance(elems, list) and elems:
-                data[field] = "".join(map(str, elems))
-                if field in CUSTOM_TRANSFORMERS:
-                    if inspect.iscoroutinefunction(CUSTOM_TRANSFORMERS[field]):
-                        data[field] = await CUSTOM_TRANSFORMERS[field](data[field])
-                    else:
-                        data[field] = CUSTOM_TRANSFORMERS[field](data[field])
-            else:
-                if field in mandatory_fields:
-                    logger.warning("Failed to extract product info", extra={"url": url})
-                    return None
+    return fingerprints
+
+
+def extraction_revision(source: WebsiteSource, global_config: Config) -> str:
+    """
+    Hash the extraction rules of the source and the LLM settings.
+    The unchanged page is only skipped if its product was extracted with
+    the same revision, so the new XPaths or prompts reach every product
 
-                data[field] = "N/A"
+    :param source: The website source
+    :param global_config: The configuration
+    :return: The revision
+    """
+
+    settings = {
+        "spec": plan_spec(source),
+        "listing": listing_spec(source),
+        "required": global_config.required,
+        "not_reprocess": global_config.not_reprocess,
+        "model": global_config.model,
+        "prompts": {
+            field: prompts(global_config) for field, prompts in LLM_PROMPTS.items()
+        },
+    }
+    return hashlib.sha256(
+        json.dumps(settings, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+async def enrich_fields(
+    data: dict[str, Any],
+    fingerprints: Optional[dict[str, str]] = None,
+    previous: Optional[PreviousProduct] = None,
+    boilerplate: Optional[Boilerplate] = None,
+) -> dict[str, Any]:
+    """
+    Apply the LLM-backed transformers to the extracted product fields.
+    The fields whose fingerprint did not change since the previous extraction
+    reuse its output instead of going to the LLM again, the fields which were not
+    extracted at all keep their previous values
+
+    :param data: The data returned by `parse_fields`
+    :param fingerprints: The fingerprints of the extracted fields
+    :param previous: The stored version of the product
+    :param boilerplate: The text blocks of the source to strip before the LLM
+    :return: The enriched data
+    """
+
+    def unchanged(field: str) -> bool:
+        return bool(
+            previous
+            and fingerprints
+            and field in previous.data
+            and fingerprints.get(field)
+            and previous.fingerprints.get(field) == fingerprints[field]
+        )
+
+    reused = []
+    pending = {}
+    for field in LLM_FIELDS:
+        # The properties laid out as the key-value pairs are already a dict
+        if isinstance(data.get(field), str) and data[field] != "N/A":
+            if unchanged(field):
+                data[field] = previous.data[field]  # pyright: ignore[reportOptionalMemberAccess]
+                reused.append(field)
+            elif boilerplate is not None:
+                pending[field] = boilerplate.strip(data[field])
+            else:
+                pending[field] = data[field]
 
+    processed = {}
     if data.get("description") and data.get("description") != "N/A":
-        data["keywords"] = await process_keywords(data["description"])
-    else:
+        if unchanged("keywords"):
+            data["keywords"] = previous.data["keywords"]  # pyright: ignore[reportOptionalMemberAccess]
+            reused.append("keywords")
+        elif "description" not in pending:
+            processed["keywords"] = await process_keywords(data["description"])
+    elif "description" in data or not previous:
         data["keywords"] = "N/A"
 
-    data["url"] = url
-    logger.info("Extracted product info", extra={"url": url, "data": data})
+    if pending:
+        processed.update(
+            await process_product(pending.get("description"), pending.get("properties"))
+        )
+        if "keywords" in reused:
+            processed.pop("keywords", None)
+
+    data.update(processed)
+    if fingerprints is not None:
+        # The fields the LLM failed on are not fingerprinted, so the next run
+        # retries them instead of reusing the placeholder
+        for field, value in processed.items():
+            if value in ("N/A", "", {}):
+                fingerprints[field] = ""
+
+    if previous:
+        for field, value in previous.data.items():
+            data.setdefault(field, value)
+
+        if fingerprints is not None:
+            for field, fingerprint in previous.fingerprints.items():
+                fingerprints.setdefault(field, fingerprint)
+
+    get_logger().info(
+        "Extracted product info",
+        extra={"url": data["url"], "data": data, "reused": reused},
+    )
 
     return data
 
 
+def product_row(
+    data: dict[str, Any],
+    source_id: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    fingerprints: Optional[dict[str, str]] = None,
+    revision: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Build the product row out of the extracted data.
+    The validators are not stored if the LLM failed on some of the fields,
+    so the next run extracts the page again instead of skipping it as unchanged
+
+    :param data: The extracted product data
+    :param source_id: The ID of the source
+    :param etag: The ETag of the product page
+    :param last_modified: The Last-Modified of the product page
+    :param fingerprints: The fingerprints of the raw fields
+    :param revision: The extraction revision, see `extraction_revision`
+    :return: The row for `upsert_products`
+    """
+
+    if fingerprints and "" in fingerprints.values():
+        etag = last_modified = None
+
+    return {
+        "hash": hashlib.sha256(data["name"].encode()).hexdigest(),
+        "data": data,
+        "url": data["url"],
+        "last_processed": utc_now(),
+        "source_id": source_id,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fingerprints": fingerprints,
+        "revision": revision,
+    }
+
+
+def touch_products(session: Session, urls: list[str]):
+    """
+    Mark the products, whose pages did not change, as processed without
+    touching their data
+
+    :param session: The database session
+    :param urls: The URLs of the products
+    """
+
+    if not urls:
+        return
+
+    session.query(Product).filter(Product.url.in_(urls)).update(
+        {Product.last_processed: utc_now()},
+        synchronize_session=False,
+    )
+
+
+def upsert_products(session: Session, rows: list[dict[str, Any]]):
+    """
+    Insert the products, updating the ones with the same hash.
+    The data is merged into the stored one, so the fields not extracted
+    again, like the `not_reprocess` ones, keep their values
+
+    :param session: The database session
+    :param rows: The product rows
+    """
+
+    # Postgres refuses to update the same row twice within a single statement
+    rows = list({row["hash"]: row for row in rows}.values())
+
+    insert_stmt = insert(Product).values(rows)
+    insert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=["hash"],
+        set_={
+            "data": func.coalesce(
+                Product.data.op("||")(insert_stmt.excluded.data),
+                insert_stmt.excluded.data,
+            ),
+            "url": insert_stmt.excluded.url,
+            "last_processed": insert_stmt.excluded.last_processed,
+            "source_id": insert_stmt.excluded.source_id,
+            "etag": insert_stmt.excluded.etag,
+            "last_modified": insert_stmt.excluded.last_modified,
+            "fingerprints": insert_stmt.excluded.fingerprints,
+            "revision": insert_stmt.excluded.revision,
+        },
+    )
+    session.execute(insert_stmt)
+
+
 @flow(name="Extract products")
+@pooled_connections
 async def extract_products(id: str):
     """
     Extract products
 
-    :param base_url: The base URL of the website
-    :param contents: The contents of the website
-    :return: The scraped data
+    Listing pages, links, product pages, field extraction, LLM enrichment and
+    database writes are separate stages of the `StreamingPipeline`, so a slow page
+    or product only occupies its own worker instead of blocking the whole batch.
+    When the products are discovered via the sitemap, it replaces the listing pages,
+    and the products whose `lastmod` is older than their extraction are skipped.
+    When the source has the listing items, the products are taken from the listing
+    pages, and only the pages of the products whose items lack a field are fetched.
+
+    :param id: The ID of the website
+    :return: The ID of the website
     """
 
     logger = get_logger()
+    llm_priority.set(Priority.BULK)
+    tokens = Counter()
+    token_usage.set(tokens)
 
     with TheSession() as session:
         global_config = session.query(Config).one()
@@ -187,141 +470,362 @@ async def extract_products(id: str):
             return
 
         website.state = WebsiteSourceState.DATA_COLLECTING
+        website.crawl_stats = {}
         session.commit()
 
         await reload_sources()
 
-        base_url = f"{urlparse(website.url).scheme}://{urlparse(website.url).hostname}"
-        pagination = website.pagination_regex
+        # In the adaptive mode the requests are paced by the per-domain window,
+        # so the fetching stages get as many workers as the window may grow to
+        adaptive = global_config.scheduling_mode == "adaptive"
+        adaptive_scheduling.set(adaptive)
+        limiter = http_pool.limiter(website.url)
+
+        spec = plan_spec(website)
+        listing = listing_spec(website)
+        revision = extraction_revision(website, global_config)
+        plan = parsing.extraction_plan(spec)
+        if plan.product_regex is None:
+            logger.error("Product regex is not set", extra={"website_id": id})
+            raise ValueError("Product regex is not set")
+
+        sitemaps: list[str] = []
+        if website.discovery_mode != "pagination":
+            sitemaps = (
+                [website.sitemap_url]
+                if website.sitemap_url
+                else await discover_sitemaps(website.url)
+            )
+            if not sitemaps and website.discovery_mode == "sitemap":
+                logger.error("Failed to find the sitemap", extra={"website_id": id})
+                raise ValueError("Failed to find the sitemap")
 
-        pagination_regex = re.escape(pagination).replace(
-            r"%swp\-new\-pagination%", r"(\d+)"
+        pagination = website.pagination_regex
+        last_page_n = 0
+        if not sitemaps:
+            pages = (
+                plan.pagination_regex.findall(website.contents)
+                if plan.pagination_regex
+                else []
+            )
+            if not pages:
+                logger.error("Failed to extract pagination", extra={"website_id": id})
+                raise ValueError("Failed to extract pagination")
+
+            pages = list(map(int, pages))
+            pages.sort()
+            last_page_n = pages[-1]
+            logger.info("Extracted pagination", extra={"pages": last_page_n})
+
+        boilerplate = Boilerplate(
+            website.boilerplate,
+            sample_size=config.boilerplate_sample_size,
+            min_share=config.boilerplate_min_share,
+            min_chars=config.boilerplate_min_chars,
         )
-        if pagination_regex.startswith("http"):
-            pagination_regex = re.sub(
-                r"(https?://[^/]+)",
-                r"(?:\g<1>)?",
-                pagination_regex,
+        known_urls = KnownUrlIndex.load(session, id, global_config.product_ttl)
+        logger.info("Loaded known products", extra={"products": len(known_urls)})
+        previous_products = PreviousProductLoader(
+            session, id, PREVIOUS_BATCH_SIZE, PREVIOUS_BATCH_WINDOW
+        )
+        if global_config.keywords_mode != "llm":
+            keyword_corpus.set(
+                KeywordCorpus.load(session, id, config.keywords_corpus_size)
             )
 
-        pages = re.findall(pagination_regex, website.contents)
-        if not pages:
-            logger.error("Failed to extract pagination", extra={"website_id": id})
-            raise ValueError("Failed to extract pagination")
-
-        pages = list(map(int, pages))
-        pages.sort()
-        last_page_n = pages[-1]
-        logger.info("Extracted pagination", extra={"pages": last_page_n})
-
-        current_page = 1
-        last_page = False
-        while True:
-            if current_page > last_page_n:
-                break
-
-            tasks = []
-            for _ in range(global_config.pages_concurrency):
-                url = pagination.replace(r"%swp-new-pagination%", str(current_page))
+        # Set when the pagination is over, no more listing pages are queued after that
+        last_page = asyncio.Event()
+        # Validators of the fetched product pages, stored along with the products
+        validators: dict[str, tuple[Optional[str], Optional[str]]] = {}
+        # Products whose pages did not change since they were extracted
+        unchanged: list[str] = []
+
+        async def listing_pages():
+            for page in range(1, last_page_n + 1):
+                if last_page.is_set():
+                    return
+
+                url = urljoin(
+                    website.url, pagination.replace(r"%swp-new-pagination%", str(page))
+                )
                 logger.info("Adding page to queue", extra={"url": url})
-                tasks.append(scrape_website(url))
-                current_page += 1
-                if current_page > last_page_n:
-                    break
-
-            results = await asyncio.gather(*tasks)
-            product_urls = set()
-            total = 0
-            for result in results:
-                if result["state"] == WebsiteSourceState.UNAVAILABLE:
-                    last_page = True
-                    break
-
-                parser = etree.HTMLParser()
-                tree = etree.fromstring(result["contents"], parser)
-                links = [
-                    link.get("href") for link in tree.findall(".//a") if link.get("href")
-                ]
-                total += len(links)
-                for link in links:
-                    if link and link.startswith("/"):
-                        link = f"{base_url}{link}"
-
-                    if link and (product_url := re.search(website.product_regex, link)):
-                        product_urls.add(product_url.group(0))
+                yield url
+
+        async def fetch_listing_page(url: str):
+            result = await scrape_website(url)
+            if (
+                result["state"] == WebsiteSourceState.UNAVAILABLE
+                or not result["contents"]
+            ):
+                last_page.set()
+                return
+
+            yield url, result["contents"]
+
+        async def extract_links(page: tuple[str, str]):
+            page_url, contents = page
+            listed: dict[str, parsing.ListedProduct] = {}
+            if listing is not None:
+                listed = {
+                    product.url: product
+                    for product in await extraction_executor.run(
+                        parsing.extract_listing,
+                        contents,
+                        page_url,
+                        spec,
+                        listing,
+                        global_config.required,
+                    )
+                }
+                if not listed:
+                    # The layout of the listing changed, the links still lead
+                    # to the products
+                    logger.warning(
+                        "No listing items found, extracting the links",
+                        extra={"url": page_url},
+                    )
+
+            if listed:
+                product_urls, total_urls = list(listed), len(listed)
+            else:
+                product_urls, total_urls = await extraction_executor.run(
+                    parsing.extract_links,
+                    contents,
+                    page_url,
+                    spec,
+                    config.link_extraction_mode,
+                )
 
             logger.info(
                 "Extracted product URLs",
-                extra={"urls": len(product_urls), "total_urls": total},
+                extra={"urls": len(product_urls), "total_urls": total_urls},
             )
 
             if not product_urls:
-                break
-
-            product_urls = list(product_urls)
-
-            exists = (
-                session.query(Product.url).filter(Product.url.in_(product_urls)).all()
-            )
-            products = [(url, url in exists) for url in product_urls]
-            chunked_products = [
-                products[i : i + global_config.products_concurrency]
-                for i in range(0, len(products), global_config.products_concurrency)
-            ]
-            results = []
-            for chunk in chunked_products:
-                results.extend(
-                    await asyncio.gather(
-                        *[
-                            extract_product(
-                                product_info[0],
-                                website.props_xpaths,
-                                product_info[1],
-                                global_config.required,
-                                global_config.not_reprocess,
-                            )
-                            for product_info in chunk
-                        ]
-                    )
+                last_page.set()
+                return
+
+            for product in select_products(product_urls):
+                yield *product, listed.get(product[0])
+
+        async def sitemap_batches():
+            batch: dict[str, Optional[datetime]] = {}
+            async for entry in iter_sitemaps(sitemaps):
+                url = parsing.canonical_url(entry.loc)
+                if product_url := plan.product_regex.search(url):
+                    batch[product_url.group(0)] = entry.lastmod
+
+                if len(batch) >= SITEMAP_BATCH_SIZE:
+                    yield batch
+                    batch = {}
+
+            if batch:
+                yield batch
+
+        async def select_sitemap_products(batch: dict[str, Optional[datetime]]):
+            logger.info("Selecting sitemap products", extra={"urls": len(batch)})
+            for product in select_products(list(batch), batch):
+                yield *product, None
+
+        def select_products(
+            product_urls: list[str],
+            lastmods: Optional[dict[str, Optional[datetime]]] = None,
+        ):
+            for url in product_urls:
+                if not known_urls.claim(url):
+                    # Already seen on another listing page or sitemap
+                    pipeline.stats["duplicate"] += 1
+                    continue
+
+                if (known := known_urls.get(url)) is None:
+                    yield url, False, (None, None)
+                    continue
+
+                if known.revision != revision:
+                    # Extracted with other rules or prompts, so the page is
+                    # extracted again even if it did not change
+                    pipeline.stats["outdated"] += 1
+                    yield url, True, (None, None)
+                    continue
+
+                if known_urls.is_fresh(url):
+                    pipeline.stats["fresh"] += 1
+                    continue
+
+                lastmod = lastmods.get(url) if lastmods else None
+                if lastmod and known.last_processed and lastmod <= known.last_processed:
+                    # The sitemap says the page did not change since the extraction
+                    pipeline.stats["sitemap_unchanged"] += 1
+                    continue
+
+                yield url, True, (known.etag, known.last_modified)
+
+        async def fetch_product_page(
+            product: tuple[
+                str,
+                bool,
+                tuple[Optional[str], Optional[str]],
+                Optional[parsing.ListedProduct],
+            ],
+        ):
+            url, exists, (etag, last_modified), listed = product
+            if listed is not None and listed.complete:
+                # The listing has every field it maps and every mandatory one,
+                # the page is not needed
+                pipeline.stats["listing_only"] += 1
+                yield url, exists, listed.data
+                return
+
+            result = await scrape_website(url, etag, last_modified)
+            if result["not_modified"]:
+                known = known_urls.get(url)
+                unchanged.append(known.url if known else url)
+                return
+
+            if (
+                result["state"] == WebsiteSourceState.UNAVAILABLE
+                or not result["contents"]
+            ):
+                return
+
+            validators[url] = (result["etag"], result["last_modified"])
+            yield url, exists, (result["contents"], listed and listed.data)
+
+        async def extract_product_fields(
+            product: tuple[
+                str, bool, Union[dict[str, Any], tuple[str, Optional[dict[str, Any]]]]
+            ],
+        ):
+            url, exists, page = product
+            if isinstance(page, dict):
+                # Taken from the listing as it is, the same fields are skipped
+                # for the existing products as on their pages. The fields
+                # the listing does not map keep their stored values, see
+                # `enrich_fields`, and are N/A for the new products
+                data = {
+                    field: value
+                    for field, value in page.items()
+                    if not (exists and field in global_config.not_reprocess)
+                }
+                if not exists:
+                    for field in UserFilledData.model_fields:
+                        data.setdefault(field, "N/A")
+            else:
+                contents, listed = page
+                data = await parse_fields(
+                    url,
+                    contents,
+                    spec,
+                    exists,
+                    global_config.required,
+                    global_config.not_reprocess,
+                    listed,
                 )
-
-            results = list(filter(lambda x: x is not None, results))
-            if not results:
-                break
-
-            insert_stmt = insert(Product).values(
-                [
-                    {
-                        "hash": hashlib.sha256(result["name"].encode()).hexdigest(),
-                        "data": result,
-                        "url": result["url"],
-                        "last_processed": datetime.now(),
-                        "source_id": id,
-                    }
-                    for result in results
-                ]
+            if data is None:
+                pipeline.stats["discarded"] += 1
+            else:
+                boilerplate.observe(
+                    data[field]
+                    for field in LLM_FIELDS
+                    if isinstance(data.get(field), str) and data[field] != "N/A"
+                )
+                yield data, exists, field_fingerprints(data, global_config)
+
+        async def enrich_product_fields(
+            item: tuple[dict[str, Any], bool, dict[str, str]],
+        ):
+            data, exists, fingerprints = item
+            previous = None
+            if exists and (known := known_urls.get(data["url"])):
+                previous = await previous_products.get(known.url)
+
+            yield (
+                await enrich_fields(data, fingerprints, previous, boilerplate),
+                fingerprints,
             )
-            insert_stmt = insert_stmt.on_conflict_do_update(
-                index_elements=["hash"],
-                set_={
-                    "data": insert_stmt.excluded.data,
-                    "url": insert_stmt.excluded.url,
-                    "last_processed": insert_stmt.excluded.last_processed,
-                    "source_id": insert_stmt.excluded.source_id,
+
+        def commit_progress():
+            pipeline.stats["not_modified"] += len(unchanged)
+            touch_products(session, unchanged)
+            unchanged.clear()
+            if boilerplate.learned:
+                website.boilerplate = boilerplate.blocks
+            website.crawl_stats = {
+                **(website.crawl_stats or {}),
+                "scheduling_mode": global_config.scheduling_mode,
+                "scheduling": limiter.snapshot(),
+                "pipeline": dict(pipeline.stats),
+                "llm_cache": chatgpt.cache_stats(),
+                "llm_providers": chatgpt.provider_stats(),
+                "llm_tokens": dict(tokens),
+                "boilerplate": {
+                    "blocks": len(boilerplate.blocks),
+                    "stripped": dict(boilerplate.stats),
                 },
-            )
-            session.execute(insert_stmt)
+            }
             session.commit()
 
-            if last_page:
-                break
+        async def write_products(results: list[tuple[dict[str, Any], dict[str, str]]]):
+            upsert_products(
+                session,
+                [
+                    product_row(
+                        result,
+                        id,
+                        *validators.pop(result["url"], (None, None)),
+                        fingerprints,
+                        revision,
+                    )
+                    for result, fingerprints in results
+                ],
+            )
+            commit_progress()
 
             logger.info(
                 "Chunk finished",
-                extra={"current_page": current_page, "results": len(results)},
+                extra={"results": len(results), "window": limiter.window},
             )
 
-            await asyncio.sleep(3)
+        fetch_concurrency = http_pool.max_window
+        pipeline = StreamingPipeline(
+            "Extract products", queue_size=config.pipeline_queue_size
+        )
+        if sitemaps:
+            # The sitemap lists every product, so no listing page is fetched at all
+            pipeline.stage("sitemap", select_sitemap_products)
+            feed = sitemap_batches()
+        else:
+            pipeline.stage(
+                "listing_pages",
+                fetch_listing_page,
+                concurrency=(
+                    fetch_concurrency if adaptive else global_config.pages_concurrency
+                ),
+            ).stage("links", extract_links)
+            feed = listing_pages()
+
+        (
+            pipeline.stage(
+                "product_pages",
+                fetch_product_page,
+                concurrency=(
+                    fetch_concurrency if adaptive else global_config.products_concurrency
+                ),
+            )
+            .stage("fields", extract_product_fields)
+            .stage(
+                "enrichment",
+                enrich_product_fields,
+                concurrency=global_config.products_concurrency,
+            )
+            .sink(
+                write_products,
+                batch_size=config.pipeline_write_batch_size,
+                flush_interval=config.pipeline_flush_interval,
+            )
+        )
+        await pipeline.run(feed)
+        commit_progress()
 
         website.state = WebsiteSourceState.DATA_PENDING_APPROVAL
         session.commit()
@@ -332,12 +836,18 @@ async def extract_products(id: str):
 
 
 @flow(name="Reprocess Products", log_prints=True)
+@pooled_connections
 async def reprocess_products():
     """
     Reprocess products
+
+    Unlike the data collection, every page is extracted again, whether it changed
+    or not, since the reprocessing is requested after the rules or prompts change.
+    Only the fields whose fingerprints changed go to the LLM.
     """
 
     logger = get_logger()
+    llm_priority.set(Priority.INTERACTIVE)
 
     with TheSession() as session:
         global_config = session.query(Config).one()
@@ -347,75 +857,139 @@ async def reprocess_products():
             logger.info("No products to reprocess")
             return
 
-        input_data = [
-            (
-                product.url,
-                False,
-                session.query(WebsiteSource)
-                .filter(WebsiteSource.id == product.source_id)
-                .one(),
+        sources = (
+            session.query(WebsiteSource)
+            .filter(WebsiteSource.id.in_({product.source_id for product in products}))
+            .all()
+        )
+        specs = {source.id: plan_spec(source) for source in sources}
+        revisions = {
+            source.id: extraction_revision(source, global_config) for source in sources
+        }
+        # The reprocessing uses the blocks learned by the data collection
+        boilerplates = {
+            source.id: Boilerplate(
+                source.boilerplate, min_chars=config.boilerplate_min_chars
             )
+            for source in sources
+        }
+        # Plain tuples, since the ORM objects are expired by every commit of the writer
+        input_data = [(product.url, product.source_id) for product in products]
+        # Loaded along with the products, rather than by a query per product
+        previous = {
+            product.url: PreviousProduct(product.data, product.fingerprints or {})
             for product in products
-        ]
-
-        chunked_products = [
-            input_data[i : i + global_config.products_concurrency]
-            for i in range(0, len(input_data), global_config.products_concurrency)
-        ]
-
-        results = []
-
-        for chunk in chunked_products:
-            results.extend(
-                await asyncio.gather(
-                    *[
-                        extract_product(
-                            product_info[0],
-                            product_info[2].props_xpaths,
-                            product_info[1],
-                            global_config.required,
-                            global_config.not_reprocess,
-                        )
-                        for product_info in chunk
-                    ]
+            if product.data
+        }
+        validators: dict[str, tuple[Optional[str], Optional[str]]] = {}
+        tokens: defaultdict[str, Counter] = defaultdict(Counter)
+        corpora = (
+            {
+                source_id: KeywordCorpus.load(
+                    session, source_id, config.keywords_corpus_size
                 )
-            )
-
-        results = list(filter(lambda x: x is not None, results))
-        if not results:
-            return
+                for source_id in specs
+            }
+            if global_config.keywords_mode != "llm"
+            else {}
+        )
 
-        sources = {product[0]: product[2].id for product in input_data}
+        adaptive = global_config.scheduling_mode == "adaptive"
+        adaptive_scheduling.set(adaptive)
+
+        async def fetch_product_page(product: tuple[str, str]):
+            url, source_id = product
+            result = await scrape_website(url)
+            if (
+                result["state"] == WebsiteSourceState.UNAVAILABLE
+                or not result["contents"]
+            ):
+                return
+
+            validators[url] = (result["etag"], result["last_modified"])
+            yield url, source_id, result["contents"]
+
+        async def extract_product_fields(item: tuple[str, str, str]):
+            url, source_id, contents = item
+            data = await parse_fields(
+                url,
+                contents,
+                specs[source_id],
+                False,
+                global_config.required,
+                global_config.not_reprocess,
+            )
+            if data is not None:
+                yield data, source_id, field_fingerprints(data, global_config)
+
+        async def enrich_product_fields(item: tuple[dict[str, Any], str, dict[str, str]]):
+            data, source_id, fingerprints = item
+            token_usage.set(tokens[source_id])
+            keyword_corpus.set(corpora.get(source_id))
+            yield (
+                await enrich_fields(
+                    data,
+                    fingerprints,
+                    previous.get(data["url"]),
+                    boilerplates.get(source_id),
+                ),
+                source_id,
+                fingerprints,
+            )
 
-        insert_stmt = insert(Product).values(
-            [
-                {
-                    "hash": hashlib.sha256(result["name"].encode()).hexdigest(),
-                    "data": result,
-                    "url": result["url"],
-                    "last_processed": datetime.now(),
-                    "source_id": sources[result["url"]],
-                }
-                for result in results
-            ]
-        )
+        async def write_products(
+            results: list[tuple[dict[str, Any], str, dict[str, str]]],
+        ):
+            upsert_products(
+                session,
+                [
+                    product_row(
+                        result,
+                        source_id,
+                        *validators.pop(result["url"], (None, None)),
+                        fingerprints,
+                        revisions[source_id],
+                    )
+                    for result, source_id, fingerprints in results
+                ],
+            )
+            session.commit()
 
-        insert_stmt = insert_stmt.on_conflict_do_update(
-            index_elements=["hash"],
-            set_={
-                "data": insert_stmt.excluded.data,
-                "url": insert_stmt.excluded.url,
-                "last_processed": insert_stmt.excluded.last_processed,
-                "source_id": insert_stmt.excluded.source_id,
-            },
+        await (
+            StreamingPipeline("Reprocess products", queue_size=config.pipeline_queue_size)
+            .stage(
+                "product_pages",
+                fetch_product_page,
+                concurrency=(
+                    http_pool.max_window
+                    if adaptive
+                    else global_config.products_concurrency
+                ),
+            )
+            .stage("fields", extract_product_fields)
+            .stage(
+                "enrichment",
+                enrich_product_fields,
+                concurrency=global_config.products_concurrency,
+            )
+            .sink(
+                write_products,
+                batch_size=config.pipeline_write_batch_size,
+                flush_interval=config.pipeline_flush_interval,
+            )
+            .run(input_data)
         )
 
-        session.execute(insert_stmt)
-
         for product in products:
             product.reprocessing = False
 
         session.commit()
 
     await reload_sources()
-    logger.info("Reprocessed products")
+    logger.info(
+        "Reprocessed products",
+        extra={
+            "products": len(input_data),
+            "llm_tokens": {source_id: dict(usage) for source_id, usage in tokens.items()},
+        },
+    )